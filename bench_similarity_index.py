@@ -0,0 +1,169 @@
+"""
+Benchmark dell'indice dei quasi-duplicati (SimHash + LSH in SubmissionCache).
+
+Genera N didascalie sintetiche (default 100k), ne calcola le impronte (in serie e nel pool
+di processi), le inserisce in una SubmissionCache senza limiti e misura il costo per messaggio
+di find_near_duplicate su:
+- copie ritoccate (emoji, punteggiatura, parole riordinate, una parola in più): devono essere trovate;
+- didascalie nuove: non devono dare falsi positivi.
+Per confronto misura anche la scansione lineare di tutte le impronte.
+
+Le didascalie casuali sono più varie di quelle reali, quindi c'è anche uno scenario realistico:
+didascalie brevi e ripetitive da template con link diversi (500 per piattaforma, come una settimana
+di submission), inserite una dopo l'altra come in on_message. Sono tutte submission valide: ogni
+rifiuto come quasi-duplicato è un falso positivo e lo script fallisce se ce n'è anche uno.
+
+Uso: python bench_similarity_index.py [numero_didascalie] [numero_ricerche]
+"""
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+
+os.environ.setdefault('TOKEN', 'benchmark')  # config.py lo richiede; il bot non viene avviato
+
+from config import SIMHASH_MAX_DISTANCE, SIMHASH_MIN_WORDS, SIMHASH_WORKERS
+from similarity import simhash, simhash_many_async, hamming, start_pool
+from submission_cache import SubmissionCache
+from submission_parser import parse_submission
+
+_EMOJI = ['🔥', '💯', '😂', '✨', '🎶', '👀']
+_TEMPLATES = [
+    'nuovo video {emoji} #trendduelofficial {link}',
+    '{link} #trendduelofficial',
+    'ecco la mia entry per questa settimana {emoji} #trendduelofficial {link}',
+    'votatemi {emoji}{emoji} #trendduelofficial #trendduel {link}',
+    'day {n} della challenge #trendduelofficial {link}',
+    '#trendduelofficial {link} seguitemi per altri video {emoji}',
+    'la mia versione del trend {emoji} #trendduelofficial {link}',
+]
+_DOMAINS = ['https://www.tiktok.com/@{user}/video/{id}', 'https://instagram.com/reel/{id}', 'https://youtube.com/shorts/{id}']
+
+
+def build_vocabulary(rng, size=5000):
+    return [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))) for _ in range(size)]
+
+
+def build_caption(rng, vocabulary, n):
+    words = [rng.choice(vocabulary) for _ in range(rng.randint(8, 25))]
+    link = rng.choice(_DOMAINS).format(user=f"user{rng.randint(1, 5000)}", id=rng.randint(10**9, 10**10))
+    words.insert(rng.randrange(len(words) + 1), link)
+    return ' '.join(words)
+
+
+def build_template_caption(rng, domain, n):
+    """Didascalia di template (breve, ripetitiva) con un link nuovo, normalizzata come in on_message."""
+    link = domain.format(user=f"user{rng.randint(1, 300)}", id=rng.randint(10**9, 10**10))
+    return parse_submission(rng.choice(_TEMPLATES).format(emoji=rng.choice(_EMOJI), link=link, n=n % 30 + 1)).normalized
+
+
+def template_false_positives(rng, domain, count):
+    """
+    Inserisce count didascalie di template della piattaforma come farebbe on_message e ritorna
+    (rifiutate come quasi-duplicati, coppie a distanza <= soglia tra quelle con impronta).
+    """
+    cache = SubmissionCache(max_distance=SIMHASH_MAX_DISTANCE)
+    rejected = 0
+    fingerprints = []
+    for i in range(count):
+        text = build_template_caption(rng, domain, i)
+        fingerprint = simhash(text, SIMHASH_MIN_WORDS)
+        if cache.find_near_duplicate(fingerprint) is not None:
+            rejected += 1
+            continue
+        cache.add(i, i % 97, text, None, simhash=fingerprint)
+        if fingerprint is not None:
+            fingerprints.append(fingerprint)
+    pairs = sum(hamming(a, b) <= SIMHASH_MAX_DISTANCE
+                for i, a in enumerate(fingerprints) for b in fingerprints[i + 1:])
+    return rejected, pairs
+
+
+def perturb(rng, caption, vocabulary):
+    """Ritocco banale: emoji, punteggiatura, ordine delle parole o una parola aggiunta."""
+    words = caption.split()
+    kind = rng.choice(['emoji', 'punct', 'reorder', 'extra_word'])
+    if kind == 'emoji':
+        words.insert(rng.randrange(len(words) + 1), rng.choice(_EMOJI))
+    elif kind == 'punct':
+        i = rng.randrange(len(words))
+        words[i] = words[i] + rng.choice(['!', '!!', '.', ',', '?'])
+    elif kind == 'reorder':
+        rng.shuffle(words)
+    else:
+        words.insert(rng.randrange(len(words) + 1), rng.choice(vocabulary))
+    return kind, ' '.join(words)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+async def main(size, lookups):
+    rng = random.Random(7)
+    vocabulary = build_vocabulary(rng)
+    captions = [build_caption(rng, vocabulary, n) for n in range(size)]
+
+    fingerprints, serial = timed(lambda: [simhash(c, SIMHASH_MIN_WORDS) for c in captions])
+    start = time.perf_counter()
+    pooled = await simhash_many_async(captions, SIMHASH_MIN_WORDS)
+    parallel = time.perf_counter() - start
+    assert pooled == fingerprints
+    print(f"Impronte: {size} didascalie | in serie {serial:.2f}s ({serial / size * 1e6:.1f} us/msg) | "
+          f"pool {SIMHASH_WORKERS} processi {parallel:.2f}s")
+
+    cache = SubmissionCache(max_distance=SIMHASH_MAX_DISTANCE)
+    _, build = timed(lambda: [cache.add(i, i % 997, c, None, simhash=f) for i, (c, f) in enumerate(zip(captions, fingerprints))])
+    print(f"Indice: {len(cache)} voci inserite in {build:.2f}s, {cache.stats()['lsh_buckets']} bucket LSH")
+
+    probes = []
+    for _ in range(lookups):
+        original = rng.randrange(size)
+        kind, text = perturb(rng, captions[original], vocabulary)
+        probes.append((original, kind, simhash(text, SIMHASH_MIN_WORDS)))
+    fresh = [simhash(build_caption(rng, vocabulary, size + i), SIMHASH_MIN_WORDS) for i in range(lookups)]
+
+    found_by_kind = {}
+    start = time.perf_counter()
+    results = [cache.find_near_duplicate(fp, exclude_id=-1) for _, _, fp in probes]
+    lsh_time = time.perf_counter() - start
+    for (original, kind, _), result in zip(probes, results):
+        hits, total = found_by_kind.get(kind, (0, 0))
+        found_by_kind[kind] = (hits + (result == original), total + 1)
+
+    start = time.perf_counter()
+    false_positives = sum(cache.find_near_duplicate(fp, exclude_id=-1) is not None for fp in fresh)
+    fresh_time = time.perf_counter() - start
+
+    linear_probes = probes[:min(lookups, 200)]
+    start = time.perf_counter()
+    for _, _, fp in linear_probes:
+        min(range(size), key=lambda i: hamming(fp, fingerprints[i]))
+    linear_time = (time.perf_counter() - start) / len(linear_probes)
+
+    print(f"Ricerca LSH (ritoccati): {lsh_time / lookups * 1e6:8.1f} us/msg")
+    print(f"Ricerca LSH (nuovi):     {fresh_time / lookups * 1e6:8.1f} us/msg, falsi positivi {false_positives}/{lookups}")
+    print(f"Scansione lineare:       {linear_time * 1e6:8.1f} us/msg")
+    for kind, (hits, total) in sorted(found_by_kind.items()):
+        print(f"  trovati ({kind}): {hits}/{total}")
+
+    # Regressione: template brevi con link diversi non devono mai essere rifiutati
+    total_rejected = 0
+    for domain in _DOMAINS:
+        platform = domain.split('/')[2]
+        (rejected, pairs), elapsed = timed(template_false_positives, rng, domain, 500)
+        total_rejected += rejected
+        print(f"Template {platform:<14} 500 submission: falsi positivi {rejected}, coppie entro soglia {pairs}, "
+              f"{elapsed / 500 * 1e6:.1f} us/msg")
+    assert total_rejected == 0, f"{total_rejected} submission di template rifiutate come quasi-duplicati"
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    start_pool(SIMHASH_WORKERS)  # prima di asyncio.run, come in bot.py
+    asyncio.run(main(size, lookups))
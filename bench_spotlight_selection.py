@@ -0,0 +1,71 @@
+"""
+Benchmark della scelta dei repost spotlight.
+
+Confronta il vecchio percorso (lista completa dei candidati, random.shuffle, primo elemento) con il
+campionamento a serbatoio di reservoir.py su un flusso di N candidati sintetici: tempo per scelta e
+picco di memoria (tracemalloc). Verifica poi che:
+- con lo stesso seme la scelta si ripeta identica;
+- con pesi la frequenza di estrazione sia proporzionale al peso.
+
+Uso: python bench_spotlight_selection.py [numero_candidati] [ripetizioni]
+"""
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+from reservoir import weighted_sample
+
+
+def candidates(n, seed=3):
+    """Righe come quelle di spotlight.candidates: (message_id, user_id, content, reazioni, ultimo spotlight)."""
+    rng = random.Random(seed)
+    for i in range(n):
+        yield (10**17 + i, rng.randint(1, n // 3 + 1), f"caption {i} #trendduelofficial https://tiktok.com/v/{i}",
+               rng.randint(0, 20), None)
+
+
+def legacy_pick(rows, rng):
+    valid = list(rows)
+    rng.shuffle(valid)
+    return valid[0] if valid else None
+
+
+def reservoir_pick(rows, rng):
+    picked = weighted_sample(rows, k=1, rng=rng)
+    return picked[0] if picked else None
+
+
+def measure(fn, n, repeat):
+    best = None
+    for r in range(repeat):
+        start = time.perf_counter()
+        fn(candidates(n), random.Random(r))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    fn(candidates(n), random.Random(0))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    for name, fn in (('lista + shuffle', legacy_pick), ('serbatoio A-Res', reservoir_pick)):
+        elapsed, peak = measure(fn, size, repeat)
+        print(f"{name:<16} {size} candidati: {elapsed * 1000:8.1f} ms, picco memoria {peak / 1024:9.1f} KiB")
+
+    first = weighted_sample(candidates(size), k=5, rng=random.Random('settimana-42'))
+    again = weighted_sample(candidates(size), k=5, rng=random.Random('settimana-42'))
+    print(f"Stesso seme, stessa scelta: {[row[0] for row in first] == [row[0] for row in again]}")
+
+    # Pesi 1, 2, 3, 4 su quattro candidati: frequenze attese 10%, 20%, 30%, 40%
+    rows = [(i, i, '', 0, None) for i in range(1, 5)]
+    rng = random.Random(1)
+    draws = 100000
+    counts = Counter(weighted_sample(rows, weight=lambda row: row[0], rng=rng)[0][0] for _ in range(draws))
+    print("Frequenze pesate: " + ", ".join(f"peso {i} -> {counts[i] / draws:.3f}" for i in range(1, 5)))
@@ -0,0 +1,136 @@
+"""
+Microbenchmark del parser delle submission.
+
+Confronta il vecchio percorso di on_message (lower() ripetuti, regex compilate a ogni
+chiamata, normalize_url per link, ciclo sui MULTIPLATFORM_DOMAINS) con parse_submission,
+su un corpus sintetico di messaggi. Verifica anche che i due percorsi diano lo stesso risultato.
+
+Uso: python bench_submission_parser.py [numero_messaggi] [ripetizioni]
+"""
+import os
+import random
+import re
+import sys
+import time
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+os.environ.setdefault('TOKEN', 'benchmark')  # config.py lo richiede; il bot non viene avviato
+
+from config import HASHTAGS, MULTIPLATFORM_DOMAINS
+from submission_parser import parse_submission
+
+
+# --- Implementazione precedente (copiata da cogs/events.py) ---
+
+def legacy_normalize_message(content):
+    normalized = content.lower()
+    for hashtag in HASHTAGS:
+        normalized = normalized.replace(hashtag.lower(), '')
+    return ' '.join(sorted(normalized.split()))
+
+
+def legacy_extract_url(content):
+    url_pattern = r'(https?://(?:www\.)?(?:instagram\.com|tiktok\.com|youtube\.com)[^\s]*)'
+    match = re.search(url_pattern, content, re.IGNORECASE)
+    return match.group(0) if match else None
+
+
+def legacy_extract_urls_all(content):
+    pattern = r'(https?://[^\s\)\]\}>]+)'
+    matches = re.findall(pattern, content)
+    results = []
+    for m in matches:
+        if re.search(r'(instagram\.com|tiktok\.com|youtube\.com)', m, re.IGNORECASE):
+            results.append(m.rstrip('.,;:!?)]}'))
+    return list(dict.fromkeys(results))
+
+
+def legacy_normalize_url(url):
+    try:
+        p = urlparse(url)
+        scheme = p.scheme.lower() if p.scheme else 'https'
+        netloc = p.netloc.lower()
+        path = p.path.rstrip('/')
+        qs = parse_qsl(p.query, keep_blank_values=True)
+        qs_filtered = [(k, v) for (k, v) in qs if not k.lower().startswith('utm_')]
+        return urlunparse((scheme, netloc, path, '', urlencode(sorted(qs_filtered)), ''))
+    except Exception:
+        return url.strip()
+
+
+def legacy_parse(content):
+    content_lower = content.lower()
+    has_hashtag = any(tag.lower() in content_lower for tag in HASHTAGS)
+    has_permitted_link = bool(re.search(r'(instagram\.com|tiktok\.com|youtube\.com)', content_lower, re.IGNORECASE))
+    if not has_hashtag or not has_permitted_link:
+        return (has_hashtag, has_permitted_link)
+    normalized = legacy_normalize_message(content)
+    primary = legacy_extract_url(content)
+    urls = legacy_extract_urls_all(content)
+    normalized_urls = [legacy_normalize_url(raw) for raw in urls]
+    found = set()
+    for domain in MULTIPLATFORM_DOMAINS:
+        if domain in content.lower():
+            found.add(domain)
+    return (has_hashtag, has_permitted_link, normalized, primary, urls, normalized_urls, frozenset(found))
+
+
+def new_parse(content):
+    parsed = parse_submission(content)
+    if not parsed.has_hashtag or not parsed.has_permitted_link:
+        return (parsed.has_hashtag, parsed.has_permitted_link)
+    return (parsed.has_hashtag, parsed.has_permitted_link, parsed.normalized, parsed.primary_url,
+            parsed.urls, parsed.normalized_urls, parsed.platforms)
+
+
+# --- Corpus sintetico ---
+
+_WORDS = ['nuovo', 'video', 'trend', 'challenge', 'guardate', 'balletto', 'fit', 'oggi', 'Milano', 'sfida', '🔥', 'grazie']
+_LINKS = [
+    'https://www.tiktok.com/@user{n}/video/{v}?utm_source=ig&lang=it',
+    'https://instagram.com/reel/{v}/',
+    'https://www.youtube.com/shorts/{v}?feature=share',
+    'https://youtu.be/{v}',
+    'https://example.com/post/{v}',
+]
+
+
+def build_corpus(size, seed=42):
+    rng = random.Random(seed)
+    corpus = []
+    for n in range(size):
+        parts = [rng.choice(_WORDS) for _ in range(rng.randint(3, 25))]
+        for _ in range(rng.randint(0, 3)):
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(_LINKS).format(n=n, v=rng.randint(10**8, 10**9)))
+        if rng.random() < 0.9:
+            parts.append(rng.choice(HASHTAGS).upper() if rng.random() < 0.2 else rng.choice(HASHTAGS))
+        corpus.append(' '.join(parts))
+    return corpus
+
+
+def bench(fn, corpus, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for content in corpus:
+            fn(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    corpus = build_corpus(size)
+
+    mismatches = [c for c in corpus if legacy_parse(c) != new_parse(c)]
+    if mismatches:
+        print(f"ATTENZIONE: {len(mismatches)} messaggi con risultato diverso, es. {mismatches[0]!r}")
+
+    legacy = bench(legacy_parse, corpus, repeat)
+    new = bench(new_parse, corpus, repeat)
+    print(f"Messaggi: {size}  (miglior tempo su {repeat} ripetizioni)")
+    print(f"Vecchio parser: {legacy * 1000:8.1f} ms  ({legacy / size * 1e6:6.2f} us/msg)")
+    print(f"Nuovo parser:   {new * 1000:8.1f} ms  ({new / size * 1e6:6.2f} us/msg)")
+    print(f"Speedup: {legacy / new:.2f}x")
@@ -13,9 +13,15 @@ logging.basicConfig(level=logging.DEBUG)  # Impostiamo livello DEBUG per log pi
 logger = logging.getLogger(__name__)
 
 # Importa configurazioni e database
-from config import TOKEN, ITALY_TZ, LOG_CHANNEL_ID, LEADERBOARD_CHANNEL_ID, HALL_OF_FAME_CHANNEL_ID
-from database import conn, c
+from config import TOKEN, ITALY_TZ, LOG_CHANNEL_ID, LEADERBOARD_CHANNEL_ID, HALL_OF_FAME_CHANNEL_ID, DISCORD_MESSAGE_CACHE_SIZE
+from config import SIMHASH_WORKERS
+import similarity
+
+# Pool SimHash avviato qui, prima che database crei i suoi thread (vedi similarity.start_pool)
+similarity.start_pool(SIMHASH_WORKERS)
+
 import database
+from mod_log import ModLogDispatcher
 
 # Configura intents
 intents = discord.Intents.default()
@@ -24,7 +30,7 @@ intents.members = True
 intents.reactions = True
 
 # Inizializza il bot
-bot = commands.Bot(command_prefix='!', intents=intents)
+bot = commands.Bot(command_prefix='!', intents=intents, max_messages=DISCORD_MESSAGE_CACHE_SIZE)
 
 # Variabile globale per tracciare lo stato del bot
 bot.bot_status = {
@@ -35,6 +41,9 @@ bot.bot_status = {
     'last_activity': datetime.now()
 }
 
+# Coda in background per il canale mod-logs (i cog usano bot.mod_log.send senza await)
+bot.mod_log = ModLogDispatcher(bot)
+
 # Flask app per uptime monitoring
 app = Flask(__name__)
 
@@ -5,9 +5,10 @@ from datetime import datetime, timedelta
 import pytz
 import logging
 from config import FOUNDER_ROLE_ID, ADMIN_ROLE_ID, ITALY_TZ, LOG_CHANNEL_ID
-from utils import get_week_boundaries, cleanup_lock_files
+from utils import get_week_id, cleanup_lock_files
 from translations import get_translation
-from database import c, conn, record_weekly_event
+from database import fetchone, execute, record_weekly_event, get_weekly_user_totals
+from queries import get_query_stats, SLOW_QUERY_THRESHOLD_MS
 
 logger = logging.getLogger(__name__)
 
@@ -49,19 +50,15 @@ class Admin(commands.Cog):
     @app_commands.checks.has_any_role(FOUNDER_ROLE_ID, ADMIN_ROLE_ID)
     async def botstats(self, interaction: discord.Interaction):
         locale = str(interaction.locale)
-        from database import c
         uptime = datetime.now() - self.bot.bot_status['start_time']
         now = datetime.now(ITALY_TZ)
         last_activity = self.bot.bot_status['last_activity'].astimezone(ITALY_TZ)
 
-        c.execute('SELECT COUNT(*) FROM users')
-        total_users = c.fetchone()[0]
+        total_users = (await fetchone('users.count'))[0]
 
-        c.execute('SELECT COUNT(*) FROM weekly_events WHERE archived = 0')
-        active_events = c.fetchone()[0]
+        active_events = (await fetchone('weekly_events.count_active'))[0]
 
-        c.execute('SELECT COUNT(*) FROM weekly_archives')
-        total_archives = c.fetchone()[0]
+        total_archives = (await fetchone('archives.count'))[0]
 
         # Calcolo della prossima pubblicazione
         next_sunday = now + timedelta(days=(6-now.weekday()))
@@ -114,6 +111,15 @@ class Admin(commands.Cog):
             value=last_activity.strftime("%d/%m/%Y %H:%M:%S"),
             inline=True
         )
+        events_cog = self.bot.get_cog('Events')
+        if events_cog:
+            cache_stats = events_cog.message_cache.stats()
+            embed.add_field(
+                name=get_translation('botstats_submission_cache', locale),
+                value=f"{cache_stats['entries']:,} msg • {cache_stats['bytes'] // 1024:,} KB\n"
+                      f"hit {cache_stats['hits']:,} / miss {cache_stats['misses']:,} • evict {cache_stats['evictions']:,}",
+                inline=True
+            )
         embed.add_field(
             name=get_translation('botstats_next_leaderboard', locale),
             value=f"{next_publish.strftime('%d/%m/%Y %H:%M')} ({time_to_publish.days}d {time_to_publish.seconds//3600}h {(time_to_publish.seconds%3600)//60}m)",
@@ -184,12 +190,10 @@ class Admin(commands.Cog):
 
         try:
             # Conta il numero di archivi prima di eliminarli
-            c.execute('SELECT COUNT(*) FROM weekly_archives')
-            archive_count = c.fetchone()[0]
+            archive_count = (await fetchone('archives.count'))[0]
 
             # Elimina tutti i record dalla tabella weekly_archives
-            c.execute('DELETE FROM weekly_archives')
-            conn.commit()
+            await execute('archives.delete_all')
 
             logger.info(f"🗑️ Archivio classifiche svuotato: {archive_count} record eliminati da {interaction.user.name}")
             embed = discord.Embed(
@@ -239,44 +243,34 @@ class Admin(commands.Cog):
 
         try:
             # Verifica se l'utente esiste nel database
-            c.execute('SELECT points, reputation, participations FROM users WHERE user_id = ?', (user.id,))
-            user_data = c.fetchone()
+            user_data = await fetchone('users.stats', (user.id,))
 
             if not user_data:
                 # Crea un nuovo record per l'utente se non esiste
-                c.execute('INSERT INTO users (user_id, points, reputation, participations, badges) VALUES (?, ?, ?, ?, ?)',
-                          (user.id, 0, 0, 0, ''))
-                conn.commit()
+                await execute('users.insert', (user.id, 0, 0, 0, ''))
                 logger.info(f"Creato nuovo record utente per {user.name} ({user.id})")
                 user_data = (0, 0, 0)
 
             # Calcola punti settimanali
-            week_start, week_end = get_week_boundaries()
-            c.execute('''
-                SELECT SUM(points_earned) FROM weekly_events
-                WHERE user_id = ? AND timestamp >= ? AND timestamp < ? AND archived = 0
-            ''', (user.id, week_start.isoformat(), week_end.isoformat()))
-            weekly_points = c.fetchone()[0] or 0
+            weekly_points = (await get_weekly_user_totals(user.id, get_week_id()))[0]
 
             # Aggiorna punti e reputazione
             new_points = max(0, user_data[0] + points)
             new_reputation = max(0, user_data[1] + reputation)
             new_weekly_points = max(0, weekly_points + points)
 
-            c.execute('UPDATE users SET points = ?, reputation = ? WHERE user_id = ?',
-                      (new_points, new_reputation, user.id))
-            conn.commit()
+            await execute('users.set_points_reputation', (new_points, new_reputation, user.id))
 
             # Registra l'evento settimanale
             if points != 0:
-                record_weekly_event(
+                await record_weekly_event(
                     user_id=user.id,
                     event_type='staff_adjusted_points',
                     points=points,
                     message_id=None
                 )
             if reputation != 0:
-                record_weekly_event(
+                await record_weekly_event(
                     user_id=user.id,
                     event_type='staff_adjusted_reputation',
                     reputation=reputation,
@@ -321,6 +315,28 @@ class Admin(commands.Cog):
 
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
+    @app_commands.command(name="query-stats", description="Mostra le query del database più costose")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.checks.has_any_role(FOUNDER_ROLE_ID, ADMIN_ROLE_ID)
+    async def query_stats(self, interaction: discord.Interaction):
+        locale = str(interaction.locale)
+        report = get_query_stats()[:15]
+
+        embed = discord.Embed(
+            title=get_translation('query_stats_title', locale),
+            description=get_translation('query_stats_description', locale).format(threshold=SLOW_QUERY_THRESHOLD_MS),
+            color=0x3498DB
+        )
+        if report:
+            lines = [f"{'Query':<36} {'N':>7} {'Tot ms':>9} {'p50':>7} {'p99':>7}"]
+            for entry in report:
+                lines.append(f"{entry['name'][:36]:<36} {entry['count']:>7} {entry['total_ms']:>9.1f} {entry['p50_ms']:>7.2f} {entry['p99_ms']:>7.2f}")
+            embed.add_field(name="📊", value="```\n" + "\n".join(lines)[:1000] + "\n```", inline=False)
+        else:
+            embed.add_field(name="📭", value=get_translation('query_stats_empty', locale), inline=False)
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
     @tasks.loop(minutes=5)
     async def keep_alive_task(self):
         try:
@@ -32,6 +32,8 @@ class Commands(commands.Cog):
                 get_translation('commands_checkpermissions', locale),
                 get_translation('commands_clear_archives', locale),
                 get_translation('commands_manage_user_stats', locale),  # Aggiunto /manage-user-stats
+                get_translation('commands_query_stats', locale),
+                get_translation('commands_spotlight_schedule', locale),
             ]
         else:
             embed.description = get_translation('commands_user_description', locale)
@@ -2,103 +2,90 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import re
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
-from config import SUBMISSIONS_CHANNEL_ID, LOG_CHANNEL_ID, HASHTAGS, FOUNDER_ROLE_ID, ADMIN_ROLE_ID
-from database import record_weekly_event, c, conn, add_submitted_link, link_exists
+from config import SUBMISSIONS_CHANNEL_ID, LOG_CHANNEL_ID, FOUNDER_ROLE_ID, ADMIN_ROLE_ID, ITALY_TZ
+from config import SUBMISSION_CACHE_MAX_ENTRIES, SUBMISSION_CACHE_MAX_BYTES, SUBMISSION_CACHE_MAX_WEEKS
+from config import SIMHASH_MAX_DISTANCE, SIMHASH_MIN_WORDS
+from database import execute, link_exists, record_reaction, remove_reaction, has_reacted, has_reacted_to_reposts
+from database import score_submission, add_submissions, has_submissions, get_recent_submissions, get_submission_author
+from database import set_submission_simhashes, update_submission_content, mark_submissions_ineligible, forget_messages
 from translations import get_translation
-from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+from submission_cache import SubmissionCache
+from submission_parser import parse_submission, is_valid_submission
+from similarity import simhash_async, simhash_many_async
+from utils import remove_raw_reaction
 
 logger = logging.getLogger(__name__)
 
 class Events(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.message_cache = {}  # Cache per tracciare messaggi con link social
-
-    def normalize_message(self, content):
-        """Normalizza il contenuto del messaggio per il confronto dei duplicati."""
-        normalized = content.lower()
-        for hashtag in HASHTAGS:
-            normalized = normalized.replace(hashtag.lower(), '')
-        return ' '.join(sorted(normalized.split()))
-
-    def extract_url(self, content):
-        """Estrae il primo URL valido dal messaggio."""
-        url_pattern = r'(https?://(?:www\.)?(?:instagram\.com|tiktok\.com|youtube\.com)[^\s]*)'
-        match = re.search(url_pattern, content, re.IGNORECASE)
-        return match.group(0) if match else None
+        # Cache per tracciare messaggi con link social (indicizzata per URL, contenuto e SimHash, limitata per settimane e memoria)
+        self.message_cache = SubmissionCache(max_entries=SUBMISSION_CACHE_MAX_ENTRIES,
+                                             max_bytes=SUBMISSION_CACHE_MAX_BYTES,
+                                             max_weeks=SUBMISSION_CACHE_MAX_WEEKS,
+                                             max_distance=SIMHASH_MAX_DISTANCE)
+        self.cache_warmed = False
 
     @commands.Cog.listener()
     async def on_ready(self):
-        # Ricostruisci cache dei messaggi submissions (utile dopo restart)
+        # on_ready scatta anche a ogni riconnessione: dopo il primo caricamento la cache Ã¨ tenuta aggiornata da on_message
+        if self.cache_warmed:
+            return
         try:
-            logger.info("ðŸ“¢ Events on_ready: ricostruzione message_cache dallo storico submissions")
-            submissions_channel = self.bot.get_channel(SUBMISSIONS_CHANNEL_ID)
-            if not submissions_channel:
-                logger.warning("Canale submissions non trovato in on_ready")
-                return
-
-            async for message in submissions_channel.history(limit=1000):
-                # Ignora bot
-                if message.author.bot:
-                    continue
-                normalized = self.normalize_message(message.content)
-                url = self.extract_url(message.content)
-                self.message_cache[message.id] = {
-                    'user_id': message.author.id,
-                    'normalized': normalized,
-                    'url': url,
-                    'reactions': []  # verrÃ  popolato dalle righe in DB se presenti
-                }
-            # Popola reazioni esistenti dalla tabella reactions
-            c.execute('SELECT message_id, user_id, emoji FROM reactions')
-            rows = c.fetchall()
-            for msg_id, user_id, emoji in rows:
-                if msg_id in self.message_cache:
-                    self.message_cache[msg_id]['reactions'].append(emoji)
-            logger.info(f"ðŸ“¦ message_cache ricostruita: {len(self.message_cache)} messaggi")
+            if await has_submissions():
+                logger.info("ðŸ“¢ Events on_ready: ricostruzione message_cache dalla tabella submissions")
+            else:
+                # Primo avvio con la tabella vuota: scansione una tantum dello storico Discord
+                if not await self.backfill_submissions_from_history():
+                    return
+            await self.warm_cache_from_db()
+            self.cache_warmed = True
         except Exception as e:
             logger.error(f"Errore ricostruzione message_cache in on_ready: {e}")
 
-    def extract_urls_all(self, content):
-        """
-        Estrae tutti gli URL presenti nel messaggio relativi alle piattaforme consentite.
-        Restituisce lista di raw URLs (rimuove punteggiatura terminale comune).
-        """
-        pattern = r'(https?://[^\s\)\]\}>]+)'
-        matches = re.findall(pattern, content)
-        results = []
-        for m in matches:
-            if re.search(r'(instagram\.com|tiktok\.com|youtube\.com)', m, re.IGNORECASE):
-                m_clean = m.rstrip('.,;:!?)]}')
-                results.append(m_clean)
-        # dedup mantenendo ordine
-        return list(dict.fromkeys(results))
-
-    def normalize_url(self, url):
-        """
-        Normalizza l'URL per confronto:
-        - scheme e netloc lowercase
-        - rimuove slash finale
-        - rimuove frammento
-        - rimuove parametri utm_*
-        - ordina query string
-        """
-        try:
-            p = urlparse(url)
-            scheme = p.scheme.lower() if p.scheme else 'https'
-            netloc = p.netloc.lower()
-            path = p.path.rstrip('/')
-            qs = parse_qsl(p.query, keep_blank_values=True)
-            qs_filtered = [(k, v) for (k, v) in qs if not k.lower().startswith('utm_')]
-            qs_sorted = sorted(qs_filtered)
-            query = urlencode(qs_sorted)
-            normalized = urlunparse((scheme, netloc, path, '', query, ''))
-            return normalized
-        except Exception:
-            return url.strip()
+    async def warm_cache_from_db(self):
+        """Riempie message_cache con le submission delle settimane tenute in cache e le loro reazioni."""
+        since = datetime.now(ITALY_TZ) - timedelta(weeks=SUBMISSION_CACHE_MAX_WEEKS)
+        submissions, reactions = await get_recent_submissions(since)
+
+        # Righe salvate prima delle impronte SimHash: calcolo in blocco nel pool e salvataggio
+        missing = [row for row in submissions if row[5] is None]
+        if missing:
+            fingerprints = await simhash_many_async((row[2] for row in missing), SIMHASH_MIN_WORDS)
+            computed = dict(zip((row[0] for row in missing), fingerprints))
+            await set_submission_simhashes(computed.items())
+            submissions = [row[:5] + (computed.get(row[0], row[5]),) for row in submissions]
+
+        for message_id, user_id, normalized, url, created_at, fingerprint in submissions:
+            self.message_cache.add(message_id, user_id, normalized, url,
+                                   created_at=datetime.fromtimestamp(created_at, ITALY_TZ), simhash=fingerprint)
+        for message_id, emoji in reactions:
+            if message_id in self.message_cache:
+                self.message_cache[message_id]['reactions'].append(emoji)
+        logger.info(f"ðŸ“¦ message_cache ricostruita: {len(self.message_cache)} messaggi ({self.message_cache.stats()})")
+
+    async def backfill_submissions_from_history(self):
+        """Copia nella tabella submissions gli ultimi 1000 messaggi del canale; ritorna False se il canale manca."""
+        logger.info("ðŸ“¢ Events on_ready: tabella submissions vuota, importazione dallo storico del canale")
+        submissions_channel = self.bot.get_channel(SUBMISSIONS_CHANNEL_ID)
+        if not submissions_channel:
+            logger.warning("Canale submissions non trovato in on_ready")
+            return False
+
+        rows = []
+        async for message in submissions_channel.history(limit=1000):
+            # Ignora bot
+            if message.author.bot:
+                continue
+            parsed = parse_submission(message.content)
+            rows.append((message.id, message.author.id, parsed.normalized,
+                         parsed.primary_url, int(message.created_at.timestamp()), message.content))
+        fingerprints = await simhash_many_async((row[2] for row in rows), SIMHASH_MIN_WORDS)
+        imported = await add_submissions([row[:5] + (fingerprint,) + row[5:] for row, fingerprint in zip(rows, fingerprints)])
+        logger.info(f"ðŸ“¥ Importate {imported} submission dallo storico")
+        return True
 
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -109,13 +96,13 @@ class Events(commands.Cog):
             await self.bot.process_commands(message)
             return
 
-        content_lower = message.content.lower()
+        parsed = parse_submission(message.content)
         locale = str(message.guild.preferred_locale) if message.guild and message.guild.preferred_locale else 'it'
         log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
 
         # Controlla validitÃ  del messaggio: deve avere almeno un hashtag ufficiale E almeno un link social consentito
-        has_hashtag = any(tag.lower() in content_lower for tag in HASHTAGS)
-        has_permitted_link = bool(re.search(r'(instagram\.com|tiktok\.com|youtube\.com)', content_lower, re.IGNORECASE))
+        has_hashtag = parsed.has_hashtag
+        has_permitted_link = parsed.has_permitted_link
 
         if not has_hashtag or not has_permitted_link:
             try:
@@ -123,29 +110,34 @@ class Events(commands.Cog):
                 if not has_hashtag:
                     await message.author.send(get_translation('invalid_no_hashtag', locale))
                     if log_channel:
-                        await log_channel.send(f"ðŸ—‘ï¸ Messaggio rimosso da {message.author.mention}: manca hashtag ufficiale.")
+                        self.bot.mod_log.send(f"ðŸ—‘ï¸ Messaggio rimosso da {message.author.mention}: manca hashtag ufficiale.")
                 else:
                     await message.author.send(get_translation('invalid_no_permitted_link', locale))
                     if log_channel:
-                        await log_channel.send(f"ðŸ—‘ï¸ Messaggio rimosso da {message.author.mention}: link non consentito o assente.")
+                        self.bot.mod_log.send(f"ðŸ—‘ï¸ Messaggio rimosso da {message.author.mention}: link non consentito o assente.")
             except discord.Forbidden:
                 logger.warning(f"Impossibile eliminare messaggio o inviare DM a {message.author.name}: permessi insufficienti.")
                 if log_channel:
-                    await log_channel.send(f"âš ï¸ Impossibile eliminare messaggio o inviare DM a {message.author.name}: permessi insufficienti.")
+                    self.bot.mod_log.send(f"âš ï¸ Impossibile eliminare messaggio o inviare DM a {message.author.name}: permessi insufficienti.")
             await self.bot.process_commands(message)
             return
 
         # Se valido, procedi con check duplicati
         user_id = message.author.id
-        normalized_content = self.normalize_message(message.content)
-        message_url = self.extract_url(message.content)
+        normalized_content = parsed.normalized
+        message_url = parsed.primary_url
+
+        # Impronta SimHash per i quasi-duplicati (emoji, punteggiatura, parole riordinate), calcolata nel
+        # pool di processi prima di tutti i controlli: mentre si aspetta il pool altri messaggi vanno avanti
+        fingerprint = await simhash_async(normalized_content, SIMHASH_MIN_WORDS)
 
         # Se valido, procedi con check duplicati link giÃ  pubblicati
-        urls = self.extract_urls_all(message.content)
+        # Controllo dopo l'ultimo await prima del salvataggio: link_exists non sospende e score_submission
+        # mette i link nel set prima del suo primo await, quindi due messaggi con lo stesso link non passano entrambi
+        urls = parsed.urls
         if urls:
-            for raw in urls:
-                norm = self.normalize_url(raw)
-                if link_exists(norm):
+            for raw, norm in zip(urls, parsed.normalized_urls):
+                if await link_exists(norm):
                     # duplicato: elimina e non assegnare punti
                     try:
                         await message.delete()
@@ -155,30 +147,20 @@ class Events(commands.Cog):
                         except Exception:
                             pass
                         if log_channel:
-                            await log_channel.send(f"ðŸ—‘ï¸ Messaggio di {message.author.mention} eliminato: contiene link giÃ  pubblicato ({raw})")
+                            self.bot.mod_log.send(f"ðŸ—‘ï¸ Messaggio di {message.author.mention} eliminato: contiene link giÃ  pubblicato ({raw})")
                     except discord.Forbidden:
                         logger.warning(f"Impossibile eliminare messaggio o inviare DM a {message.author}.")
                         if log_channel:
-                            await log_channel.send(f"âš ï¸ Impossibile eliminare/DM {message.author.mention} per duplicato link ({raw}).")
+                            self.bot.mod_log.send(f"âš ï¸ Impossibile eliminare/DM {message.author.mention} per duplicato link ({raw}).")
                     await self.bot.process_commands(message)
                     return
 
         # Controlla se il messaggio Ã¨ duplicato (stesso URL o stesso contenuto normalizzato)
-        is_duplicate = False
-        original_message_id = None
-        for cached_id, cached_data in self.message_cache.items():
-            if cached_id == message.id:
-                continue
-            # Controlla duplicato per URL
-            if message_url and message_url == cached_data.get('url'):
-                is_duplicate = True
-                original_message_id = cached_id
-                break
-            # Controlla duplicato per contenuto normalizzato
-            if normalized_content == cached_data['normalized']:
-                is_duplicate = True
-                original_message_id = cached_id
-                break
+        original_message_id = self.message_cache.find_duplicate(normalized_content, message_url, exclude_id=message.id)
+        if original_message_id is None:
+            # Altrimenti cerca un quasi-duplicato nell'indice LSH della cache
+            original_message_id = self.message_cache.find_near_duplicate(fingerprint, exclude_id=message.id)
+        is_duplicate = original_message_id is not None
 
         if is_duplicate:
             # Rimuovi il messaggio in ogni caso
@@ -189,214 +171,168 @@ class Events(commands.Cog):
                     if cached_data['user_id'] == user_id:
                         await message.author.send(get_translation('duplicate_same_user', locale))
                         if log_channel:
-                            await log_channel.send(f"âš ï¸ Utente {message.author.name} ha ripubblicato un proprio messaggio: messaggio rimosso, nessun punto assegnato.")
+                            self.bot.mod_log.send(f"âš ï¸ Utente {message.author.name} ha ripubblicato un proprio messaggio: messaggio rimosso, nessun punto assegnato.")
                     else:
                         await message.author.send(get_translation('duplicate_other_user', locale))
                         if log_channel:
-                            await log_channel.send(f"âš ï¸ Utente {message.author.name} ha pubblicato un messaggio duplicato di un altro utente: messaggio rimosso.")
+                            self.bot.mod_log.send(f"âš ï¸ Utente {message.author.name} ha pubblicato un messaggio duplicato di un altro utente: messaggio rimosso.")
             except discord.Forbidden:
                 logger.warning(f"Impossibile inviare DM o eliminare messaggio di {message.author.name}: permessi insufficienti.")
                 if log_channel:
-                    await log_channel.send(f"âš ï¸ Impossibile inviare DM o eliminare messaggio di {message.author.name}: permessi insufficienti.")
+                    self.bot.mod_log.send(f"âš ï¸ Impossibile inviare DM o eliminare messaggio di {message.author.name}: permessi insufficienti.")
             await self.bot.process_commands(message)
             return
 
         # Se non Ã¨ duplicato, aggiungi alla cache e procedi (assegnazione punti, ecc.)
-        self.message_cache[message.id] = {
-            'user_id': user_id,
-            'normalized': normalized_content,
-            'url': message_url,
-            'reactions': []
-        }
-
-        # Assegna punti e partecipazione per la submission (questo Ã¨ corretto)
-        c.execute('INSERT OR IGNORE INTO users (user_id) VALUES (?)', (user_id,))
-        c.execute('UPDATE users SET points = points + 10, participations = participations + 1 WHERE user_id = ?', (user_id,))
-        conn.commit()
-
-        # Registra evento settimanale per partecipazione
-        record_weekly_event(user_id, 'participation', points=10, message_id=message.id)
-
-        # registra nel DB tutti i link inviati da questo messaggio
-        from datetime import datetime as _dt
-        now_iso = _dt.now().isoformat()
-        if urls:
-            for raw in urls:
-                norm = self.normalize_url(raw)
-                add_submitted_link(norm, raw, user_id, message.id, now_iso)
-
-        from config import MULTIPLATFORM_BONUS_PER_EXTRA, MULTIPLATFORM_MAX_USES_PER_WEEK, MULTIPLATFORM_DOMAINS
-        from database import count_weekly_event_type
-
-        # Estrai tutti i domini presenti nel messaggio (case-insensitive)
-        found = set()
-        for domain in MULTIPLATFORM_DOMAINS:
-            if domain in message.content.lower():
-                found.add(domain)
-
-        platform_count = len(found)
-        if platform_count > 1:
-            extra = platform_count - 1
-            bonus_points = extra * MULTIPLATFORM_BONUS_PER_EXTRA
-
-            # Controllo: il bonus non deve essere stato giÃ  applicato per questo message_id (protezione "una sola volta per challenge")
-            c.execute('SELECT 1 FROM weekly_events WHERE user_id = ? AND event_type = ? AND message_id = ? LIMIT 1',
-                      (user_id, 'multiplatform_bonus', message.id))
-            if not c.fetchone():
-                # Controllo limite settimanale
-                used_this_week = count_weekly_event_type(user_id, 'multiplatform_bonus')
-                if used_this_week < MULTIPLATFORM_MAX_USES_PER_WEEK:
-                    # Applica bonus
-                    c.execute('UPDATE users SET points = points + ? WHERE user_id = ?', (bonus_points, user_id))
-                    conn.commit()
-                    record_weekly_event(user_id, 'multiplatform_bonus', points=bonus_points, message_id=message.id)
-                    if log_channel:
-                        await log_channel.send(f"âœ¨ **Bonus multipiattaforma**: +{bonus_points} punti a {message.author.mention} (+{extra} extra platform). (Uso {used_this_week+1}/{MULTIPLATFORM_MAX_USES_PER_WEEK} questa settimana)")
-                else:
-                    if log_channel:
-                        await log_channel.send(f"âš ï¸ {message.author.mention} ha raggiunto il limite settimanale per il Bonus multipiattaforma ({MULTIPLATFORM_MAX_USES_PER_WEEK}). Bonus non applicato.")
+        self.message_cache.add(message.id, user_id, normalized_content, message_url,
+                               created_at=message.created_at, simhash=fingerprint)
+
+        # Punteggio in un'unica transazione: submission, +10 e partecipazione, evento settimanale,
+        # link inviati e bonus multipiattaforma (con controllo "una sola volta" e limite settimanale)
+        from config import MULTIPLATFORM_MAX_USES_PER_WEEK
+        score = await score_submission(message.id, user_id, normalized_content, message_url, message.created_at,
+                                       list(zip(parsed.normalized_urls, urls)), len(parsed.platforms),
+                                       simhash=fingerprint, content=message.content)
+        if score is None:
+            self.message_cache.remove(message.id)
+            if log_channel:
+                self.bot.mod_log.send(f"âŒ Errore nel salvataggio della submission di {message.author.mention}: nessun punto assegnato.")
+            await self.bot.process_commands(message)
+            return
 
-                    # Invia DM all'utente informandolo che ha esaurito i bonus multipiattaforma
-                    try:
-                        dm_text = get_translation('multiplatform_limit_reached', locale, max_uses=MULTIPLATFORM_MAX_USES_PER_WEEK)
-                    except Exception:
-                        dm_text = f"Hai raggiunto il limite settimanale di {MULTIPLATFORM_MAX_USES_PER_WEEK} bonus multipiattaforma. Il bonus multipiattaforma non Ã¨ stato applicato per questo messaggio, ma i +10 punti di partecipazione sono giÃ  stati assegnati come da regolamento."
-                    try:
-                        await message.author.send(dm_text)
-                    except discord.Forbidden:
-                        if log_channel:
-                            await log_channel.send(f"âš ï¸ Impossibile inviare DM a {message.author.mention} per informarlo del limite multipiattaforma.")
+        if score.bonus_points:
+            if log_channel:
+                self.bot.mod_log.send(f"âœ¨ **Bonus multipiattaforma**: +{score.bonus_points} punti a {message.author.mention} (+{score.extra_platforms} extra platform). (Uso {score.bonus_uses}/{MULTIPLATFORM_MAX_USES_PER_WEEK} questa settimana)")
+        elif score.bonus_limit_reached:
+            if log_channel:
+                self.bot.mod_log.send(f"âš ï¸ {message.author.mention} ha raggiunto il limite settimanale per il Bonus multipiattaforma ({MULTIPLATFORM_MAX_USES_PER_WEEK}). Bonus non applicato.")
+
+            # Invia DM all'utente informandolo che ha esaurito i bonus multipiattaforma
+            try:
+                dm_text = get_translation('multiplatform_limit_reached', locale, max_uses=MULTIPLATFORM_MAX_USES_PER_WEEK)
+            except Exception:
+                dm_text = f"Hai raggiunto il limite settimanale di {MULTIPLATFORM_MAX_USES_PER_WEEK} bonus multipiattaforma. Il bonus multipiattaforma non Ã¨ stato applicato per questo messaggio, ma i +10 punti di partecipazione sono giÃ  stati assegnati come da regolamento."
+            try:
+                await message.author.send(dm_text)
+            except discord.Forbidden:
+                if log_channel:
+                    self.bot.mod_log.send(f"âš ï¸ Impossibile inviare DM a {message.author.mention} per informarlo del limite multipiattaforma.")
 
         await message.add_reaction('âœ…')  # SOLO IL BOT puÃ² aggiungere questa emoji
         if log_channel:
-            await log_channel.send(f'âœ… Utente {message.author.name} ha partecipato: +10 punti.')
+            self.bot.mod_log.send(f'âœ… Utente {message.author.name} ha partecipato: +{score.points} punti.')
 
         await self.bot.process_commands(message)
 
+    def is_bot_user(self, guild, user_id):
+        """True se user_id Ã¨ questo bot o un altro bot presente nella cache membri del server."""
+        if self.bot.user and user_id == self.bot.user.id:
+            return True
+        member = guild.get_member(user_id) if guild else None
+        return bool(member and member.bot)
+
+    async def resolve_submission_author(self, message_id):
+        """Autore di una submission: prima message_cache, poi la tabella submissions (anche oltre la cache)."""
+        entry = self.message_cache.get(message_id)
+        if entry is not None:
+            return entry['user_id']
+        return await get_submission_author(message_id)
+
     @commands.Cog.listener()
-    async def on_reaction_add(self, reaction, user):
+    async def on_raw_reaction_add(self, payload):
+        # Evento raw: arriva per qualsiasi messaggio, anche fuori dalla cache messaggi di discord.py
         self.bot.bot_status['reactions_processed'] += 1
         self.bot.bot_status['last_activity'] = datetime.now()
 
-        if user.bot:
+        user = payload.member
+        if payload.guild_id is None or user is None or user.bot:
             return
 
         log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
         from config import SPOTLIGHT_CHANNEL_ID  # assicurati sia importato in cima
+        emoji_str = str(payload.emoji)
 
         # BLOCCA REAZIONI AI MESSAGGI DEL BOT (eccetto spotlight)
-        if reaction.message.author.bot:
-            if reaction.message.channel.id == SPOTLIGHT_CHANNEL_ID:
+        if payload.message_author_id is not None and self.is_bot_user(user.guild, payload.message_author_id):
+            if payload.channel_id == SPOTLIGHT_CHANNEL_ID:
                 return  # gestione nel cog spotlight
             if log_channel:
                 try:
-                    await log_channel.send(f"ðŸš« **REAZIONE BLOCCATA**: {user.mention} ha tentato di reagire ({reaction.emoji}) a un messaggio del bot")
-                except Exception:
-                    pass
-            try:
-                await reaction.remove(user)
-            except Exception:
-                try:
-                    await reaction.clear()
+                    self.bot.mod_log.send(f"ðŸš« **REAZIONE BLOCCATA**: {user.mention} ha tentato di reagire ({emoji_str}) a un messaggio del bot")
                 except Exception:
                     pass
+            await remove_raw_reaction(self.bot, payload, user)
             return
 
         # BLOCCA EMOJI âœ… per tutti
-        if str(reaction.emoji) == 'âœ…':
+        if emoji_str == 'âœ…':
             if log_channel:
                 try:
-                    await log_channel.send(f"ðŸš« **EMOJI BLOCCATA**: {user.mention} ha tentato di usare âœ… (riservata al bot)")
-                except Exception:
-                    pass
-            try:
-                await reaction.remove(user)
-            except Exception:
-                try:
-                    await reaction.clear()
+                    self.bot.mod_log.send(f"ðŸš« **EMOJI BLOCCATA**: {user.mention} ha tentato di usare âœ… (riservata al bot)")
                 except Exception:
                     pass
+            await remove_raw_reaction(self.bot, payload, user)
             return
 
         # Processa solo nel canale submissions
-        if reaction.message.channel.id != SUBMISSIONS_CHANNEL_ID:
+        if payload.channel_id != SUBMISSIONS_CHANNEL_ID:
             return
 
         # Processa solo emoji valide
-        if reaction.emoji not in ['ðŸ’¯', 'ðŸ‘']:
+        if emoji_str not in ['ðŸ’¯', 'ðŸ‘']:
             return
 
+        # Autore dall'indice locale delle submission (fallback: autore indicato dall'evento)
+        message_id = payload.message_id
+        participant_id = await self.resolve_submission_author(message_id) or payload.message_author_id
+        if participant_id is None:
+            return
+        participant_mention = f"<@{participant_id}>"
+
         # Ignora self-vote
-        if user.id == reaction.message.author.id:
+        if user.id == participant_id:
             return
 
         # Ignora reazioni su messaggi duplicati
-        if reaction.message.id in self.message_cache and self.message_cache[reaction.message.id].get('is_duplicate', False):
+        if message_id in self.message_cache and self.message_cache[message_id].get('is_duplicate', False):
             return
 
-        participant_id = reaction.message.author.id
-        message_id = reaction.message.id
-        emoji_str = str(reaction.emoji)
-
         # Se l'utente ha giÃ  reagito ad un repost collegato a questo original, ignoralo (blocca doppio bonus cross-channel)
         try:
-            c.execute('''
-                SELECT 1 FROM reactions r
-                JOIN spotlight_reposts s ON r.message_id = s.spotlight_message_id
-                WHERE s.original_message_id = ? AND r.user_id = ?
-                LIMIT 1
-            ''', (message_id, user.id))
-            if c.fetchone():
+            already_on_repost = has_reacted_to_reposts(message_id, user.id)
+            if already_on_repost:
                 # L'utente ha giÃ  reagito al repost -> non assegnare bonus anche qui
                 if log_channel:
-                    await log_channel.send(f"ðŸš« Reazione ignorata: {user.mention} ha giÃ  reagito al repost relativo al messaggio {message_id}")
-                try:
-                    await reaction.remove(user)
-                except Exception:
-                    pass
+                    self.bot.mod_log.send(f"ðŸš« Reazione ignorata: {user.mention} ha giÃ  reagito al repost relativo al messaggio {message_id}")
+                await remove_raw_reaction(self.bot, payload, user)
                 return
         except Exception as e:
             logger.error(f"Errore controllo cross-channel reactions: {e}")
 
         # Controlla se l'utente ha giÃ  reagito allo stesso messaggio (duplicato)
         try:
-            c.execute('SELECT 1 FROM reactions WHERE message_id = ? AND user_id = ?', (message_id, user.id))
-            if c.fetchone():
+            if await has_reacted(message_id, user.id):
                 if log_channel:
-                    await log_channel.send(f"ðŸš« **Reazione ignorata**: {user.mention} ha giÃ  reagito al messaggio di {reaction.message.author.mention}")
+                    self.bot.mod_log.send(f"ðŸš« **Reazione ignorata**: {user.mention} ha giÃ  reagito al messaggio di {participant_mention}")
                 return
 
-            c.execute('INSERT OR IGNORE INTO users (user_id) VALUES (?)', (participant_id,))
-            conn.commit()
-
-            if log_channel:
-                await log_channel.send(f"âœ… **Reazione rilevata**: {reaction.emoji} da {user.mention} su messaggio di {reaction.message.author.mention}")
-
-            points_to_give = 0
-            reputation_to_give = 0
-
             if any(role.id in [FOUNDER_ROLE_ID, ADMIN_ROLE_ID] for role in user.roles):
-                points_to_give = 5
-                c.execute('UPDATE users SET points = points + 5 WHERE user_id = ?', (participant_id,))
-                record_weekly_event(participant_id, 'staff_bonus', points=5, message_id=message_id)
-                if log_channel:
-                    await log_channel.send(f"ðŸ‘‘ **Bonus Staff**: +5 punti a {reaction.message.author.mention}")
+                points_to_give, reputation_to_give, event_type = 5, 0, 'staff_bonus'
             else:
-                reputation_to_give = 1
-                c.execute('UPDATE users SET reputation = reputation + 1 WHERE user_id = ?', (participant_id,))
-                record_weekly_event(participant_id, 'community_bonus', reputation=1, message_id=message_id)
-                if log_channel:
-                    await log_channel.send(f"â­ **Bonus Community**: +1 reputazione a {reaction.message.author.mention}")
+                points_to_give, reputation_to_give, event_type = 0, 1, 'community_bonus'
+
+            # Utente, bonus, evento settimanale e riga in reactions in un'unica transazione
+            row = await record_reaction(message_id, user.id, participant_id, emoji_str,
+                                        points_to_give, reputation_to_give, event_type, message_id)
 
-            c.execute('''INSERT INTO reactions 
-                         (message_id, user_id, participant_id, emoji, points_given, reputation_given) 
-                         VALUES (?, ?, ?, ?, ?, ?)''', 
-                     (message_id, user.id, participant_id, emoji_str, points_to_give, reputation_to_give))
-            conn.commit()
+            if log_channel:
+                self.bot.mod_log.send(f"âœ… **Reazione rilevata**: {emoji_str} da {user.mention} su messaggio di {participant_mention}")
+                if points_to_give:
+                    self.bot.mod_log.send(f"ðŸ‘‘ **Bonus Staff**: +5 punti a {participant_mention}")
+                else:
+                    self.bot.mod_log.send(f"â­ **Bonus Community**: +1 reputazione a {participant_mention}")
 
             # Aggiorna badge se necessario (logica invariata)
-            c.execute('SELECT points, badges FROM users WHERE user_id = ?', (participant_id,))
-            row = c.fetchone()
             if row:
                 points, badges = row
                 badge_list = badges.split(',') if badges else []
@@ -409,42 +345,46 @@ class Events(commands.Cog):
                     updated = True
                 if updated:
                     new_badges = ','.join(badge_list)
-                    c.execute('UPDATE users SET badges = ? WHERE user_id = ?', (new_badges, participant_id))
-                    conn.commit()
+                    await execute('users.set_badges', (new_badges, participant_id))
                     if log_channel:
-                        await log_channel.send(f"ðŸ† **Nuovo Badge**: {reaction.message.author.mention} ha ottenuto: {new_badges}")
+                        self.bot.mod_log.send(f"ðŸ† **Nuovo Badge**: {participant_mention} ha ottenuto: {new_badges}")
 
         except Exception as e:
-            logger.error(f"Errore in on_reaction_add: {e}")
+            logger.error(f"Errore in on_raw_reaction_add: {e}")
             if log_channel:
                 try:
-                    await log_channel.send(f"âŒ **Errore aggiunta reazione**: {e}")
+                    self.bot.mod_log.send(f"âŒ **Errore aggiunta reazione**: {e}")
                 except Exception:
                     pass
 
     @commands.Cog.listener()
-    async def on_reaction_remove(self, reaction, user):
+    async def on_raw_reaction_remove(self, payload):
         self.bot.bot_status['reactions_processed'] += 1
         self.bot.bot_status['last_activity'] = datetime.now()
 
-        if user.bot:
+        # Nella rimozione l'evento raw non porta il Member: si usa la cache membri del server
+        guild = self.bot.get_guild(payload.guild_id) if payload.guild_id else None
+        if guild is None or self.is_bot_user(guild, payload.user_id):
             return
-        if reaction.message.author.bot:
+        emoji_str = str(payload.emoji)
+        if emoji_str == 'âœ…':
             return
-        if str(reaction.emoji) == 'âœ…':
+        if payload.channel_id != SUBMISSIONS_CHANNEL_ID:
             return
-        if reaction.message.channel.id != SUBMISSIONS_CHANNEL_ID:
+        if emoji_str not in ['ðŸ’¯', 'ðŸ‘']:
             return
-        if reaction.emoji not in ['ðŸ’¯', 'ðŸ‘']:
+        # I messaggi del bot non sono nell'indice delle submission: senza autore non c'è nulla da stornare
+        message_id = payload.message_id
+        participant_id = await self.resolve_submission_author(message_id)
+        if participant_id is None:
             return
-        if user.id == reaction.message.author.id:
+        if payload.user_id == participant_id:
             return
-        if reaction.message.id in self.message_cache and self.message_cache[reaction.message.id].get('is_duplicate', False):
+        if message_id in self.message_cache and self.message_cache[message_id].get('is_duplicate', False):
             return
 
-        participant_id = reaction.message.author.id
-        message_id = reaction.message.id
-        emoji_str = str(reaction.emoji)
+        participant_mention = f"<@{participant_id}>"
+        user_mention = f"<@{payload.user_id}>"
         log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
 
         # Aggiorna la cache delle reazioni locale
@@ -455,39 +395,23 @@ class Events(commands.Cog):
                 pass
 
         try:
-            c.execute('''SELECT emoji, points_given, reputation_given FROM reactions 
-                         WHERE message_id = ? AND user_id = ? AND emoji = ?''', 
-                     (message_id, user.id, emoji_str))
-            existing_reaction = c.fetchone()
+            # Riga in reactions, storno del bonus ed evento settimanale in un'unica transazione
+            removed = await remove_reaction(message_id, payload.user_id, emoji_str, participant_id,
+                                            'staff_bonus_removed', 'community_bonus_removed', message_id)
 
-            if not existing_reaction:
-                logger.debug(f"Rimozione ignorata: {user.name} non aveva una reazione registrata con emoji '{emoji_str}' per il messaggio {message_id}")
+            if not removed:
+                logger.debug(f"Rimozione ignorata: l'utente {payload.user_id} non aveva una reazione registrata con emoji '{emoji_str}' per il messaggio {message_id}")
                 return
 
-            emoji, points_given, reputation_given = existing_reaction
+            points_given, reputation_given, row = removed
             if log_channel:
-                await log_channel.send(f"ðŸ”» **Reazione rimossa**: {reaction.emoji} da {user.mention} su messaggio di {reaction.message.author.mention}")
-
-            c.execute('DELETE FROM reactions WHERE message_id = ? AND user_id = ? AND emoji = ?', 
-                     (message_id, user.id, emoji_str))
-
-            if points_given > 0:
-                c.execute('UPDATE users SET points = points - ? WHERE user_id = ?', (points_given, participant_id))
-                record_weekly_event(participant_id, 'staff_bonus_removed', points=-points_given, message_id=message_id)
-                if log_channel:
-                    await log_channel.send(f"ðŸ‘‘ **Bonus Staff rimosso**: -{points_given} punti a {reaction.message.author.mention}")
-
-            if reputation_given > 0:
-                c.execute('UPDATE users SET reputation = reputation - ? WHERE user_id = ?', (reputation_given, participant_id))
-                record_weekly_event(participant_id, 'community_bonus_removed', reputation=-reputation_given, message_id=message_id)
-                if log_channel:
-                    await log_channel.send(f"â­ **Bonus Community rimosso**: -{reputation_given} reputazione a {reaction.message.author.mention}")
-
-            conn.commit()
+                self.bot.mod_log.send(f"ðŸ”» **Reazione rimossa**: {emoji_str} da {user_mention} su messaggio di {participant_mention}")
+                if points_given > 0:
+                    self.bot.mod_log.send(f"ðŸ‘‘ **Bonus Staff rimosso**: -{points_given} punti a {participant_mention}")
+                if reputation_given > 0:
+                    self.bot.mod_log.send(f"â­ **Bonus Community rimosso**: -{reputation_given} reputazione a {participant_mention}")
 
             # Aggiorna badges se necessario (logica invariata)
-            c.execute('SELECT points, badges FROM users WHERE user_id = ?', (participant_id,))
-            row = c.fetchone()
             if row:
                 points, badges = row
                 badge_list = badges.split(',') if badges else []
@@ -500,15 +424,53 @@ class Events(commands.Cog):
                     updated = True
                 if updated:
                     new_badges = ','.join(badge_list)
-                    c.execute('UPDATE users SET badges = ? WHERE user_id = ?', (new_badges, participant_id))
-                    conn.commit()
+                    await execute('users.set_badges', (new_badges, participant_id))
                     if log_channel:
-                        await log_channel.send(f"ðŸ† **Badge aggiornati**: {reaction.message.author.mention} ora ha: {new_badges}")
+                        self.bot.mod_log.send(f"ðŸ† **Badge aggiornati**: {participant_mention} ora ha: {new_badges}")
 
         except Exception as e:
-            logger.error(f"Errore in on_reaction_remove: {e}")
+            logger.error(f"Errore in on_raw_reaction_remove: {e}")
             if log_channel:
-                await log_channel.send(f"âŒ **Errore rimozione reazione**: {e}")
+                self.bot.mod_log.send(f"âŒ **Errore rimozione reazione**: {e}")
+
+    # ---------- BACINO SPOTLIGHT ----------
+    # Le submission della settimana sono i candidati al repost spotlight (vedi Spotlight.repost_to_spotlight):
+    # eliminazioni e modifiche aggiornano la riga in submissions, la cache duplicati non cambia.
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        # Le reazioni di un messaggio eliminato non servono più al ledger, in qualsiasi canale
+        forget_messages([payload.message_id])
+        if payload.channel_id != SUBMISSIONS_CHANNEL_ID:
+            return
+        try:
+            await mark_submissions_ineligible([payload.message_id])
+        except Exception as e:
+            logger.error(f"Errore aggiornamento bacino spotlight (eliminazione {payload.message_id}): {e}")
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload):
+        forget_messages(payload.message_ids)
+        if payload.channel_id != SUBMISSIONS_CHANNEL_ID:
+            return
+        try:
+            await mark_submissions_ineligible(payload.message_ids)
+        except Exception as e:
+            logger.error(f"Errore aggiornamento bacino spotlight ({len(payload.message_ids)} eliminazioni): {e}")
+
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        if payload.channel_id != SUBMISSIONS_CHANNEL_ID:
+            return
+        content = payload.data.get('content')
+        # Gli aggiornamenti dell'anteprima dei link non cambiano il testo: niente scrittura
+        if content is None or (payload.cached_message is not None and payload.cached_message.content == content):
+            return
+        if payload.data.get('author', {}).get('bot'):
+            return
+        try:
+            await update_submission_content(payload.message_id, content, is_valid_submission(content))
+        except Exception as e:
+            logger.error(f"Errore aggiornamento bacino spotlight (modifica {payload.message_id}): {e}")
 
     @commands.Cog.listener()
     async def on_guild_join(self, guild):
@@ -53,7 +53,7 @@ class Leaderboard(commands.Cog):
                         if (now - lock_timestamp).total_seconds() < 24 * 3600:
                             logger.info("⚠️ Classifica già pubblicata oggi - skip")
                             if log_channel.permissions_for(log_channel.guild.me).send_messages:
-                                await log_channel.send("⚠️ Classifica già pubblicata oggi - skip")
+                                self.bot.mod_log.send("⚠️ Classifica già pubblicata oggi - skip")
                             return
                         else:
                             logger.info("🗑️ Rimosso file di lock obsoleto")
@@ -75,60 +75,60 @@ class Leaderboard(commands.Cog):
                     if not leaderboard_channel:
                         logger.error(f"Canale leaderboard non trovato: {LEADERBOARD_CHANNEL_ID}")
                         if log_channel.permissions_for(log_channel.guild.me).send_messages:
-                            await log_channel.send(f"❌ Canale leaderboard non trovato: {LEADERBOARD_CHANNEL_ID}")
+                            self.bot.mod_log.send(f"❌ Canale leaderboard non trovato: {LEADERBOARD_CHANNEL_ID}")
                         return
 
-                    week_start, week_end = get_week_boundaries()
+                    # Settimana che si chiude adesso: alle 20:00 get_week_boundaries() restituisce già la nuova
+                    week_start, week_end = get_week_boundaries(now - timedelta(minutes=1))
                     async for message in leaderboard_channel.history(limit=10):
                         if message.author == self.bot.user and message.embeds and "Leaderboard Settimanale" in message.embeds[0].title and "TEST" not in message.embeds[0].title:
                             logger.info("📚 Archiviazione classifica precedente...")
                             if log_channel.permissions_for(log_channel.guild.me).send_messages:
-                                await log_channel.send("📚 Archiviazione classifica precedente...")
+                                self.bot.mod_log.send("📚 Archiviazione classifica precedente...")
                             try:
                                 await archive_leaderboard(
                                     self.bot,
                                     message.embeds[0],
                                     week_start - timedelta(days=7),
                                     week_start,
-                                    len(get_weekly_leaderboard(week_start - timedelta(days=7), week_start))
+                                    len(await get_weekly_leaderboard(week_start - timedelta(days=7), week_start))
                                 )
                                 logger.info("✅ Classifica precedente archiviata con successo")
                                 if log_channel.permissions_for(log_channel.guild.me).send_messages:
-                                    await log_channel.send("✅ Classifica precedente archiviata con successo")
+                                    self.bot.mod_log.send("✅ Classifica precedente archiviata con successo")
                                 self.last_action = {"type": "archiviazione", "timestamp": now.isoformat()}
 
                                 if leaderboard_channel.permissions_for(leaderboard_channel.guild.me).manage_messages:
                                     await message.delete()
                                     logger.info("🗑️ Messaggio classifica precedente eliminato dal canale leaderboard")
                                     if log_channel.permissions_for(log_channel.guild.me).send_messages:
-                                        await log_channel.send("🗑️ Messaggio classifica precedente eliminato dal canale leaderboard")
+                                        self.bot.mod_log.send("🗑️ Messaggio classifica precedente eliminato dal canale leaderboard")
                                     self.last_action = {"type": "eliminazione", "timestamp": now.isoformat()}
                                 else:
                                     logger.error("Permessi insufficienti per eliminare il messaggio nel canale leaderboard")
                                     if log_channel.permissions_for(log_channel.guild.me).send_messages:
-                                        await log_channel.send("❌ Permessi insufficienti per eliminare il messaggio nel canale leaderboard")
+                                        self.bot.mod_log.send("❌ Permessi insufficienti per eliminare il messaggio nel canale leaderboard")
                             except Exception as e:
                                 logger.error(f"Errore nell'archiviazione o eliminazione: {e}")
                                 if log_channel.permissions_for(log_channel.guild.me).send_messages:
-                                    await log_channel.send(f"❌ Errore nell'archiviazione o eliminazione: {str(e)[:1000]}")
+                                    self.bot.mod_log.send(f"❌ Errore nell'archiviazione o eliminazione: {str(e)[:1000]}")
                             break
 
                     # Pubblicazione nuova classifica
-                    await self.publish_weekly_leaderboard(is_automatic=True)
+                    await self.publish_weekly_leaderboard(is_automatic=True, custom_week=(week_start, week_end))
                     logger.info("✅ Classifica pubblicata con successo")
                     self.last_action = {"type": "pubblicazione", "timestamp": now.isoformat()}
 
-                    # Reset dei punti
-                    week_start, week_end = get_week_boundaries()
-                    affected_rows = reset_weekly_metrics(week_start, week_end)
+                    # Reset dei punti della settimana appena chiusa
+                    affected_rows = await reset_weekly_metrics(week_start, week_end)
                     logger.info(f"♻️ Punti settimanali resettati per {week_start.strftime('%d/%m/%Y')} - {week_end.strftime('%d/%m/%Y')}, eventi archiviati: {affected_rows}")
                     if log_channel.permissions_for(log_channel.guild.me).send_messages:
-                        await log_channel.send(f"♻️ Punti settimanali resettati per {week_start.strftime('%d/%m/%Y')} - {week_end.strftime('%d/%m/%Y')}, eventi archiviati: {affected_rows}")
+                        self.bot.mod_log.send(f"♻️ Punti settimanali resettati per {week_start.strftime('%d/%m/%Y')} - {week_end.strftime('%d/%m/%Y')}, eventi archiviati: {affected_rows}")
                     self.last_action = {"type": "reset", "timestamp": now.isoformat()}
 
                     # Log dell'orario esatto di pubblicazione
                     if log_channel.permissions_for(log_channel.guild.me).send_messages:
-                        await log_channel.send(f"🎯 Pubblicazione completata alle {now.strftime('%H:%M:%S')} esatte!")
+                        self.bot.mod_log.send(f"🎯 Pubblicazione completata alle {now.strftime('%H:%M:%S')} esatte!")
 
                 except Exception as e:
                     if os.path.exists(lock_file):
@@ -137,7 +137,7 @@ class Leaderboard(commands.Cog):
                     self.last_publication_date = None
                     logger.error(f"Errore nella pubblicazione automatica: {e}")
                     if log_channel.permissions_for(log_channel.guild.me).send_messages:
-                        await log_channel.send(f"❌ Errore nella pubblicazione automatica: {str(e)[:1000]}")
+                        self.bot.mod_log.send(f"❌ Errore nella pubblicazione automatica: {str(e)[:1000]}")
                     raise e
             else:
                 logger.debug(f"Condizione pubblicazione non soddisfatta - Ora: {now.hour}:{now.minute}:{now.second}, Giorno: {now.weekday()}")
@@ -145,7 +145,7 @@ class Leaderboard(commands.Cog):
             logger.error(f"Errore nel task classifica settimanale: {e}")
             log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
             if log_channel and log_channel.permissions_for(log_channel.guild.me).send_messages:
-                await log_channel.send(f"❌ Errore task classifica settimanale: {str(e)[:1000]}")
+                self.bot.mod_log.send(f"❌ Errore task classifica settimanale: {str(e)[:1000]}")
 
     @tasks.loop(hours=72)  # Ogni 3 giorni
     async def status_update(self):
@@ -177,13 +177,13 @@ class Leaderboard(commands.Cog):
                 color=0x00FFFF
             )
             if log_channel.permissions_for(log_channel.guild.me).send_messages:
-                await log_channel.send(embed=embed)
+                self.bot.mod_log.send(embed=embed)
             logger.info("📢 Aggiornamento stato inviato con successo")
         except Exception as e:
             logger.error(f"Errore nell'aggiornamento stato: {e}")
             log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
             if log_channel and log_channel.permissions_for(log_channel.guild.me).send_messages:
-                await log_channel.send(f"❌ Errore nell'aggiornamento stato: {str(e)[:1000]}")
+                self.bot.mod_log.send(f"❌ Errore nell'aggiornamento stato: {str(e)[:1000]}")
 
     async def publish_weekly_leaderboard(self, is_automatic=True, custom_week=None, is_test=False):
         try:
@@ -192,7 +192,7 @@ class Leaderboard(commands.Cog):
             if not leaderboard_channel:
                 logger.error(f"Canale leaderboard non trovato: {LEADERBOARD_CHANNEL_ID}")
                 if log_channel and log_channel.permissions_for(log_channel.guild.me).send_messages:
-                    await log_channel.send(f"❌ Canale leaderboard non trovato: {LEADERBOARD_CHANNEL_ID}")
+                    self.bot.mod_log.send(f"❌ Canale leaderboard non trovato: {LEADERBOARD_CHANNEL_ID}")
                 return False
 
             if custom_week:
@@ -201,7 +201,7 @@ class Leaderboard(commands.Cog):
                 week_start, week_end = get_week_boundaries()
 
             logger.info(f"📊 Generazione classifica per periodo: {week_start} - {week_end}")
-            leaderboard_data = get_weekly_leaderboard(week_start, week_end)
+            leaderboard_data = await get_weekly_leaderboard(week_start, week_end)
             embed, winners = await create_leaderboard_embed(self.bot, leaderboard_data, week_start, week_end, is_test)
 
             message = await leaderboard_channel.send(embed=embed)
@@ -215,7 +215,7 @@ class Leaderboard(commands.Cog):
                     description=f"**Periodo:** {week_start.strftime('%d/%m/%Y')} - {week_end.strftime('%d/%m/%Y')}\n**Messaggio ID:** {message.id}",
                     color=0x00FF00
                 )
-                await log_channel.send(embed=log_embed)
+                self.bot.mod_log.send(embed=log_embed)
                 if is_automatic and not is_test:
                     self.last_action = {"type": "pubblicazione", "timestamp": datetime.now(ITALY_TZ).isoformat()}
 
@@ -224,7 +224,7 @@ class Leaderboard(commands.Cog):
         except Exception as e:
             logger.error(f"Errore nella pubblicazione: {e}")
             if log_channel and log_channel.permissions_for(log_channel.guild.me).send_messages:
-                await log_channel.send(f"❌ Errore pubblicazione classifica: {str(e)[:1000]}")
+                self.bot.mod_log.send(f"❌ Errore pubblicazione classifica: {str(e)[:1000]}")
             return False
 
     @app_commands.command(name="publish-leaderboard", description="Forza la pubblicazione della classifica settimanale")
@@ -298,7 +298,7 @@ class Leaderboard(commands.Cog):
         locale = str(interaction.locale)
         try:
             week_start, week_end = get_week_boundaries()
-            affected_rows = reset_weekly_metrics(week_start, week_end)
+            affected_rows = await reset_weekly_metrics(week_start, week_end)
             embed = discord.Embed(
                 title="♻️ Reset Settimanale",
                 description=f"Metriche settimanali resettate per {week_start.strftime('%d/%m/%Y')} - {week_end.strftime('%d/%m/%Y')}.\n**Eventi archiviati:** {affected_rows}",
@@ -313,7 +313,7 @@ class Leaderboard(commands.Cog):
                     description=f"**Eseguito da:** {interaction.user.name}\n**Periodo:** {week_start.strftime('%d/%m/%Y')} - {week_end.strftime('%d/%m/%Y')}\n**Eventi archiviati:** {affected_rows}",
                     color=0x00FF00
                 )
-                await log_channel.send(embed=log_embed)
+                self.bot.mod_log.send(embed=log_embed)
                 self.last_action = {"type": "reset manuale", "timestamp": datetime.now(ITALY_TZ).isoformat()}
 
         except Exception as e:
@@ -331,14 +331,12 @@ class Leaderboard(commands.Cog):
     @app_commands.checks.has_any_role(FOUNDER_ROLE_ID, ADMIN_ROLE_ID)
     async def get_leaderboard(self, interaction: discord.Interaction, settimana: str):
         locale = str(interaction.locale)
-        from database import c
+        from database import fetchall, fetchone
         await interaction.response.defer(ephemeral=True)
 
         try:
             if settimana.lower() == "lista":
-                c.execute('''SELECT id, week_start, week_end, participants_count, archived_at 
-                             FROM weekly_archives ORDER BY week_start DESC LIMIT 20''')
-                archives = c.fetchall()
+                archives = await fetchall('archives.list')
 
                 if not archives:
                     embed = discord.Embed(
@@ -373,9 +371,7 @@ class Leaderboard(commands.Cog):
             else:
                 try:
                     archive_id = int(settimana)
-                    c.execute('''SELECT week_start, week_end, embed_data, participants_count, archived_at, hall_of_fame_message_id
-                                 FROM weekly_archives WHERE id = ?''', (archive_id,))
-                    archive = c.fetchone()
+                    archive = await fetchone('archives.get', (archive_id,))
 
                     if not archive:
                         embed = discord.Embed(
@@ -451,27 +447,27 @@ class Leaderboard(commands.Cog):
                 self.weekly_leaderboard.start()
                 logger.info("📊 Task weekly_leaderboard avviato con successo")
                 if log_channel and log_channel.permissions_for(log_channel.guild.me).send_messages:
-                    await log_channel.send("📊 Task weekly_leaderboard avviato con successo")
+                    self.bot.mod_log.send("📊 Task weekly_leaderboard avviato con successo")
             else:
                 logger.info("📊 Task weekly_leaderboard già in esecuzione")
                 if log_channel and log_channel.permissions_for(log_channel.guild.me).send_messages:
-                    await log_channel.send("📊 Task weekly_leaderboard già in esecuzione")
+                    self.bot.mod_log.send("📊 Task weekly_leaderboard già in esecuzione")
 
             if not self.status_update.is_running():
                 self.status_update.start()
                 logger.info("📢 Task status_update avviato con successo")
                 if log_channel and log_channel.permissions_for(log_channel.guild.me).send_messages:
-                    await log_channel.send("📢 Task status_update avviato con successo")
+                    self.bot.mod_log.send("📢 Task status_update avviato con successo")
             else:
                 logger.info("📢 Task status_update già in esecuzione")
                 if log_channel and log_channel.permissions_for(log_channel.guild.me).send_messages:
-                    await log_channel.send("📢 Task status_update già in esecuzione")
+                    self.bot.mod_log.send("📢 Task status_update già in esecuzione")
 
         except Exception as e:
             logger.error(f"Errore in on_ready: {e}")
             log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
             if log_channel and log_channel.permissions_for(log_channel.guild.me).send_messages:
-                await log_channel.send(f"❌ Errore in on_ready: {str(e)[:1000]}")
+                self.bot.mod_log.send(f"❌ Errore in on_ready: {str(e)[:1000]}")
 
 async def setup(bot):
     logger.debug("🧪 Setup cog Leaderboard")
@@ -1,32 +1,58 @@
 # spotlight.py (aggiornato)
 import discord
 from discord.ext import commands, tasks
+from discord import app_commands
 import random
 from datetime import datetime, timedelta, time as dt_time
 import logging
 import asyncio
-import re
 from config import SUBMISSIONS_CHANNEL_ID, SPOTLIGHT_CHANNEL_ID, SPOTLIGHT_ARCHIVE_CHANNEL_ID, LOG_CHANNEL_ID, ITALY_TZ, BONUS_POINTS_WEIGHTS, BONUS_REPUTATION_WEIGHTS, FOUNDER_ROLE_ID, ADMIN_ROLE_ID, VIP_ROLE_ID, CHALLENGER_ROLE_ID
-from database import record_weekly_event, c, conn
+from config import SPOTLIGHT_SLOT_GRACE_MINUTES, SPOTLIGHT_SCHEDULER_MAX_SLEEP, SPOTLIGHT_ARCHIVE_CATCHUP_HOURS
+from config import SPOTLIGHT_ARCHIVE_MAX_BACKOFF_MINUTES
+from config import SPOTLIGHT_REACTION_WEIGHT, SPOTLIGHT_WAIT_WEIGHT, SPOTLIGHT_WAIT_WEEKS_CAP
+from config import SPOTLIGHT_SELECTION_SEED
+from database import record_reaction, remove_reaction
+from database import get_repost, has_reacted, has_reacted_to_reposts, add_spotlight_repost, delete_spotlight_week
+from database import get_fired_spotlight_slots, record_spotlight_slot, count_spotlight_slots, get_reposted_message_ids
+from database import sample_spotlight_candidates, get_spotlight_submission
+from database import update_submission_content, mark_submissions_ineligible
+from database import is_spotlight_archive_completed, start_spotlight_archive, complete_spotlight_archive
 from translations import get_translation
-from utils import get_week_boundaries
+from utils import get_week_boundaries, remove_raw_reaction
+from submission_parser import is_valid_submission, contains_url
+from spotlight_archive import archive_spotlight
+from spotlight_schedule import slots_for_date, slots_between, next_slot_after, upcoming_slots, period_for_date
 
 logger = logging.getLogger(__name__)
 
 class Spotlight(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # Stato ricostruito dal DB in on_ready (restore_state): dopo un riavvio limite giornaliero
+        # e repost della settimana restano quelli registrati
         self.repost_cache = set()  # Cache per evitare repost duplicati nella settimana (message.id)
         self.daily_repost_count = 0  # Contatore giornaliero
         self.last_repost_date = None  # Data dell'ultimo repost (data locale IT)
-        self.last_slot_datetime = None  # datetime dello slot eseguito per evitare ripetizioni
-        # Nota: last_slot_datetime è in timezone ITALY_TZ
+        self.state_restored = False
+        self.archived_deadline = None  # ultima scadenza domenicale già archiviata (evita query ogni minuto)
+        # Tentativi falliti dell'archiviazione in corso (vedi archive_failed)
+        self.archive_failure_run = None
+        self.archive_failures = 0
+        self.archive_retry_at = None
+        # Gli slot già eseguiti sono in spotlight_slots (vedi repost_scheduler)
 
     @commands.Cog.listener()
     async def on_ready(self):
-        if not self.repost_to_spotlight.is_running():
-            self.repost_to_spotlight.start()
-            logger.info("📢 Task repost_to_spotlight avviato in on_ready")
+        # Prima dell'avvio dello scheduler: il primo slot deve già vedere i contatori ripristinati
+        if not self.state_restored:
+            try:
+                await self.restore_state()
+                self.state_restored = True
+            except Exception as e:
+                logger.error(f"Errore ripristino stato spotlight: {e}")
+        if not self.repost_scheduler.is_running():
+            self.repost_scheduler.start()
+            logger.info("📢 Task repost_scheduler avviato in on_ready")
         if not self.weekly_spotlight_cleanup.is_running():
             self.weekly_spotlight_cleanup.start()
             logger.info("🗑️ Task weekly_spotlight_cleanup avviato in on_ready")
@@ -41,14 +67,13 @@ class Spotlight(commands.Cog):
         if message.channel.id != SPOTLIGHT_CHANNEL_ID:
             return
 
-        # Regex per qualsiasi URL
-        url_pattern = r'https?://\S+'
-        if re.search(url_pattern, message.content):
+        # Qualsiasi URL (regex precompilata nel parser)
+        if contains_url(message.content):
             try:
                 await message.delete()
                 log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
                 if log_channel:
-                    await log_channel.send(
+                    self.bot.mod_log.send(
                         f"🗑️ Messaggio con link rimosso in #⚡-spotlight da {message.author.mention}"
                     )
             except discord.Forbidden:
@@ -56,159 +81,87 @@ class Spotlight(commands.Cog):
             except Exception as e:
                 logger.error(f"Errore nell'eliminare messaggio con link in spotlight: {e}")
 
-    # ---------- SCHEDULING HELPERS ----------
-    def get_season(self, dt: datetime):
-        """Ritorna 'spring','summer','autumn','winter' basato sul mese.
-        Nota: mappatura standard:
-          - Mar-Apr-Mag => spring
-          - Jun-Jul-Aug => summer
-          - Sep-Oct-Nov => autumn
-          - Dec-Jan-Feb => winter
+    async def restore_state(self):
         """
-        m = dt.month
-        if m in (3, 4, 5):
-            return 'spring'
-        if m in (6, 7, 8):
-            return 'summer'
-        if m in (9, 10, 11):
-            return 'autumn'
-        return 'winter'
-
-    def time_tuples(self, hh_mm_list):
-        """Convert list of strings 'HH:MM' to list of (hour, minute) tuples."""
-        out = []
-        for s in hh_mm_list:
-            h, m = map(int, s.split(':'))
-            out.append((h, m))
-        return out
-
-    def get_schedule_for_date(self, date_dt: datetime):
-        """Genera la lista di slot (hour, minute) da eseguire per la data fornita (timezone IT).
-        Si applicano:
-          - Lunedì: slot specifici serali (5)
-          - Mart-Sab e Domenica: slot in base a stagione / sunday sets
-        NOTE/ASSUNZIONE SCUOLA:
-          - Ho interpretato 'Periodo scolastico: a partire dal 15 settembre' come
-            un override per il periodo scuola; per semplicità ho applicato
-            lo 'school period' dal 15 settembre fino al 30 giugno (incluso).
-            Se vuoi un periodo diverso, posso cambiarlo.
+        Ricostruisce repost_cache da spotlight_reposts (settimana corrente) e il contatore giornaliero
+        dagli slot di oggi con esito 'repost' in spotlight_slots. Gli slot rimasti 'in_corso' (processo
+        fermato tra riserva e salvataggio del repost) contano nel limite: il repost potrebbe essere uscito.
         """
-        weekday = date_dt.weekday()  # Mon=0 .. Sun=6
-        season = self.get_season(date_dt)
-        day = date_dt.day
-        month = date_dt.month
-        year = date_dt.year
-
-        # Converti orari in string lists per chiarezza
-        monday_slots = ['18:30', '19:30', '20:30', '21:30', '22:30']  # Lunedì: solo 5
-
-        # School period definition (assunzione): dal 15 Settembre fino al 30 Giugno
-        in_school_period = False
-        school_start = datetime(year, 9, 15, tzinfo=ITALY_TZ)
-        # school end = 30 June next year if date between Sep-Dec; else if date Jan-Jun treat as in range
-        # Per semplicità: se la data è >= Sep 15 dello stesso anno OR <= June 30 dello stesso anno
-        if date_dt >= school_start:
-            in_school_period = True
-        else:
-            # se siamo nei mesi Jan-Jun e la data <= June 30 dello stesso anno
-            if month in (1,2,3,4,5,6):
-                in_school_period = True
-
-        # Orari per Mart-Sab (school / normal) e per stagioni
-        school_tues_sat = ['07:30', '09:30', '12:30', '15:30', '17:00', '18:30', '19:30', '20:30', '22:00', '23:00']
-
-        summer_tues_sat = ['09:30', '11:30', '13:30', '15:30', '17:30', '19:00', '20:30', '22:00', '23:00', '23:45']
-        spring_tues_sat = ['07:30', '10:00', '12:30', '15:00', '17:00', '18:30', '19:30', '20:30', '22:00', '23:00']
-        autumn_tues_sat = ['07:30', '09:30', '12:30', '15:30', '17:30', '18:30', '19:30', '20:30', '21:30', '22:30']
-        winter_tues_sat = ['08:00', '11:30', '13:00', '15:30', '17:00', '18:30', '19:30', '20:30', '21:30', '22:30']
-
-        # Sunday per season
-        sunday_summer = ['10:00', '12:00', '14:30', '16:30', '17:30', '18:00']
-        sunday_spring = ['09:00', '11:00', '13:00', '15:30', '17:00', '18:00']
-        sunday_autumn = ['09:30', '11:30', '13:30', '15:30', '17:00', '18:00']
-        sunday_winter = ['10:00', '12:00', '14:00', '15:30', '17:00', '18:00']
-        sunday_school = ['09:30', '11:30', '13:30', '15:30', '17:00', '18:00']  # default sunday in school period (matches autumn)
-
-        schedule = []
-
-        if weekday == 0:  # Lunedì
-            schedule = monday_slots
-        elif weekday == 6:  # Domenica
-            # Domenica: scegli in base a season (o school)
-            if in_school_period:
-                schedule = sunday_school
-            else:
-                if season == 'summer':
-                    schedule = sunday_summer
-                elif season == 'spring':
-                    schedule = sunday_spring
-                elif season == 'autumn':
-                    schedule = sunday_autumn
-                else:
-                    schedule = sunday_winter
-        else:
-            # Martedì-Sabato
-            if in_school_period:
-                schedule = school_tues_sat
-            else:
-                if season == 'summer':
-                    schedule = summer_tues_sat
-                elif season == 'spring':
-                    schedule = spring_tues_sat
-                elif season == 'autumn':
-                    schedule = autumn_tues_sat
-                else:
-                    schedule = winter_tues_sat
+        now = datetime.now(ITALY_TZ)
+        week_start, _ = get_week_boundaries()
+        self.repost_cache = get_reposted_message_ids(week_start.isoformat())
+
+        day_start = ITALY_TZ.localize(datetime.combine(now.date(), dt_time(0, 0)))
+        day_end = ITALY_TZ.localize(datetime.combine(now.date() + timedelta(days=1), dt_time(0, 0)))
+        since_ts, until_ts = int(day_start.timestamp()), int(day_end.timestamp())
+        interrupted = await count_spotlight_slots(since_ts, until_ts, 'in_corso')
+        self.daily_repost_count = await count_spotlight_slots(since_ts, until_ts, 'repost') + interrupted
+        self.last_repost_date = now.date()
+        if interrupted:
+            logger.warning(f"{interrupted} slot spotlight di oggi interrotti durante il repost: non verranno ripetuti")
+        logger.info(f"📢 Stato spotlight ripristinato: {len(self.repost_cache)} repost in settimana, "
+                    f"{self.daily_repost_count} oggi")
+
+    # ---------- REPOST SCHEDULER ----------
+    @tasks.loop()
+    async def repost_scheduler(self):
+        """Esegue gli slot scaduti non ancora registrati in spotlight_slots, poi dorme fino al prossimo.
+           Dopo un riavvio recupera gli slot persi da non più di SPOTLIGHT_SLOT_GRACE_MINUTES.
+        """
+        try:
+            now = datetime.now(ITALY_TZ)
+            grace_start = now - timedelta(minutes=SPOTLIGHT_SLOT_GRACE_MINUTES)
+            fired = await get_fired_spotlight_slots(int(grace_start.timestamp()))
+
+            for slot in slots_between(grace_start, now):
+                slot_ts = int(slot.timestamp())
+                if slot_ts in fired:
+                    continue
+                delay = datetime.now(ITALY_TZ) - slot
+                if delay > timedelta(minutes=1):
+                    logger.warning(f"Recupero slot spotlight delle {slot.strftime('%H:%M')} (in ritardo di {int(delay.total_seconds() // 60)} min)")
+                status = await self.repost_to_spotlight(slot)
+                # Esito finale: sostituisce la riserva 'in_corso' (il repost riuscito l'ha già aggiornata)
+                await record_spotlight_slot(slot_ts, status, int(datetime.now(ITALY_TZ).timestamp()))
 
-        return self.time_tuples(schedule)
+            now = datetime.now(ITALY_TZ)
+            wake_at = now + timedelta(seconds=SPOTLIGHT_SCHEDULER_MAX_SLEEP)
+            next_slot = next_slot_after(now)
+            if next_slot is not None and next_slot < wake_at:
+                wake_at = next_slot
+                logger.debug(f"Prossimo slot spotlight: {next_slot.strftime('%Y-%m-%d %H:%M %Z')}")
+            await discord.utils.sleep_until(wake_at)
 
-    # ---------- REPOST TASK ----------
-    @tasks.loop(seconds=20)
-    async def repost_to_spotlight(self):
-        """Questo task controlla ogni 20s se l'orario corrente corrisponde a uno slot di repost.
-           Se sì, esegue esattamente 1 repost per quello slot (se disponibili messaggi validi)
+        except Exception as e:
+            logger.exception(f"Errore in repost_scheduler: {e}")
+            self.bot.mod_log.send(f"❌ Errore scheduler spotlight: {str(e)[:1000]}")
+            await asyncio.sleep(60)
+
+    @repost_scheduler.before_loop
+    async def before_repost_scheduler(self):
+        await self.bot.wait_until_ready()
+        logger.info("📢 Task repost_scheduler pronto")
+
+    async def repost_to_spotlight(self, slot: datetime):
+        """Esegue lo slot: esattamente 1 repost (se disponibili messaggi validi e se non si è al limite del giorno).
+           Ritorna l'esito registrato in spotlight_slots.
         """
         try:
-            if not self.bot.is_ready():
-                logger.debug("Bot non pronto, skip repost_to_spotlight")
-                return
-
             now = datetime.now(ITALY_TZ)
-            logger.debug(f"Controllo repost - ora IT: {now.strftime('%Y-%m-%d %H:%M:%S %Z')}")
 
             # Reset contatore giornaliero se nuovo giorno (ora IT)
-            if self.last_repost_date is None or self.last_repost_date != now.date():
+            if self.last_repost_date is None or self.last_repost_date != slot.date():
                 self.daily_repost_count = 0
-                self.last_repost_date = now.date()
+                self.last_repost_date = slot.date()
                 logger.info("Nuovo giorno rilevato: reset contatore repost giornaliero")
 
-            # Determina la schedule di oggi e il limite giornaliero
-            today_slots = self.get_schedule_for_date(now)
-            weekday = now.weekday()  # Mon=0..Sun=6
-            if weekday == 0:
-                day_limit = 5
-            elif weekday == 6:
-                day_limit = 6
-            else:
-                day_limit = 10
+            # Limite giornaliero = numero di slot del giorno (5 lunedì, 10 mar-sab, 6 domenica)
+            day_limit = len(slots_for_date(slot.date()))
 
             # Se limite giornaliero già raggiunto, non fare nulla oggi
             if self.daily_repost_count >= day_limit:
                 logger.debug(f"Limite giornaliero per oggi ({self.daily_repost_count}/{day_limit}) raggiunto. Skip.")
-                return
-
-            # Controlla se ora corrente corrisponde ad uno slot (hour, minute)
-            current_hm = (now.hour, now.minute)
-            if current_hm not in today_slots:
-                # non è uno slot programmato
-                return
-
-            # Evita esecuzione ripetuta nello stesso slot (possibile se il loop viene eseguito piu volte nello stesso minuto)
-            # Consideriamo last_slot_datetime già eseguito se coincide con la stessa data e stesso slot (hour+minute)
-            if self.last_slot_datetime and self.last_slot_datetime.astimezone(ITALY_TZ).date() == now.date():
-                if (self.last_slot_datetime.hour, self.last_slot_datetime.minute) == current_hm:
-                    logger.debug("Questo slot è già stato eseguito in questo minuto, skip per evitare duplicate.")
-                    return
+                return 'limite'
 
             # --- Se arrivati qui, è il momento di fare un repost per questo slot ---
             submissions_channel = self.bot.get_channel(SUBMISSIONS_CHANNEL_ID)
@@ -218,86 +171,73 @@ class Spotlight(commands.Cog):
             if not submissions_channel or not spotlight_channel:
                 logger.error("Canale submissions o spotlight non trovato")
                 if log_channel:
-                    await log_channel.send("❌ Errore: Canale submissions o spotlight non trovato per repost programmato.")
-                return
+                    self.bot.mod_log.send("❌ Errore: Canale submissions o spotlight non trovato per repost programmato.")
+                return 'canali_mancanti'
 
-            # Ottieni messaggi validi della settimana corrente
+            # Candidati della settimana dalla tabella submissions, tenuta aggiornata da Events (invio,
+            # modifica, eliminazione): nessuna lettura dello storico del canale e nessun limite di 500 messaggi
             week_start, week_end = get_week_boundaries()
-            valid_messages = []
-
-            # Raccogli utenti già repostati questa settimana (per il vincolo '1 repost a settimana per utente')
-            c.execute('SELECT user_id FROM spotlight_reposts WHERE week_start = ?', (week_start.isoformat(),))
-            reposted_users_rows = c.fetchall()
-            reposted_users_this_week = set(r[0] for r in reposted_users_rows) if reposted_users_rows else set()
-
-            async for message in submissions_channel.history(limit=500):
-                # condizioni: hashtag, link a social, entro la settimana, non repostato prima (cache) e autore non abbia già repost in settimana
-                content = (message.content or "").lower()
-                has_hashtag = any(hashtag in content for hashtag in ['#trendduelofficial', '#trendduelchallenge'])
-                has_valid_link = any(domain in content for domain in ['instagram.com', 'tiktok.com', 'youtube.com'])
-                # message.created_at è UTC naive/aware: convertire in timezone IT
-                try:
-                    created_local = message.created_at.astimezone(ITALY_TZ)
-                except Exception:
-                    # fallback: assume naive UTC and replace tzinfo
-                    created_local = message.created_at.replace(tzinfo=ITALY_TZ)
-
-                is_within_week = created_local >= week_start
-                is_not_in_cache = message.id not in self.repost_cache
-                author_not_reposted_this_week = message.author.id not in reposted_users_this_week
-
-                if has_hashtag and has_valid_link and is_within_week and is_not_in_cache and author_not_reposted_this_week:
-                    valid_messages.append(message)
-
-            if not valid_messages:
+            rng = self.selection_rng(slot)
+            weight = self.candidate_weight(now)
+
+            # Bacino letto una volta sola e ordinato per estrazione pesata; si scorre in memoria fino al
+            # primo messaggio ancora idoneo, con autore nel server e testo disponibile
+            candidates = await sample_spotlight_candidates(week_start, k=None, weight=weight, rng=rng,
+                                                           exclude=self.repost_cache)
+            selected = None
+            for candidate_id, author_id, _, _, _ in candidates:
+                author = submissions_channel.guild.get_member(author_id)
+                if author is None:
+                    continue
+                # Stato attuale della submission: può essere stata modificata o eliminata dopo la lettura
+                state = await get_spotlight_submission(candidate_id)
+                if state is None or not state[1]:
+                    continue
+                content = state[0]
+                if content is None:
+                    content = await self.fetch_candidate_content(submissions_channel, candidate_id)
+                    if content is None:
+                        continue
+                selected = (candidate_id, author, content)
+                break
+
+            if selected is None:
                 logger.info("Nessun messaggio valido disponibile per questo slot.")
                 if log_channel:
-                    await log_channel.send("⚠️ Nessun messaggio valido disponibile per il repost programmato in #📝-submissions.")
-                # Aggiorniamo last_slot_datetime comunque per evitare ripetizioni nello stesso minuto
-                self.last_slot_datetime = now
-                return
+                    self.bot.mod_log.send("⚠️ Nessun messaggio valido disponibile per il repost programmato in #📝-submissions.")
+                return 'nessun_candidato'
+            selected_id, author, content = selected
 
-            # Seleziona un messaggio (random)
-            random.shuffle(valid_messages)
-            selected_message = valid_messages[0]
+            # Slot riservato prima dell'invio: se il processo si ferma da qui al salvataggio del repost,
+            # al riavvio lo slot risulta già eseguito e non viene ripetuto (niente repost doppi)
+            await record_spotlight_slot(int(slot.timestamp()), 'in_corso', int(now.timestamp()))
 
-            # --- ASSEGNA BONUS CASUALE (come nella logica originale) ---
-            user_id = selected_message.author.id
-            bonus_type = random.choice(['points', 'reputation'])
+            # --- ESTRAI BONUS CASUALE (come nella logica originale) ---
+            # Viene assegnato solo dopo l'invio, insieme al salvataggio del repost
+            bonus_type = rng.choice(['points', 'reputation'])
 
             if bonus_type == 'points':
                 amounts = [3, 4, 5, 6, 7]
                 weights = [0.35, 0.35, 0.1, 0.1, 0.1]
-                bonus = random.choices(amounts, weights=weights)[0]
-                c.execute('UPDATE users SET points = points + ? WHERE user_id = ?', (bonus, user_id))
-                record_weekly_event(user_id, 'spotlight_bonus_points', points=bonus, message_id=selected_message.id)
-                if log_channel:
-                    await log_channel.send(f"🎁 Bonus punti spotlight: +{bonus} a {selected_message.author.mention}")
             else:
                 amounts = [1, 2, 3, 4, 5]
                 weights = [0.35, 0.35, 0.1, 0.1, 0.1]
-                bonus = random.choices(amounts, weights=weights)[0]
-                c.execute('UPDATE users SET reputation = reputation + ? WHERE user_id = ?', (bonus, user_id))
-                record_weekly_event(user_id, 'spotlight_bonus_reputation', reputation=bonus, message_id=selected_message.id)
-                if log_channel:
-                    await log_channel.send(f"🎁 Bonus reputazione spotlight: +{bonus} a {selected_message.author.mention}")
-
-            conn.commit()
+            bonus = rng.choices(amounts, weights=weights)[0]
 
             # --- COSTRUISCI EMBED SPOTLIGHT ---
             embed = discord.Embed(
                 title="⚡ TrendDuel Spotlight",
-                description=f"{selected_message.content}\n\n✨ Lanciata da {selected_message.author.mention}",
+                description=f"{content}\n\n✨ Lanciata da {author.mention}",
                 color=discord.Color.from_rgb(138, 43, 226),
                 timestamp=datetime.now(ITALY_TZ)
             )
 
-            roles = [r for r in selected_message.author.roles if r.name not in ["@everyone"]]
+            roles = [r for r in author.roles if r.name not in ["@everyone"]]
             main_role = roles[-1].name if roles else "Challenger"
 
             embed.set_author(
-                name=f"{selected_message.author.display_name} · {main_role}",
-                icon_url=selected_message.author.display_avatar.url
+                name=f"{author.display_name} · {main_role}",
+                icon_url=author.display_avatar.url
             )
 
             embed.set_footer(text="🔥 Challenge the world, conquer the hype.")
@@ -310,122 +250,208 @@ class Spotlight(commands.Cog):
             # Invia l’embed nel canale spotlight
             repost_message = await spotlight_channel.send(embed=embed)
 
-            # Salva nel database
+            # Salva repost, bonus e slot in un'unica transazione: se l'invio o il salvataggio falliscono
+            # l'autore non riceve il bonus
             now_iso = now.isoformat()
-            c.execute(
-                '''INSERT INTO spotlight_reposts 
-                   (original_message_id, spotlight_message_id, user_id, week_start, timestamp)
-                   VALUES (?, ?, ?, ?, ?)''',
-                (selected_message.id, repost_message.id, selected_message.author.id,
-                 week_start.isoformat(), now_iso)
-            )
-            conn.commit()
+            await add_spotlight_repost(selected_id, repost_message.id, author.id,
+                                       week_start.isoformat(), now_iso, slot_ts=int(slot.timestamp()),
+                                       bonus_points=bonus if bonus_type == 'points' else 0,
+                                       bonus_reputation=bonus if bonus_type == 'reputation' else 0)
+            if log_channel:
+                if bonus_type == 'points':
+                    self.bot.mod_log.send(f"🎁 Bonus punti spotlight: +{bonus} a {author.mention}")
+                else:
+                    self.bot.mod_log.send(f"🎁 Bonus reputazione spotlight: +{bonus} a {author.mention}")
 
-            # Aggiorna cache, contatori e last_slot_datetime
-            self.repost_cache.add(selected_message.id)
+            # Aggiorna cache e contatori
+            self.repost_cache.add(selected_id)
             self.daily_repost_count += 1
-            self.last_slot_datetime = now
 
-            logger.info(f"Repost effettuato (slot): {selected_message.id} -> {repost_message.id} | Count oggi: {self.daily_repost_count}/{day_limit}")
+            logger.info(f"Repost effettuato (slot {slot.strftime('%H:%M')}): {selected_id} -> {repost_message.id} | Count oggi: {self.daily_repost_count}/{day_limit}")
+            return 'repost'
 
         except Exception as e:
             logger.exception(f"Errore in repost_to_spotlight: {e}")
             log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
             if log_channel:
-                await log_channel.send(f"❌ Errore repost spotlight: {str(e)[:1000]}")
+                self.bot.mod_log.send(f"❌ Errore repost spotlight: {str(e)[:1000]}")
+            # Lo slot resta segnato come eseguito: riprovarlo rischierebbe un repost doppio
+            return 'errore'
+
+    def selection_rng(self, slot: datetime):
+        """RNG dello slot: con SPOTLIGHT_SELECTION_SEED la scelta (e il bonus) di ogni slot è riproducibile."""
+        if SPOTLIGHT_SELECTION_SEED is None:
+            return random.Random()
+        return random.Random(f"{SPOTLIGHT_SELECTION_SEED}:{int(slot.timestamp())}")
+
+    def candidate_weight(self, now: datetime):
+        """Funzione peso per sample_spotlight_candidates (None = uniforme, vedi config)."""
+        if not SPOTLIGHT_REACTION_WEIGHT and not SPOTLIGHT_WAIT_WEIGHT:
+            return None
+        now_ts = now.timestamp()
+
+        def weight(row):
+            _, _, _, reactions, last_spotlight = row
+            if last_spotlight is None:
+                weeks_waited = SPOTLIGHT_WAIT_WEEKS_CAP
+            else:
+                weeks_waited = min((now_ts - last_spotlight) / (7 * 24 * 3600), SPOTLIGHT_WAIT_WEEKS_CAP)
+            return 1 + SPOTLIGHT_REACTION_WEIGHT * reactions + SPOTLIGHT_WAIT_WEIGHT * weeks_waited
+        return weight
+
+    async def fetch_candidate_content(self, submissions_channel, message_id):
+        """
+        Testo di una submission salvata prima che submissions conservasse il contenuto: letto da Discord
+        una sola volta e poi salvato. None se il messaggio non esiste più o non è più valido.
+        """
+        try:
+            message = await submissions_channel.fetch_message(message_id)
+        except discord.NotFound:
+            await mark_submissions_ineligible([message_id])
+            return None
+        except discord.HTTPException as e:
+            logger.warning(f"Impossibile leggere la submission {message_id} per lo spotlight: {e}")
+            return None
+        valid = is_valid_submission(message.content)
+        await update_submission_content(message_id, message.content, valid)
+        return message.content if valid else None
 
     # ---------- WEEKLY CLEANUP (archiviazione) ----------
+    def last_archive_deadline(self, now: datetime):
+        """Ultima scadenza di archiviazione (domenica 20:00 IT) non successiva a now."""
+        sunday = now.date() - timedelta(days=(now.weekday() + 1) % 7)
+        deadline = ITALY_TZ.localize(datetime.combine(sunday, dt_time(20, 0)))
+        if deadline > now:
+            deadline = ITALY_TZ.localize(datetime.combine(sunday - timedelta(days=7), dt_time(20, 0)))
+        return deadline
+
     @tasks.loop(minutes=1)
     async def weekly_spotlight_cleanup(self):
+        """Archivia lo spotlight alla scadenza della domenica 20:00, o appena possibile entro
+           SPOTLIGHT_ARCHIVE_CATCHUP_HOURS se il bot era offline; un'esecuzione interrotta riprende dal checkpoint.
+           Dopo un errore i tentativi si diradano (vedi archive_failed).
+        """
+        run_id = None
         try:
             now = datetime.now(ITALY_TZ)
-            logger.debug(f"🗑️ Controllo cleanup spotlight - Ora: {now.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-
-            # Condizione regolare: Domenica 20:00 (ora italiana)
-            is_regular = now.weekday() == 6 and now.hour == 20 and now.minute == 0
+            deadline = self.last_archive_deadline(now)
+            if deadline == self.archived_deadline:
+                return
+            run_id = int(deadline.timestamp())
+            if self.archive_failure_run == run_id and now < self.archive_retry_at:
+                return
+            if now - deadline > timedelta(hours=SPOTLIGHT_ARCHIVE_CATCHUP_HOURS) or await is_spotlight_archive_completed(run_id):
+                self.archived_deadline = deadline
+                return
 
-            # Condizione test: (lasciata per compatibilità con testing)
-            is_test = (
-                now.year == 2025 and now.month == 9 and now.day == 12
-                and now.hour == 12 and now.minute == 50
-            )
+            if now - deadline > timedelta(minutes=2):
+                logger.warning(f"🚀 Recupero archiviazione spotlight della scadenza {deadline.strftime('%Y-%m-%d %H:%M')}")
+            else:
+                logger.warning("🚀 Avvio archiviazione spotlight")
 
-            if is_test or is_regular:
-                logger.warning("🚀 Avvio archiviazione spotlight (condizione test o regolare attivata)")
+            spotlight_channel = self.bot.get_channel(SPOTLIGHT_CHANNEL_ID)
+            archive_channel = self.bot.get_channel(SPOTLIGHT_ARCHIVE_CHANNEL_ID)
+            log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
 
-                spotlight_channel = self.bot.get_channel(SPOTLIGHT_CHANNEL_ID)
-                archive_channel = self.bot.get_channel(SPOTLIGHT_ARCHIVE_CHANNEL_ID)
-                log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
+            if not spotlight_channel or not archive_channel:
+                self.archive_failed(run_id, "Canali spotlight o archive non trovati")
+                return
 
-                if not spotlight_channel or not archive_channel:
-                    logger.error("Canali spotlight o archive non trovati")
-                    if log_channel:
-                        await log_channel.send("❌ Canali spotlight o archive non trovati")
-                    return
-
-                messages_archived = 0
-                async for message in spotlight_channel.history(limit=None, oldest_first=True):
-                    try:
-                        if message.content and message.embeds:
-                            await archive_channel.send(content=message.content, embeds=message.embeds)
-                        elif message.content:
-                            await archive_channel.send(content=message.content)
-                        elif message.embeds:
-                            await archive_channel.send(embeds=message.embeds)
-                        else:
-                            # Evita errore "Cannot send an empty message"
-                            logger.warning(f"Messaggio {message.id} ignorato: nessun contenuto né embed")
-                            continue
-
-                        await message.delete()
-                        messages_archived += 1
-                    except Exception as e:
-                        logger.error(f"Errore archiviazione messaggio {message.id}: {e}")
-
-                # Pulisci database e cache
-                week_start, _ = get_week_boundaries()
-                c.execute('DELETE FROM spotlight_reposts WHERE week_start = ?', (week_start.isoformat(),))
-                conn.commit()
-
-                self.repost_cache.clear()
-                self.daily_repost_count = 0
-                self.last_slot_datetime = None
+            await start_spotlight_archive(run_id, int(now.timestamp()))
+            # Solo i messaggi della settimana chiusa: in un recupero quelli dopo la scadenza restano
+            report = await archive_spotlight(spotlight_channel, archive_channel, deadline, run_id)
+            if report.failed:
+                # Gli originali non copiati o non eliminati restano nel canale: ritentati al prossimo tentativo
+                self.archive_failed(run_id, f"Archiviazione spotlight incompleta: {report.failed} messaggi con errori")
+                return
 
-                logger.info(f"🗑️ Cleanup spotlight completato: {messages_archived} messaggi archiviati")
-                if log_channel:
-                    await log_channel.send(
-                        f"🗑️ Cleanup spotlight completato: {messages_archived} messaggi archiviati in #📦-spotlight-archive"
-                    )
+            # Pulisci database e cache (week_start come lo calcola get_week_boundaries alla scadenza)
+            week_start, _ = get_week_boundaries(deadline - timedelta(minutes=1))
+            await delete_spotlight_week(week_start.isoformat())
+            await complete_spotlight_archive(run_id, int(datetime.now(ITALY_TZ).timestamp()))
+            self.archived_deadline = deadline
+            self.archive_failure_run = None
+            await self.restore_state()
+
+            rate = (report.archived + report.resumed) / report.elapsed if report.elapsed else 0.0
+            summary = (f"{report.archived} messaggi archiviati ({report.resumed} ripresi da un'esecuzione interrotta) "
+                       f"in {report.elapsed:.1f}s, {rate:.1f} msg/s: {report.sends} invii, "
+                       f"{report.bulk_deletes} eliminazioni in blocco")
+            logger.info(f"🗑️ Cleanup spotlight completato: {summary}")
+            if log_channel:
+                self.bot.mod_log.send(f"🗑️ Cleanup spotlight completato in #📦-spotlight-archive: {summary}")
 
         except Exception as e:
             logger.exception(f"Errore in weekly_spotlight_cleanup: {e}")
-            log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
-            if log_channel:
-                await log_channel.send(f"❌ Errore rimozione reazione spotlight: {str(e)[:1000]}")
+            if run_id is not None:
+                self.archive_failed(run_id, f"Errore archiviazione spotlight: {str(e)[:1000]}")
+
+    def archive_failed(self, run_id, reason):
+        """
+        Pianifica il prossimo tentativo dell'archiviazione run_id con attesa esponenziale (1, 2, 4...
+        minuti, al massimo SPOTLIGHT_ARCHIVE_MAX_BACKOFF_MINUTES); l'avviso in mod-log parte una volta per esecuzione.
+        """
+        if self.archive_failure_run != run_id:
+            self.archive_failure_run = run_id
+            self.archive_failures = 0
+        self.archive_failures += 1
+        delay = min(2 ** (self.archive_failures - 1), SPOTLIGHT_ARCHIVE_MAX_BACKOFF_MINUTES)
+        self.archive_retry_at = datetime.now(ITALY_TZ) + timedelta(minutes=delay)
+        logger.error(f"{reason} (tentativo {self.archive_failures}, prossimo tra {delay} min)")
+        if self.archive_failures == 1 and self.bot.get_channel(LOG_CHANNEL_ID):
+            self.bot.mod_log.send(f"⚠️ {reason}: nuovi tentativi automatici con attesa crescente fino a "
+                                  f"{SPOTLIGHT_ARCHIVE_MAX_BACKOFF_MINUTES} min, senza altri avvisi")
 
     @weekly_spotlight_cleanup.before_loop
     async def before_weekly_spotlight_cleanup(self):
         await self.bot.wait_until_ready()
         logger.info("🗑️ Task weekly_spotlight_cleanup pronto")
 
+    # ---------- /spotlight-schedule ----------
+    @app_commands.command(name="spotlight-schedule", description="Mostra i prossimi slot dei repost spotlight")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.checks.has_any_role(FOUNDER_ROLE_ID, ADMIN_ROLE_ID)
+    async def spotlight_schedule(self, interaction: discord.Interaction):
+        locale = str(interaction.locale)
+        now = datetime.now(ITALY_TZ)
+        day_limit = len(slots_for_date(now.date()))
+        reposts_today = self.daily_repost_count if self.last_repost_date == now.date() else 0
+
+        embed = discord.Embed(
+            title=get_translation('spotlight_schedule_title', locale),
+            description=get_translation('spotlight_schedule_description', locale,
+                                        period=period_for_date(now.date()), count=reposts_today, limit=day_limit),
+            color=discord.Color.from_rgb(138, 43, 226)
+        )
+        lines = []
+        for slot in upcoming_slots(now, 12):
+            lines.append(f"{slot.strftime('%a %d/%m %H:%M')}  ({period_for_date(slot.date())})")
+        if lines:
+            embed.add_field(name="⏰", value="```\n" + "\n".join(lines) + "\n```", inline=False)
+        else:
+            embed.add_field(name="📭", value=get_translation('spotlight_schedule_empty', locale), inline=False)
+
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
     # ---------- REACTIONS HANDLERS (invariati - mantenuti dalla versione originale) ----------
     @commands.Cog.listener()
-    async def on_reaction_add(self, reaction, user):
-        if reaction.message.channel.id != SPOTLIGHT_CHANNEL_ID or user.bot:
+    async def on_raw_reaction_add(self, payload):
+        # Evento raw: copre anche i repost non più nella cache messaggi; autore e originale da spotlight_reposts
+        user = payload.member
+        if payload.channel_id != SPOTLIGHT_CHANNEL_ID or user is None or user.bot:
             return
+        spotlight_message_id = payload.message_id
 
         log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
         try:
             # Ottieni informazioni sul messaggio originale
-            c.execute('SELECT original_message_id, user_id FROM spotlight_reposts WHERE spotlight_message_id = ?', 
-                      (reaction.message.id,))
-            result = c.fetchone()
+            result = get_repost(spotlight_message_id)
             if not result:
-                logger.debug(f"Nessun repost trovato per messaggio spotlight {reaction.message.id}")
+                logger.debug(f"Nessun repost trovato per messaggio spotlight {spotlight_message_id}")
                 return
 
             original_message_id, participant_id = result
-            emoji_str = str(reaction.emoji)
+            emoji_str = str(payload.emoji)
 
             # Verifica emoji valida
             if emoji_str not in ['💯', '👍']:
@@ -433,116 +459,61 @@ class Spotlight(commands.Cog):
 
             # Verifica no self-vote
             if user.id == participant_id:
-                try:
-                    await reaction.remove(user)
-                except Exception:
-                    pass
+                await remove_raw_reaction(self.bot, payload, user)
                 await user.send(get_translation('duplicate_message', 'en'))
                 if log_channel:
-                    await log_channel.send(f"⚠️ Tentativo di self-vote da {user.mention} su messaggio {reaction.message.id}")
+                    self.bot.mod_log.send(f"⚠️ Tentativo di self-vote da {user.mention} su messaggio {spotlight_message_id}")
                 return
 
             # Verifica no doppia reazione sullo stesso repost
-            c.execute('SELECT emoji FROM reactions WHERE message_id = ? AND user_id = ?',
-                      (reaction.message.id, user.id))
-            existing_reaction = c.fetchone()
+            existing_reaction = await has_reacted(spotlight_message_id, user.id)
             if existing_reaction:
-                try:
-                    await reaction.remove(user)
-                except Exception:
-                    pass
+                await remove_raw_reaction(self.bot, payload, user)
                 await user.send(get_translation('duplicate_reaction_spotlight', 'en'))
                 if log_channel:
-                    await log_channel.send(f"⚠️ Doppia reazione di {user.mention} su messaggio {reaction.message.id}")
+                    self.bot.mod_log.send(f"⚠️ Doppia reazione di {user.mention} su messaggio {spotlight_message_id}")
                 return
 
             # Verifica se l'utente ha già reagito al messaggio originale in submissions
-            c.execute('SELECT 1 FROM reactions WHERE message_id = ? AND user_id = ? LIMIT 1',
-                      (original_message_id, user.id))
-            if c.fetchone():
-                try:
-                    await reaction.remove(user)
-                except Exception:
-                    pass
+            if await has_reacted(original_message_id, user.id):
+                await remove_raw_reaction(self.bot, payload, user)
                 await user.send(get_translation('duplicate_reaction_spotlight', 'en'))
                 if log_channel:
-                    await log_channel.send(
-                        f"🚫 {user.mention} ha già reagito al messaggio originale {original_message_id}, quindi non può reagire anche al repost {reaction.message.id}"
+                    self.bot.mod_log.send(
+                        f"🚫 {user.mention} ha già reagito al messaggio originale {original_message_id}, quindi non può reagire anche al repost {spotlight_message_id}"
                     )
                 return
 
             # Verifica se l'utente ha già reagito a QUALSIASI repost collegato a questa original_message_id
-            c.execute('''
-                SELECT 1 FROM reactions r
-                JOIN spotlight_reposts s ON r.message_id = s.spotlight_message_id
-                WHERE s.original_message_id = ? AND r.user_id = ?
-                LIMIT 1
-            ''', (original_message_id, user.id))
-            if c.fetchone():
-                try:
-                    await reaction.remove(user)
-                except Exception:
-                    pass
+            if has_reacted_to_reposts(original_message_id, user.id):
+                await remove_raw_reaction(self.bot, payload, user)
                 await user.send(get_translation('duplicate_reaction_spotlight', 'en'))
                 if log_channel:
-                    await log_channel.send(
+                    self.bot.mod_log.send(
                         f"🚫 {user.mention} ha già reagito a un repost collegato al messaggio {original_message_id}, non può reagire a un altro repost."
                     )
                 return
 
-            # Recupera il Member per controllare ruoli in modo sicuro
-            guild = reaction.message.guild
-            member = None
-            if guild:
-                member = guild.get_member(user.id)
-                if member is None:
-                    try:
-                        member = await guild.fetch_member(user.id)
-                    except Exception:
-                        member = None
+            # L'evento raw porta già il Member: i ruoli si leggono senza fetch
+            guild = user.guild
 
             # Determina bonus in base al ruolo (ruolo determina BONUS, non l'emoji)
-            is_staff = False
-            if member:
-                is_staff = any(role.id in [FOUNDER_ROLE_ID, ADMIN_ROLE_ID] for role in member.roles)
+            is_staff = any(role.id in [FOUNDER_ROLE_ID, ADMIN_ROLE_ID] for role in user.roles)
 
             points_to_add = 5 if is_staff else 0
             reputation_to_add = 0 if is_staff else 1
 
             # Se nessun bonus (es. ruoli particolari), ignora
             if points_to_add == 0 and reputation_to_add == 0:
-                try:
-                    await reaction.remove(user)
-                except Exception:
-                    pass
+                await remove_raw_reaction(self.bot, payload, user)
                 return
 
             event_type = 'staff_reaction_spotlight' if is_staff else 'community_reaction_spotlight'
 
-            # Salva participations correnti per prevenire incrementi accidentali da record_weekly_event
-            c.execute('SELECT participations FROM users WHERE user_id = ?', (participant_id,))
-            row = c.fetchone()
-            prev_participations = row[0] if row and row[0] is not None else 0
-
-            # Registra la reazione
-            c.execute('INSERT OR REPLACE INTO reactions (message_id, user_id, participant_id, emoji, points_given, reputation_given) VALUES (?, ?, ?, ?, ?, ?)',
-                      (reaction.message.id, user.id, participant_id, emoji_str, points_to_add, reputation_to_add))
-            c.execute('UPDATE users SET points = points + ?, reputation = reputation + ? WHERE user_id = ?',
-                      (points_to_add, reputation_to_add, participant_id))
-            conn.commit()
-
-            # Registra evento settimanale (colleghiamo l'evento al messaggio originale)
-            try:
-                record_weekly_event(participant_id, event_type, points=points_to_add, reputation=reputation_to_add, message_id=original_message_id)
-            except Exception as e:
-                logger.exception(f"Errore record_weekly_event in spotlight on_reaction_add: {e}")
-
-            # Ripristina participations per essere CERTI che non venga aggiunto +1 partecipation da questa azione
-            try:
-                c.execute('UPDATE users SET participations = ? WHERE user_id = ?', (prev_participations, participant_id))
-                conn.commit()
-            except Exception as e:
-                logger.exception(f"Errore ripristino participations: {e}")
+            # Reazione, bonus ed evento settimanale (collegato al messaggio originale) in un'unica transazione.
+            # record_reaction non tocca participations, quindi il repost non conta come nuova partecipazione.
+            await record_reaction(spotlight_message_id, user.id, participant_id, emoji_str,
+                                  points_to_add, reputation_to_add, event_type, original_message_id)
 
             # Aggiorna bot status
             try:
@@ -557,89 +528,61 @@ class Spotlight(commands.Cog):
 
             if log_channel:
                 if is_staff:
-                    await log_channel.send(
+                    self.bot.mod_log.send(
                         f"✅ Reazione {emoji_str} staff aggiunta da {user.mention}: +{points_to_add} punti a {target_mention}"
                     )
                 else:
-                    await log_channel.send(
+                    self.bot.mod_log.send(
                         f"✅ Reazione {emoji_str} community aggiunta da {user.mention}: +{reputation_to_add} reputazione a {target_mention}"
                     )
 
         except Exception as e:
-            logger.exception(f"Errore in on_reaction_add spotlight: {e}")
+            logger.exception(f"Errore in on_raw_reaction_add spotlight: {e}")
             if log_channel:
-                await log_channel.send(f"❌ Errore reazione spotlight: {str(e)[:1000]}")
+                self.bot.mod_log.send(f"❌ Errore reazione spotlight: {str(e)[:1000]}")
 
     @commands.Cog.listener()
-    async def on_reaction_remove(self, reaction, user):
-        if reaction.message.channel.id != SPOTLIGHT_CHANNEL_ID or user.bot:
+    async def on_raw_reaction_remove(self, payload):
+        if payload.channel_id != SPOTLIGHT_CHANNEL_ID or payload.guild_id is None:
+            return
+        guild = self.bot.get_guild(payload.guild_id)
+        member = guild.get_member(payload.user_id) if guild else None
+        if member is not None and member.bot:
             return
+        spotlight_message_id = payload.message_id
 
         log_channel = self.bot.get_channel(LOG_CHANNEL_ID)
         try:
-            c.execute('SELECT original_message_id, user_id FROM spotlight_reposts WHERE spotlight_message_id = ?', 
-                      (reaction.message.id,))
-            result = c.fetchone()
+            result = get_repost(spotlight_message_id)
             if not result:
-                logger.debug(f"Nessun repost trovato per messaggio spotlight {reaction.message.id}")
+                logger.debug(f"Nessun repost trovato per messaggio spotlight {spotlight_message_id}")
                 return
 
             original_message_id, participant_id = result
-            emoji_str = str(reaction.emoji)
+            emoji_str = str(payload.emoji)
 
-            c.execute('SELECT emoji, points_given, reputation_given FROM reactions WHERE message_id = ? AND user_id = ? AND emoji = ?',
-                      (reaction.message.id, user.id, emoji_str))
-            existing_reaction = c.fetchone()
+            # Riga in reactions, storno del bonus ed evento settimanale in un'unica transazione
+            removed = await remove_reaction(spotlight_message_id, payload.user_id, emoji_str, participant_id,
+                                            'reaction_removed_points_spotlight', 'reaction_removed_reputation_spotlight',
+                                            original_message_id)
 
-            if not existing_reaction:
-                logger.debug(f"Rimozione ignorata: {user.name} non aveva una reazione registrata con emoji '{emoji_str}'")
+            if not removed:
+                logger.debug(f"Rimozione ignorata: l'utente {payload.user_id} non aveva una reazione registrata con emoji '{emoji_str}'")
                 return
 
-            emoji, points_given, reputation_given = existing_reaction
-            c.execute('DELETE FROM reactions WHERE message_id = ? AND user_id = ? AND emoji = ?', 
-                      (reaction.message.id, user.id, emoji_str))
-
-            # Salva participations correnti e poi ripristina per evitare incrementi indesiderati
-            c.execute('SELECT participations FROM users WHERE user_id = ?', (participant_id,))
-            row = c.fetchone()
-            prev_participations = row[0] if row and row[0] is not None else 0
-
-            if points_given > 0:
-                c.execute('UPDATE users SET points = points - ? WHERE user_id = ?', (points_given, participant_id))
-                conn.commit()
-                try:
-                    record_weekly_event(participant_id, 'reaction_removed_points_spotlight', points=-points_given, message_id=original_message_id)
-                except Exception as e:
-                    logger.exception(f"Errore record_weekly_event (remove points): {e}")
-                # ripristina participations
-                c.execute('UPDATE users SET participations = ? WHERE user_id = ?', (prev_participations, participant_id))
-                if log_channel:
-                    guild = reaction.message.guild
-                    participant_member = guild.get_member(participant_id) if guild else None
-                    target_mention = participant_member.mention if participant_member else f"<@{participant_id}>"
-                    await log_channel.send(f"🔻 Reazione {emoji} rimossa: -{points_given} punti a {target_mention}")
-
-            if reputation_given > 0:
-                c.execute('UPDATE users SET reputation = reputation - ? WHERE user_id = ?', (reputation_given, participant_id))
-                conn.commit()
-                try:
-                    record_weekly_event(participant_id, 'reaction_removed_reputation_spotlight', reputation=-reputation_given, message_id=original_message_id)
-                except Exception as e:
-                    logger.exception(f"Errore record_weekly_event (remove reputation): {e}")
-                # ripristina participations
-                c.execute('UPDATE users SET participations = ? WHERE user_id = ?', (prev_participations, participant_id))
-                if log_channel:
-                    guild = reaction.message.guild
-                    participant_member = guild.get_member(participant_id) if guild else None
-                    target_mention = participant_member.mention if participant_member else f"<@{participant_id}>"
-                    await log_channel.send(f"🔻 Reazione {emoji} rimossa: -{reputation_given} reputazione a {target_mention}")
-
-            conn.commit()
+            points_given, reputation_given, _ = removed
+            if log_channel:
+                participant_member = guild.get_member(participant_id) if guild else None
+                target_mention = participant_member.mention if participant_member else f"<@{participant_id}>"
+                if points_given > 0:
+                    self.bot.mod_log.send(f"🔻 Reazione {emoji_str} rimossa: -{points_given} punti a {target_mention}")
+                if reputation_given > 0:
+                    self.bot.mod_log.send(f"🔻 Reazione {emoji_str} rimossa: -{reputation_given} reputazione a {target_mention}")
 
         except Exception as e:
-            logger.exception(f"Errore in on_reaction_remove spotlight: {e}")
+            logger.exception(f"Errore in on_raw_reaction_remove spotlight: {e}")
             if log_channel:
-                await log_channel.send(f"❌ Errore rimozione reazione spotlight: {str(e)[:1000]}")
+                self.bot.mod_log.send(f"❌ Errore rimozione reazione spotlight: {str(e)[:1000]}")
 
 async def setup(bot):
     logger.debug("🧪 Setup cog Spotlight")
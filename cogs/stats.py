@@ -4,8 +4,8 @@ from discord import app_commands
 from datetime import datetime, timedelta
 import logging
 from config import ITALY_TZ, FOUNDER_ROLE_ID, ADMIN_ROLE_ID
-from database import c, conn
-from utils import get_week_boundaries
+from database import fetchone, fetchall, execute, get_weekly_user_totals, get_user_rank
+from utils import get_week_boundaries, get_week_id
 from translations import get_translation
 import asyncio
 
@@ -154,13 +154,7 @@ class Stats(commands.Cog):
 
     async def get_user_rank(self, user_id):
         """Ottiene il ranking globale dell'utente"""
-        c.execute('SELECT user_id, points FROM users ORDER BY points DESC')
-        all_users = c.fetchall()
-
-        for rank, (uid, points) in enumerate(all_users, 1):
-            if uid == user_id:
-                return rank, len(all_users)
-        return None, len(all_users)
+        return await get_user_rank(user_id)
 
     def get_level_color(self, level):
         """Restituisce colore dinamico basato sul livello"""
@@ -182,114 +176,78 @@ class Stats(commands.Cog):
 
     
     # --- BADGE LOGIC START ---
-    def _weeks_with_min_points(self, user_id: int, min_points: int):
+    async def _weeks_with_min_points(self, user_id: int, min_points: int):
         """
-        Conta quante settimane distinte (week_start) in weekly_events hanno SUM(points_earned) >= min_points.
+        Conta quante settimane (righe di weekly_user_totals) hanno almeno min_points punti, archiviati compresi.
         """
         try:
-            c.execute("""
-                SELECT COUNT(*) FROM (
-                    SELECT week_start, SUM(points_earned) as pts
-                    FROM weekly_events
-                    WHERE user_id = ?
-                    GROUP BY week_start
-                    HAVING pts >= ?
-                ) tmp
-            """, (user_id, min_points))
-            return c.fetchone()[0] or 0
+            row = await fetchone('badges.weeks_with_min_points', (user_id, min_points))
+            return row[0] or 0
         except Exception as e:
             logger.debug(f"_weeks_with_min_points error for {user_id}: {e}")
             return 0
 
-    def _distinct_challenges_participated(self, user_id: int):
-        """Conta i message_id distinti in weekly_events per l'utente (partecipazioni differenti)."""
+    async def _distinct_challenges_participated(self, user_id: int):
+        """Conta i message_id distinti negli eventi dell'utente, settimane archiviate comprese (partecipazioni differenti)."""
         try:
-            c.execute("""
-                SELECT COUNT(DISTINCT message_id) FROM weekly_events
-                WHERE user_id = ? AND message_id IS NOT NULL
-            """, (user_id,))
-            return c.fetchone()[0] or 0
+            row = await fetchone('badges.distinct_challenges', (user_id,))
+            return row[0] or 0
         except Exception as e:
             logger.debug(f"_distinct_challenges_participated error for {user_id}: {e}")
             return 0
 
-    def _count_total_reactions_from_community(self, user_id: int):
+    async def _count_total_reactions_from_community(self, user_id: int):
         """
         Conta il numero di reazioni community ricevute dall'utente (reputation_given > 0)
         usando la tabella reactions (participant_id è il destinatario della reazione).
         """
         try:
-            c.execute("""
-                SELECT COUNT(*) FROM reactions
-                WHERE participant_id = ? AND reputation_given > 0
-            """, (user_id,))
-            return c.fetchone()[0] or 0
+            row = await fetchone('badges.community_reactions', (user_id,))
+            return row[0] or 0
         except Exception as e:
             logger.debug(f"_count_total_reactions_from_community error for {user_id}: {e}")
             return 0
 
-    def _avg_reactions_per_challenge(self, user_id: int):
+    async def _avg_reactions_per_challenge(self, user_id: int):
         """
         Calcola la media di reazioni per challenge per l'utente.
         Raggruppa le righe di reactions per message_id (participant_id = user_id).
         """
         try:
-            c.execute("""
-                SELECT AVG(cnt) FROM (
-                    SELECT message_id, COUNT(*) as cnt
-                    FROM reactions
-                    WHERE participant_id = ?
-                    GROUP BY message_id
-                )
-            """, (user_id,))
-            v = c.fetchone()[0]
+            row = await fetchone('badges.avg_reactions_per_challenge', (user_id,))
+            v = row[0]
             return float(v) if v else 0.0
         except Exception as e:
             logger.debug(f"_avg_reactions_per_challenge error for {user_id}: {e}")
             return 0.0
 
-    def _count_creativity_bonus_from_staff(self, user_id: int):
+    async def _count_creativity_bonus_from_staff(self, user_id: int):
         """
-        Conta i Bonus Creatività dallo staff cercando event_type coerenti in weekly_events.
+        Conta i Bonus Creatività dallo staff sommando il contatore per settimana di weekly_user_totals.
         """
         try:
-            c.execute("""
-                SELECT COUNT(*) FROM weekly_events
-                WHERE user_id = ? AND (
-                    lower(event_type) LIKE '%creativ%' OR
-                    lower(event_type) LIKE '%staff_creativity%' OR
-                    lower(event_type) LIKE '%creativity_bonus%' OR
-                    lower(event_type) LIKE '%staff_bonus%'
-                )
-            """, (user_id,))
-            return c.fetchone()[0] or 0
+            row = await fetchone('badges.creativity_bonus', (user_id,))
+            return row[0] or 0
         except Exception as e:
             logger.debug(f"_count_creativity_bonus_from_staff error for {user_id}: {e}")
             return 0
 
-    def _spotlight_weeks(self, user_id: int):
+    async def _spotlight_weeks(self, user_id: int):
         """Conta in quante settimane distinte l'utente è stato repostato nello spotlight (spotlight_reposts.week_start)."""
         try:
-            c.execute("""
-                SELECT COUNT(DISTINCT week_start) FROM spotlight_reposts
-                WHERE user_id = ?
-            """, (user_id,))
-            return c.fetchone()[0] or 0
+            row = await fetchone('badges.spotlight_weeks', (user_id,))
+            return row[0] or 0
         except Exception as e:
             logger.debug(f"_spotlight_weeks error for {user_id}: {e}")
             return 0
 
-    def _challenges_with_3_plus_platforms(self, user_id: int):
+    async def _challenges_with_3_plus_platforms(self, user_id: int):
         """
         Usa submitted_links: per ogni message_id di questo autore contiamo quanti domini distinti sono stati inviati.
         Restituisce il conteggio di message_id con >=3 domini distinti.
         """
         try:
-            c.execute("""
-                SELECT message_id, raw_link FROM submitted_links
-                WHERE user_id = ?
-            """, (user_id,))
-            rows = c.fetchall()
+            rows = await fetchall('badges.submitted_links', (user_id,))
             if not rows:
                 return 0
             from urllib.parse import urlparse
@@ -315,22 +273,21 @@ class Stats(commands.Cog):
         Restituisce la stringa badges salvata (es. "Trendsetter,Viral Catalyst").
         """
         try:
-            c.execute("SELECT points, badges FROM users WHERE user_id = ?", (user_id,))
-            row = c.fetchone()
+            row = await fetchone('users.points_badges', (user_id,))
             if not row:
                 return ""
             total_points = row[0] or 0
             current_badges = row[1] or ""
             badge_set = set(b.strip() for b in current_badges.split(',') if b.strip())
 
-            weeks_500 = self._weeks_with_min_points(user_id, 500)
-            weeks_1000 = self._weeks_with_min_points(user_id, 1000)
-            distinct_challenges = self._distinct_challenges_participated(user_id)
-            creativity_count = self._count_creativity_bonus_from_staff(user_id)
-            spotlight_weeks = self._spotlight_weeks(user_id)
-            challenges_multi_platform = self._challenges_with_3_plus_platforms(user_id)
-            avg_reactions = self._avg_reactions_per_challenge(user_id)
-            community_reactions_total = self._count_total_reactions_from_community(user_id)
+            weeks_500 = await self._weeks_with_min_points(user_id, 500)
+            weeks_1000 = await self._weeks_with_min_points(user_id, 1000)
+            distinct_challenges = await self._distinct_challenges_participated(user_id)
+            creativity_count = await self._count_creativity_bonus_from_staff(user_id)
+            spotlight_weeks = await self._spotlight_weeks(user_id)
+            challenges_multi_platform = await self._challenges_with_3_plus_platforms(user_id)
+            avg_reactions = await self._avg_reactions_per_challenge(user_id)
+            community_reactions_total = await self._count_total_reactions_from_community(user_id)
 
             # 1) Trendsetter (Livello 7 - 6000 punti)
             if total_points >= 6000 and distinct_challenges >= 10 and weeks_500 >= 5:
@@ -380,12 +337,11 @@ class Stats(commands.Cog):
                     # Calcola cutoff temporale
                     now_dt = datetime.now(_ITZ) if _ITZ else datetime.utcnow()
                     cutoff = now_dt - timedelta(hours=TEST_BADGE_WINDOW_HOURS)
-                    cutoff_iso = cutoff.isoformat()
+                    cutoff_ts = int(cutoff.timestamp())
                     # Mappa badge -> event_type di test
                     test_map = _test_badge_event_types()
                     for badge_name, evt in test_map.items():
-                        c.execute("""SELECT 1 FROM weekly_events WHERE user_id = ? AND event_type = ? AND timestamp >= ? LIMIT 1""", (user_id, evt, cutoff_iso))
-                        if c.fetchone():
+                        if await fetchone('badges.test_event_since', (user_id, evt, cutoff_ts)):
                             badge_set.add(badge_name)
                 except Exception as e:
                     logger.debug(f"Test badge mode error: {e}")
@@ -406,8 +362,7 @@ class Stats(commands.Cog):
             final_badges_str = ",".join(final_badges)
 
             if final_badges_str != (row[1] or ""):
-                c.execute("UPDATE users SET badges = ? WHERE user_id = ?", (final_badges_str, user_id))
-                conn.commit()
+                await execute('users.set_badges', (final_badges_str, user_id))
 
             return final_badges_str
 
@@ -431,8 +386,7 @@ class Stats(commands.Cog):
 
         try:
             # Recupera dati utente
-            c.execute('SELECT points, reputation, participations, badges FROM users WHERE user_id = ?', (user_id,))
-            row = c.fetchone()
+            row = await fetchone('users.profile', (user_id,))
 
             if not row:
                 error_embed = discord.Embed(
@@ -449,15 +403,7 @@ class Stats(commands.Cog):
             user_rank, total_users = await self.get_user_rank(user_id)
 
             # Dati settimanali
-            week_start, week_end = get_week_boundaries()
-            c.execute('''SELECT SUM(points_earned), SUM(reputation_earned), COUNT(DISTINCT message_id)
-                         FROM weekly_events 
-                         WHERE user_id = ? AND timestamp >= ? AND timestamp < ? AND archived = 0''',
-                     (user_id, week_start.isoformat(), week_end.isoformat()))
-            weekly_data = c.fetchone()
-            weekly_points = weekly_data[0] if weekly_data and weekly_data[0] else 0
-            weekly_rep = weekly_data[1] if weekly_data and weekly_data[1] else 0
-            weekly_activities = weekly_data[2] if weekly_data and weekly_data[2] else 0
+            weekly_points, weekly_rep, weekly_activities = await get_weekly_user_totals(user_id, get_week_id())
 
             # EMBED PRINCIPALE con design moderno
             embed = discord.Embed(color=self.get_level_color(level))
@@ -589,42 +535,16 @@ class Stats(commands.Cog):
     @app_commands.checks.has_any_role(FOUNDER_ROLE_ID, ADMIN_ROLE_ID)
     async def weekly_stats_command(self, interaction: discord.Interaction):
         locale = str(interaction.locale)
-        from database import c, conn
         await interaction.response.defer(ephemeral=True)
 
         try:
             week_start, week_end = get_week_boundaries()
-            c.execute('''
-                SELECT 
-                    event_type,
-                    COUNT(*) as event_count,
-                    SUM(points_earned) as total_points,
-                    SUM(reputation_earned) as total_reputation
-                FROM weekly_events 
-                WHERE timestamp >= ? AND timestamp < ? AND archived = 0
-                GROUP BY event_type
-            ''', (week_start.isoformat(), week_end.isoformat()))
-            event_stats = c.fetchall()
-
-            c.execute('''
-                SELECT COUNT(DISTINCT user_id) as unique_users
-                FROM weekly_events 
-                WHERE timestamp >= ? AND timestamp < ? AND archived = 0
-            ''', (week_start.isoformat(), week_end.isoformat()))
-            unique_users = c.fetchone()[0]
-
-            c.execute('''
-                SELECT 
-                    user_id,
-                    SUM(points_earned) as weekly_points,
-                    COUNT(*) as activity_count
-                FROM weekly_events 
-                WHERE timestamp >= ? AND timestamp < ? AND archived = 0
-                GROUP BY user_id
-                ORDER BY weekly_points DESC
-                LIMIT 1
-            ''', (week_start.isoformat(), week_end.isoformat()))
-            top_contributor = c.fetchone()
+            week_id = get_week_id()
+            event_stats = await fetchall('weekly_stats.by_event_type', (week_id,))
+
+            unique_users = (await fetchone('weekly_stats.unique_users', (week_id,)))[0]
+
+            top_contributor = await fetchone('weekly_stats.top_contributor', (week_id,))
 
             embed = discord.Embed(
                 title="📊 Statistiche Settimana Corrente",
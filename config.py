@@ -37,3 +37,73 @@ MULTIPLATFORM_DOMAINS = ['tiktok.com', 'instagram.com', 'youtube.com']  # domini
 #Test Assegnazione Badge
 TEST_BADGE_MODE = False
 TEST_BADGE_WINDOW_HOURS = 1
+
+# Messaggi tenuti nella cache di discord.py: le reazioni usano gli eventi raw e l'indice submissions,
+# quindi non serve una cache grande per coprire i messaggi della settimana
+DISCORD_MESSAGE_CACHE_SIZE = 200
+
+# Cache submission in memoria (controllo duplicati in Events)
+SUBMISSION_CACHE_MAX_ENTRIES = 5000           # numero massimo di messaggi in cache
+SUBMISSION_CACHE_MAX_BYTES = 8 * 1024 * 1024  # tetto di memoria stimato (byte)
+SUBMISSION_CACHE_MAX_WEEKS = 4                # settimane (get_week_boundaries) tenute, compresa la corrente
+
+# Quasi-duplicati (similarity.py): distanza di Hamming massima tra impronte SimHash a 64 bit.
+# Deve restare < SIMHASH_BANDS (4) perché l'indice LSH trovi tutte le coppie entro la soglia
+SIMHASH_MAX_DISTANCE = 3
+# Parole minime della didascalia (link esclusi) per il controllo: sotto questa soglia le didascalie
+# brevi o di template si somigliano tutte e passa solo il controllo dei duplicati esatti
+SIMHASH_MIN_WORDS = 8
+SIMHASH_WORKERS = 2                           # processi del pool che calcola le impronte
+
+# Orari dei repost spotlight (ora italiana), compilati una volta da spotlight_schedule.py.
+# Gruppo di giorni -> periodo -> slot 'HH:MM'. Il periodo è 'all' (tutto l'anno) oppure 'school' nel
+# periodo scolastico e la stagione ('spring', 'summer', 'autumn', 'winter') fuori da esso.
+# Il numero di slot del giorno è anche il limite giornaliero di repost.
+SPOTLIGHT_SCHEDULE = {
+    'monday': {
+        'all': ['18:30', '19:30', '20:30', '21:30', '22:30'],
+    },
+    'tue_sat': {
+        'school': ['07:30', '09:30', '12:30', '15:30', '17:00', '18:30', '19:30', '20:30', '22:00', '23:00'],
+        'summer': ['09:30', '11:30', '13:30', '15:30', '17:30', '19:00', '20:30', '22:00', '23:00', '23:45'],
+        'spring': ['07:30', '10:00', '12:30', '15:00', '17:00', '18:30', '19:30', '20:30', '22:00', '23:00'],
+        'autumn': ['07:30', '09:30', '12:30', '15:30', '17:30', '18:30', '19:30', '20:30', '21:30', '22:30'],
+        'winter': ['08:00', '11:30', '13:00', '15:30', '17:00', '18:30', '19:30', '20:30', '21:30', '22:30'],
+    },
+    'sunday': {
+        'school': ['09:30', '11:30', '13:30', '15:30', '17:00', '18:00'],
+        'summer': ['10:00', '12:00', '14:30', '16:30', '17:30', '18:00'],
+        'spring': ['09:00', '11:00', '13:00', '15:30', '17:00', '18:00'],
+        'autumn': ['09:30', '11:30', '13:30', '15:30', '17:00', '18:00'],
+        'winter': ['10:00', '12:00', '14:00', '15:30', '17:00', '18:00'],
+    },
+}
+SPOTLIGHT_WEEKDAY_GROUPS = ['monday', 'tue_sat', 'tue_sat', 'tue_sat', 'tue_sat', 'tue_sat', 'sunday']  # lun..dom
+SPOTLIGHT_SCHOOL_PERIOD = ((9, 15), (6, 30))  # (mese, giorno) di inizio e fine inclusi, a cavallo d'anno
+
+# Scelta del repost spotlight (campionamento pesato a serbatoio, vedi reservoir.py):
+# peso = 1 + SPOTLIGHT_REACTION_WEIGHT * reazioni ricevute dalla submission
+#          + SPOTLIGHT_WAIT_WEIGHT * settimane dall'ultimo spotlight dell'autore (max SPOTLIGHT_WAIT_WEEKS_CAP,
+#            il massimo anche per chi non è mai stato in spotlight). Con entrambi a 0 la scelta è uniforme.
+SPOTLIGHT_REACTION_WEIGHT = 0
+SPOTLIGHT_WAIT_WEIGHT = 0
+SPOTLIGHT_WAIT_WEEKS_CAP = 8
+# Seme per rendere riproducibili le scelte (per slot: stesso seme e stessi candidati = stessa scelta); None = casuale
+SPOTLIGHT_SELECTION_SEED = None
+
+# Scheduler spotlight: uno slot mancato (bot offline) viene recuperato se sono passati al massimo
+# SPOTLIGHT_SLOT_GRACE_MINUTES; tra uno slot e l'altro il task dorme, svegliandosi comunque ogni
+# SPOTLIGHT_SCHEDULER_MAX_SLEEP secondi per ricalcolare (cambi d'orologio o d'ora legale)
+SPOTLIGHT_SLOT_GRACE_MINUTES = 15
+SPOTLIGHT_SCHEDULER_MAX_SLEEP = 3600
+
+# Archiviazione spotlight della domenica 20:00: se il bot era offline viene recuperata entro queste ore
+SPOTLIGHT_ARCHIVE_CATCHUP_HOURS = 48
+# Dopo un errore i tentativi successivi aspettano 1, 2, 4... minuti, fino a questo massimo
+SPOTLIGHT_ARCHIVE_MAX_BACKOFF_MINUTES = 60
+
+# Mod-log in background (mod_log.ModLogDispatcher)
+MOD_LOG_FLUSH_SECONDS = 3     # ogni quanto unire e inviare le righe in coda
+MOD_LOG_MAX_PENDING = 300     # righe in coda oltre le quali si scarta (con riepilogo)
+MOD_LOG_RATE_LIMIT = 4        # messaggi massimi nel canale mod-logs...
+MOD_LOG_RATE_PERIOD = 5       # ...per finestra di secondi
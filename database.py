@@ -1,202 +1,755 @@
 import sqlite3
 import json
+import asyncio
+import atexit
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import logging
+from migrations import apply_migrations
+import queries
+import similarity
+from reservoir import weighted_sample
 
 logger = logging.getLogger(__name__)
 
-# Connessione globale al database
-conn = sqlite3.connect('trendduel.db', check_same_thread=False)
-c = conn.cursor()
-
-# Tabella utenti esistente
-c.execute('''CREATE TABLE IF NOT EXISTS users
-             (user_id INTEGER PRIMARY KEY, points INTEGER DEFAULT 0, reputation INTEGER DEFAULT 0,
-              participations INTEGER DEFAULT 0, badges TEXT DEFAULT '')''')
-
-# Tabella reazioni esistente con schema corretto
-c.execute('''CREATE TABLE IF NOT EXISTS reactions
-             (message_id INTEGER, user_id INTEGER, participant_id INTEGER,
-              emoji TEXT, points_given INTEGER DEFAULT 0, reputation_given INTEGER DEFAULT 0,
-              PRIMARY KEY (message_id, user_id))''')
-
-# Tabella per tracking eventi settimanali
-c.execute('''CREATE TABLE IF NOT EXISTS weekly_events
-             (id INTEGER PRIMARY KEY AUTOINCREMENT,
-              user_id INTEGER NOT NULL,
-              event_type TEXT NOT NULL,
-              points_earned INTEGER DEFAULT 0,
-              reputation_earned INTEGER DEFAULT 0,
-              timestamp TEXT NOT NULL,
-              week_start TEXT NOT NULL,
-              archived BOOLEAN DEFAULT 0,
-              message_id INTEGER)''')
-
-# Tabella per archivio classifiche settimanali
-c.execute('''CREATE TABLE IF NOT EXISTS weekly_archives
-             (id INTEGER PRIMARY KEY AUTOINCREMENT,
-              week_start TEXT NOT NULL,
-              week_end TEXT NOT NULL,
-              embed_data TEXT NOT NULL,
-              participants_count INTEGER DEFAULT 0,
-              archived_at TEXT NOT NULL,
-              hall_of_fame_message_id INTEGER)''')
-
-# Nuova tabella per tracciare i repost in spotlight
-c.execute('''CREATE TABLE IF NOT EXISTS spotlight_reposts
-             (id INTEGER PRIMARY KEY AUTOINCREMENT,
-              original_message_id INTEGER NOT NULL,
-              spotlight_message_id INTEGER NOT NULL,
-              user_id INTEGER NOT NULL,
-              week_start TEXT NOT NULL,
-              timestamp TEXT NOT NULL)''')
-
-# --- gestione link inviati (per controllo duplicati) ---
-c.execute('''
-CREATE TABLE IF NOT EXISTS submitted_links (
-    normalized_link TEXT PRIMARY KEY,
-    raw_link TEXT,
-    user_id INTEGER,
-    message_id INTEGER,
-    timestamp TEXT
-)
-''')
-
-# indice per performance (opzionale ma consigliato)
-c.execute('CREATE INDEX IF NOT EXISTS idx_submitted_links_time ON submitted_links (timestamp)')
-
-def link_exists(normalized_link):
-    """Ritorna True se normalized_link Ã¨ giÃ  presente nel DB."""
-    try:
-        c.execute('SELECT 1 FROM submitted_links WHERE normalized_link = ? LIMIT 1', (normalized_link,))
-        return c.fetchone() is not None
-    except Exception as e:
-        logger.error(f"Errore link_exists: {e}")
-        return False
+DB_PATH = 'trendduel.db'
 
-def add_submitted_link(normalized_link, raw_link, user_id, message_id, timestamp):
-    """Inserisce un link normalizzato nel DB (INSERT OR IGNORE)."""
-    try:
-        c.execute('INSERT OR IGNORE INTO submitted_links (normalized_link, raw_link, user_id, message_id, timestamp) VALUES (?,?,?,?,?)',
-                  (normalized_link, raw_link, user_id, message_id, timestamp))
-        conn.commit()
+# Group commit: le scritture accodate vengono unite in un'unica transazione,
+# chiusa dopo WRITE_BATCH_MAX_DELAY secondi o WRITE_BATCH_MAX_JOBS scritture
+WRITE_BATCH_MAX_DELAY = 0.005
+WRITE_BATCH_MAX_JOBS = 64
+
+# Slot spotlight eseguiti conservati in spotlight_slots (secondi): bastano a coprire la finestra di recupero
+SPOTLIGHT_SLOTS_RETENTION = 14 * 24 * 3600
+
+# Epoch Discord (ms) degli snowflake: l'id di un messaggio contiene la sua data di creazione
+DISCORD_EPOCH_MS = 1420070400000
+
+# Connessioni in sola lettura usate in parallelo dalle query (una per thread del pool)
+READ_POOL_SIZE = 4
+
+# Connessione di scrittura: viene usata SOLO dal thread dedicato (_worker).
+# I cogs non devono toccarla direttamente, ma passare dalle funzioni async qui sotto.
+# isolation_level=None: le transazioni sono gestite a mano dal worker (BEGIN/COMMIT)
+conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+conn.execute('PRAGMA journal_mode=WAL')
+# FULL: al COMMIT il WAL è su disco, quindi una scrittura risolta è durevole
+conn.execute('PRAGMA synchronous=FULL')
+
+# Schema versionato: crea/aggiorna le tabelle applicando le migrazioni mancanti
+apply_migrations(conn)
+
+# Link normalizzati già inviati, tenuti in memoria: la tabella submitted_links viene
+# letta solo qui all'avvio e poi aggiornata da score_submission (vedi LINK INVIATI)
+_known_links = {row[0] for row in queries.fetchall(conn, 'links.all')}
+
+# Ledger delle reazioni in memoria (vedi LEDGER REAZIONI), caricato qui per la settimana corrente
+# e aggiornato in write-through da record_reaction / remove_reaction / repost spotlight.
+# Limitato alla settimana: prune_reaction_ledger al reset, forget_messages alle eliminazioni
+_reaction_ledger = {}         # message_id -> {user_id: emoji}
+_ledger_messages = set()      # message_id le cui reazioni sono tutte nel ledger
+_reposts = {}                 # spotlight_message_id -> (original_message_id, user_id, week_start)
+_reposts_by_original = {}     # original_message_id -> {spotlight_message_id: None}
+
+def _load_reaction_ledger(db):
+    from utils import get_week_boundaries
+    week_start, _ = get_week_boundaries()
+    since_ts = int(week_start.timestamp())
+    _ledger_messages.update(row[0] for row in queries.fetchall(db, 'submissions.ids_since', (since_ts,)))
+    for spotlight_message_id, original_message_id, user_id, repost_week in queries.fetchall(db, 'spotlight.all_reposts'):
+        _reposts[spotlight_message_id] = (original_message_id, user_id, repost_week)
+        _reposts_by_original.setdefault(original_message_id, {})[spotlight_message_id] = None
+        _ledger_messages.add(spotlight_message_id)
+    for name, params in (('reactions.on_submissions_since', (since_ts,)), ('reactions.on_reposts', ())):
+        for message_id, user_id, emoji in queries.fetchall(db, name, params):
+            _ledger_set(message_id, user_id, emoji)
+
+def _ledger_get(message_id, user_id):
+    reactions = _reaction_ledger.get(message_id)
+    return reactions.get(user_id) if reactions else None
+
+def _ledger_set(message_id, user_id, emoji):
+    _reaction_ledger.setdefault(message_id, {})[user_id] = emoji
+
+def _ledger_pop(message_id, user_id):
+    reactions = _reaction_ledger.get(message_id)
+    if reactions is None:
+        return
+    reactions.pop(user_id, None)
+    if not reactions:
+        del _reaction_ledger[message_id]
+
+_load_reaction_ledger(conn)
+
+# ---------- ACCESSO ASYNC AL DATABASE ----------
+class _Job:
+    __slots__ = ('fn', 'args', 'kwargs', 'loop', 'future')
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+
+    def resolve(self, result=None, error=None):
+        def _set():
+            if self.future.done():
+                return
+            if error is not None:
+                self.future.set_exception(error)
+            else:
+                self.future.set_result(result)
+        try:
+            self.loop.call_soon_threadsafe(_set)
+        except RuntimeError:
+            # loop già chiuso (shutdown): nessuno aspetta più il risultato
+            pass
+
+
+class _DatabaseWorker(threading.Thread):
+    """
+    Unico writer del database. Le scritture vengono applicate dentro una transazione
+    condivisa (un SAVEPOINT per scrittura, così un errore annulla solo quella) e il
+    COMMIT unico risolve tutte le future del batch. Se SQLite annulla l'intera transazione
+    (SQLITE_FULL, IOERR...) falliscono tutte le scritture del batch e il worker continua con le
+    successive. Le letture passano dal pool (_read_pool).
+    """
+
+    def __init__(self, db):
+        super().__init__(name='trendduel-db', daemon=True)
+        self.db = db
+        self.jobs = queue.Queue()
+        self.pending = []  # (job, risultato) in attesa del commit
+        self.current = None  # scrittura in corso, per risolverla anche se il ciclo fallisce
+        self.deadline = None
+
+    def submit(self, fn, args, kwargs):
+        job = _Job(fn, args, kwargs)
+        self.jobs.put(job)
+        return job.future
+
+    def stop(self):
+        self.jobs.put(None)
+        self.join(timeout=5)
+
+    def run(self):
+        while True:
+            try:
+                if not self._step():
+                    return
+            except Exception as e:
+                # Il thread non deve morire: senza writer tutte le future successive resterebbero in attesa
+                logger.error(f"Errore imprevisto nel thread di scrittura del database: {e}")
+                self._abort(e)
+                if self.current is not None:
+                    self.current.resolve(error=e)
+            self.current = None
+
+    def _step(self):
+        """Attende e applica una scrittura (o chiude il batch); False quando il worker deve fermarsi."""
+        timeout = None
+        if self.db.in_transaction:
+            timeout = max(0.0, self.deadline - time.monotonic())
+        try:
+            job = self.jobs.get(timeout=timeout)
+        except queue.Empty:
+            self._commit()
+            return True
+
+        if job is None:
+            self._commit()
+            return False
+
+        self.current = job
+        self._apply_write(job)
+        if len(self.pending) >= WRITE_BATCH_MAX_JOBS:
+            self._commit()
         return True
-    except Exception as e:
-        logger.error(f"Errore add_submitted_link: {e}")
-        return False
 
-# Migrazione: aggiungi colonne mancanti se non esistono
-try:
-    c.execute('ALTER TABLE reactions ADD COLUMN emoji TEXT')
-    c.execute('ALTER TABLE reactions ADD COLUMN points_given INTEGER DEFAULT 0')
-    c.execute('ALTER TABLE reactions ADD COLUMN reputation_given INTEGER DEFAULT 0')
-    conn.commit()
-    print("Database migrato con successo")
-except sqlite3.OperationalError:
-    print("Database giÃ  aggiornato o errore nella migrazione")
+    def _apply_write(self, job):
+        try:
+            if not self.db.in_transaction:
+                self.db.execute('BEGIN')
+                self.deadline = time.monotonic() + WRITE_BATCH_MAX_DELAY
+            self.db.execute('SAVEPOINT job')
+        except Exception as e:
+            logger.error(f"Errore nell'apertura della scrittura: {e}")
+            self._abort(e)
+            job.resolve(error=e)
+            return
+        try:
+            result = job.fn(self.db, *job.args, **job.kwargs)
+        except Exception as e:
+            try:
+                self.db.execute('ROLLBACK TO job')
+                self.db.execute('RELEASE job')
+            except Exception as control_error:
+                # SQLite ha già annullato l'intera transazione (es. SQLITE_FULL, IOERR, alcuni BUSY)
+                logger.error(f"Transazione di gruppo annullata ({len(self.pending)} scritture in attesa): {control_error}")
+                self._abort(control_error)
+            job.resolve(error=e)
+            return
+        try:
+            self.db.execute('RELEASE job')
+        except Exception as e:
+            logger.error(f"Transazione di gruppo annullata ({len(self.pending)} scritture in attesa): {e}")
+            self._abort(e)
+            job.resolve(error=e)
+            return
+        self.pending.append((job, result))
+
+    def _commit(self):
+        if not self.db.in_transaction:
+            if self.pending:
+                # Transazione chiusa da SQLite senza COMMIT: le scritture del batch sono perse
+                self._abort(sqlite3.OperationalError("transazione annullata da SQLite prima del commit"))
+            return
+        batch, self.pending = self.pending, []
+        try:
+            self.db.execute('COMMIT')
+        except Exception as e:
+            logger.error(f"Errore nel commit di gruppo ({len(batch)} scritture): {e}")
+            self.pending = batch
+            self._abort(e)
+            return
+        for job, result in batch:
+            job.resolve(result)
+
+    def _abort(self, error):
+        """Annulla l'intera transazione e fa fallire con error tutte le scritture del batch."""
+        batch, self.pending = self.pending, []
+        if self.db.in_transaction:
+            try:
+                self.db.execute('ROLLBACK')
+            except Exception as e:
+                logger.error(f"Errore nel rollback della transazione di gruppo: {e}")
+        for job, _ in batch:
+            job.resolve(error=error)
+
+
+_worker = _DatabaseWorker(conn)
+_worker.start()
+atexit.register(_worker.stop)
+
+# Pool di lettura: ogni thread apre la propria connessione read-only (mode=ro) al primo uso.
+# In WAL i lettori non bloccano il writer e vedono sempre l'ultimo commit completato.
+_read_local = threading.local()
+_read_pool = ThreadPoolExecutor(max_workers=READ_POOL_SIZE, thread_name_prefix='trendduel-db-read')
+atexit.register(_read_pool.shutdown, wait=False)
+
+def _read_connection():
+    db = getattr(_read_local, 'db', None)
+    if db is None:
+        db = sqlite3.connect(f'file:{DB_PATH}?mode=ro', uri=True, isolation_level=None)
+        _read_local.db = db
+    return db
 
-conn.commit()
+def _run_read(fn, args, kwargs):
+    return fn(_read_connection(), *args, **kwargs)
 
-def record_weekly_event(user_id, event_type, points=0, reputation=0, message_id=None):
+def run_in_db(fn, *args, **kwargs):
     """
-    Registra un evento settimanale per il tracking della classifica
+    Esegue fn(db, *args, **kwargs) su una connessione read-only del pool di lettura.
+    Ritorna una future da attendere. fn deve usare cursori propri (db.execute) e non può scrivere.
+    """
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(_read_pool, _run_read, fn, args, kwargs)
+
+def _execute(db, name, params):
+    return queries.execute(db, name, params).rowcount
+
+def fetchone(name, params=()):
+    """Esegue la SELECT registrata come name (vedi queries.QUERIES) e ritorna (future) la prima riga o None."""
+    return run_in_db(queries.fetchone, name, params)
+
+def fetchall(name, params=()):
+    """Esegue la SELECT registrata come name e ritorna (future) tutte le righe."""
+    return run_in_db(queries.fetchall, name, params)
+
+def execute(name, params=()):
+    """
+    Accoda la scrittura registrata come name. Ritorna una future con il numero di righe modificate,
+    risolta solo quando il commit di gruppo che la contiene è su disco.
+    """
+    return _worker.submit(_execute, (name, params), {})
+
+def transaction(fn, *args, **kwargs):
     """
+    Accoda fn(conn, *args, **kwargs) come unità atomica: o tutte le sue scritture
+    vengono confermate o nessuna. La future si risolve con il valore di fn dopo il commit.
+    """
+    return _worker.submit(fn, args, kwargs)
+
+# ---------- LINK INVIATI ----------
+async def link_exists(normalized_link):
+    """Ritorna True se normalized_link Ã¨ giÃ  presente nel DB (controllo sul set in memoria, senza query)."""
+    return normalized_link in _known_links
+
+# ---------- SUBMISSION ----------
+def _add_submissions(db, rows):
+    return queries.executemany(db, 'submissions.insert', rows).rowcount
+
+async def add_submissions(rows):
+    """
+    Inserisce in blocco (message_id, user_id, normalized, url, created_at epoch, simhash, content)
+    in un'unica transazione.
+    """
+    rows = [row[:5] + (similarity.to_db(row[5]),) + row[6:] for row in rows]
+    return await transaction(_add_submissions, rows)
+
+def _set_submission_simhashes(db, pairs):
+    queries.executemany(db, 'submissions.set_simhash', pairs)
+
+async def set_submission_simhashes(pairs):
+    """Salva le impronte calcolate dopo l'inserimento: pairs = (message_id, simhash)."""
+    await transaction(_set_submission_simhashes,
+                      [(similarity.to_db(fingerprint), message_id) for message_id, fingerprint in pairs])
+
+async def update_submission_content(message_id, content, eligible):
+    """Testo modificato di una submission; eligible=False la toglie dal bacino spotlight."""
+    await execute('submissions.set_content', (content, int(eligible), message_id))
+
+def _mark_submissions_ineligible(db, params):
+    queries.executemany(db, 'submissions.set_ineligible', params)
+
+async def mark_submissions_ineligible(message_ids):
+    """Toglie dal bacino spotlight le submission eliminate (la riga resta per i controlli duplicati)."""
+    await transaction(_mark_submissions_ineligible, [(message_id,) for message_id in message_ids])
+
+def _sample_spotlight_candidates(db, week_start, k, weight, rng, exclude):
+    # Le righe arrivano dal cursore a blocchi e passano dal serbatoio: memoria O(k) anche con molti candidati
+    rows = queries.iterate(db, 'spotlight.candidates', (int(week_start.timestamp()), week_start.isoformat()))
     try:
-        from config import ITALY_TZ
-        from utils import get_week_boundaries
-        now = datetime.now(ITALY_TZ)
-        week_start, week_end = get_week_boundaries(now)
+        candidates = (row for row in rows if row[0] not in exclude)
+        if k is None:
+            # Ordine di estrazione dell'intero bacino: le prime k righe sono le stesse estratte con k
+            candidates = list(candidates)
+            if not candidates:
+                return []
+            k = len(candidates)
+        return weighted_sample(candidates, k=k, weight=weight, rng=rng)
+    finally:
+        rows.close()
 
-        c.execute('''INSERT INTO weekly_events 
-                     (user_id, event_type, points_earned, reputation_earned, timestamp, week_start, message_id)
-                     VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                 (user_id, event_type, points, reputation, now.isoformat(), week_start.isoformat(), message_id))
-        conn.commit()
+async def sample_spotlight_candidates(week_start, k=1, weight=None, rng=None, exclude=()):
+    """
+    Estrae fino a k submission candidabili al repost spotlight nella settimana che inizia a week_start
+    (datetime): idonee, mai repostate, con autore non ancora repostato nella settimana e non in exclude.
+    Righe (message_id, user_id, content, reazioni ricevute, ts dell'ultimo bonus spotlight dell'autore o None),
+    in ordine di estrazione con probabilità proporzionale a weight(riga) (vedi reservoir.weighted_sample).
+    Con k=None ritorna tutto il bacino in ordine di estrazione. content è None per le submission salvate senza testo.
+    """
+    return await run_in_db(_sample_spotlight_candidates, week_start, k, weight, rng, frozenset(exclude))
 
-        logger.info(f"Evento settimanale registrato: {event_type} per utente {user_id} (+{points}pts, +{reputation}rep)")
+async def get_spotlight_submission(message_id):
+    """
+    (content, idonea) attuali di una submission, None se non è registrata: il bacino spotlight è letto
+    una volta per slot e nel frattempo il messaggio può essere stato modificato o eliminato.
+    """
+    row = await fetchone('submissions.spotlight_state', (message_id,))
+    return (row[0], bool(row[1])) if row else None
+
+async def get_submission_author(message_id):
+    """user_id dell'autore di una submission registrata, None se il messaggio non è una submission."""
+    row = await fetchone('submissions.author', (message_id,))
+    return row[0] if row else None
+
+async def has_submissions():
+    return await fetchone('submissions.any') is not None
+
+async def get_recent_submissions(since):
+    """
+    Submission create da since (datetime) in poi, dalla più vecchia, e le loro reazioni registrate.
+    Ritorna (righe submission, righe (message_id, emoji)); l'ultima colonna delle submission è
+    l'impronta SimHash (None se non ancora calcolata).
+    """
+    since_ts = int(since.timestamp())
+    submissions = [row[:5] + (similarity.from_db(row[5]),)
+                   for row in await fetchall('submissions.since', (since_ts,))]
+    reactions = await fetchall('submissions.reactions_since', (since_ts,))
+    return submissions, reactions
+
+# ---------- PUNTEGGIO SUBMISSION ----------
+# Esito di score_submission, usato da Events per DM e log
+SubmissionScore = namedtuple('SubmissionScore', [
+    'points',               # punti di partecipazione assegnati
+    'extra_platforms',      # piattaforme oltre la prima
+    'bonus_points',         # punti del bonus multipiattaforma applicati (0 se non applicato)
+    'bonus_uses',           # usi del bonus nella settimana, compreso questo se applicato
+    'bonus_limit_reached',  # True se il bonus spettava ma il limite settimanale era esaurito
+])
+
+def _score_submission(db, message_id, user_id, normalized, url, created_at, links, platform_count, simhash, content):
+    from config import MULTIPLATFORM_BONUS_PER_EXTRA, MULTIPLATFORM_MAX_USES_PER_WEEK
+    queries.execute(db, 'submissions.insert', (message_id, user_id, normalized, url, created_at,
+                                               similarity.to_db(simhash), content))
+    queries.execute(db, 'users.ensure', (user_id,))
+    queries.execute(db, 'users.add_submission', (user_id,))
+    _record_weekly_event(db, user_id, 'participation', points=10, message_id=message_id)
+
+    now_iso = datetime.now().isoformat()
+    for normalized_link, raw_link in links:
+        queries.execute(db, 'links.insert', (normalized_link, raw_link, user_id, message_id, now_iso))
+
+    extra = max(platform_count - 1, 0)
+    if not extra or queries.fetchone(db, 'weekly_events.exists_for_message', (user_id, 'multiplatform_bonus', message_id)):
+        return SubmissionScore(10, extra, 0, 0, False)
+    used_this_week = _count_weekly_event_type(db, user_id, 'multiplatform_bonus')
+    if used_this_week >= MULTIPLATFORM_MAX_USES_PER_WEEK:
+        return SubmissionScore(10, extra, 0, used_this_week, True)
+    bonus_points = extra * MULTIPLATFORM_BONUS_PER_EXTRA
+    queries.execute(db, 'users.add_points', (bonus_points, user_id))
+    _record_weekly_event(db, user_id, 'multiplatform_bonus', points=bonus_points, message_id=message_id)
+    return SubmissionScore(10, extra, bonus_points, used_this_week + 1, False)
+
+async def score_submission(message_id, user_id, normalized, url, created_at, links, platform_count, simhash=None, content=None):
+    """
+    Registra una submission accettata in un'unica transazione: riga submissions, +10 punti e
+    partecipazione, evento settimanale, link inviati (links: coppie (normalizzato, grezzo)) e
+    l'eventuale bonus multipiattaforma con i suoi controlli. Ritorna SubmissionScore, o None
+    se la scrittura fallisce (in quel caso non resta nulla di parziale).
+    """
+    # I link entrano subito nel set, prima del commit: un messaggio concorrente con lo stesso link è già un duplicato
+    new_links = [normalized_link for normalized_link, _ in links if normalized_link not in _known_links]
+    _known_links.update(new_links)
+    try:
+        score = await transaction(_score_submission, message_id, user_id, normalized, url,
+                                  int(created_at.timestamp()), links, platform_count, simhash, content)
+        # Le reazioni arrivate nel frattempo sono già nel ledger (write-through): il messaggio è coperto
+        _ledger_messages.add(message_id)
+        return score
     except Exception as e:
-        logger.error(f"Errore nella registrazione evento settimanale: {e}")
+        _known_links.difference_update(new_links)
+        logger.error(f"Errore score_submission per messaggio {message_id}: {e}")
+        return None
+
+# ---------- CLASSIFICA GLOBALE ----------
+def _get_user_rank(db, user_id):
+    total_users = queries.fetchone(db, 'users.count')[0]
+    row = queries.fetchone(db, 'users.points', (user_id,))
+    if row is None:
+        return None, total_users
+    # Conteggio sull'indice idx_users_points: a parità di punti la posizione è condivisa
+    ahead = queries.fetchone(db, 'users.count_above_points', (row[0],))[0]
+    return ahead + 1, total_users
 
-def count_weekly_event_type(user_id, event_type):
+async def get_user_rank(user_id):
     """
-    Ritorna il numero di eventi 'event_type' registrati per l'utente nella settimana corrente (non archiviati).
+    Ritorna (posizione, totale_utenti) nella classifica globale per punti; posizione None se l'utente non esiste.
+    """
+    return await run_in_db(_get_user_rank, user_id)
+
+# ---------- EVENTI SETTIMANALI ----------
+def _is_staff_bonus_event(event_type):
+    """Eventi contati dal badge dei Bonus Creatività (stesso criterio del vecchio LIKE su event_type)."""
+    event_type = event_type.lower()
+    return 'creativ' in event_type or 'staff_bonus' in event_type
+
+def _record_weekly_event(db, user_id, event_type, points=0, reputation=0, message_id=None):
+    """Inserisce l'evento settimanale usando la connessione data (senza commit)."""
+    from config import ITALY_TZ
+    from utils import get_week_boundaries, get_week_id
+    now = datetime.now(ITALY_TZ)
+    week_start, week_end = get_week_boundaries(now)
+    ts = int(now.timestamp())
+    week_id = get_week_id(now)
+
+    # Una partecipazione = un message_id distinto nella settimana (come COUNT(DISTINCT message_id))
+    new_participation = 0
+    if message_id is not None:
+        seen = queries.fetchone(db, 'weekly_events.message_seen', (user_id, week_id, message_id))
+        new_participation = 0 if seen else 1
+
+    queries.execute(db, 'weekly_events.insert',
+                    (user_id, event_type, points, reputation, now.isoformat(), week_start.isoformat(), message_id,
+                    ts, week_id))
+
+    # Totali settimanali materializzati; una riga archiviata riparte da zero (reset manuale a metà settimana)
+    queries.execute(db, 'weekly_totals.upsert',
+                    (week_id, user_id, points, reputation, new_participation, ts,
+                     points, 1 if _is_staff_bonus_event(event_type) else 0))
+
+async def record_weekly_event(user_id, event_type, points=0, reputation=0, message_id=None):
+    """
+    Registra un evento settimanale per il tracking della classifica
     """
     try:
-        from config import ITALY_TZ
-        from utils import get_week_boundaries
-        now = datetime.now(ITALY_TZ)
-        week_start, week_end = get_week_boundaries(now)
-        week_start_str = week_start.isoformat()
-        week_end_str = week_end.isoformat()
-
-        c.execute('''
-            SELECT COUNT(*) FROM weekly_events
-            WHERE user_id = ? AND event_type = ? AND timestamp >= ? AND timestamp < ? AND archived = 0
-        ''', (user_id, event_type, week_start_str, week_end_str))
-        row = c.fetchone()
-        return row[0] if row else 0
+        await transaction(_record_weekly_event, user_id, event_type, points, reputation, message_id)
+        logger.info(f"Evento settimanale registrato: {event_type} per utente {user_id} (+{points}pts, +{reputation}rep)")
     except Exception as e:
-        logger.error(f"Errore count_weekly_event_type: {e}")
-        return 0
+        logger.error(f"Errore nella registrazione evento settimanale: {e}")
 
+def _count_weekly_event_type(db, user_id, event_type):
+    from utils import get_week_id
+    # Stessa chiave di _record_weekly_event: la domenica dalle 20:00 conta già la settimana nuova
+    row = queries.fetchone(db, 'weekly_events.count_type', (user_id, event_type, get_week_id()))
+    return row[0] if row else 0
 
-def get_weekly_leaderboard(week_start=None, week_end=None):
+
+async def get_weekly_leaderboard(week_start=None, week_end=None):
     """
     Calcola la classifica settimanale basata sugli eventi registrati
     """
-    from utils import get_week_boundaries
+    from utils import get_week_id
     if week_start is None or week_end is None:
-        week_start, week_end = get_week_boundaries()
-
-    # Converte in string se necessario
-    if isinstance(week_start, datetime):
-        week_start_str = week_start.isoformat()
+        # Settimana corrente: stessa chiave usata in scrittura da _record_weekly_event
+        week_id = get_week_id()
     else:
-        week_start_str = week_start
+        # Accetta anche la stringa ISO di inizio settimana (es. da weekly_archives)
+        if not isinstance(week_start, datetime):
+            week_start = datetime.fromisoformat(week_start)
+        week_id = get_week_id(week_start)
 
-    if isinstance(week_end, datetime):
-        week_end_str = week_end.isoformat()
-    else:
-        week_end_str = week_end
-
-    # Query per ottenere la classifica settimanale
-    c.execute('''
-        SELECT 
-            we.user_id,
-            SUM(we.points_earned) as weekly_points,
-            SUM(we.reputation_earned) as weekly_reputation,
-            COUNT(DISTINCT we.message_id) as weekly_participations,
-            MIN(we.timestamp) as first_participation,
-            u.reputation as total_reputation
-        FROM weekly_events we
-        LEFT JOIN users u ON we.user_id = u.user_id
-        WHERE we.timestamp >= ? AND we.timestamp < ? AND we.archived = 0
-        GROUP BY we.user_id
-        ORDER BY weekly_points DESC, total_reputation DESC, first_participation ASC
-        LIMIT 10
-    ''', (week_start_str, week_end_str))
-
-    return c.fetchall()
-
-def reset_weekly_metrics(week_start, week_end):
-    """
-    Marca gli eventi della settimana come archiviati
+    # Classifica dai totali materializzati (una riga per utente e settimana)
+    return await fetchall('leaderboard.top10', (week_id,))
+
+async def get_weekly_user_totals(user_id, week_id):
     """
-    try:
-        week_start_str = week_start.isoformat()
-        week_end_str = week_end.isoformat()
+    Ritorna (points, reputation, participations) settimanali dell'utente; zeri se non ha eventi.
+    """
+    row = await fetchone('weekly_totals.user', (week_id, user_id))
+    return row if row else (0, 0, 0)
 
-        c.execute('''UPDATE weekly_events 
-                     SET archived = 1 
-                     WHERE timestamp >= ? AND timestamp < ? AND archived = 0''',
-                 (week_start_str, week_end_str))
+def _reset_weekly_metrics(db, week_id):
+    # Sposta gli eventi nella tabella fredda: weekly_events resta con la sola settimana in corso.
+    # Anche le settimane precedenti a week_id (reset saltato, bot spento la domenica) vengono archiviate
+    affected_rows = queries.execute(db, 'weekly_events.copy_until_to_archive', (week_id,)).rowcount
+    queries.execute(db, 'weekly_events.delete_until', (week_id,))
+    queries.execute(db, 'weekly_totals.archive_until', (week_id,))
+    return affected_rows
 
-        affected_rows = c.rowcount
-        conn.commit()
+async def reset_weekly_metrics(week_start, week_end):
+    """
+    Archivia gli eventi della settimana (e di quelle precedenti non ancora archiviate)
+    spostandoli in weekly_events_archive
+    """
+    from utils import get_week_id
+    try:
+        affected_rows = await transaction(_reset_weekly_metrics, get_week_id(week_start))
+        # Il ledger tiene solo la settimana nuova: i messaggi precedenti tornano a leggere il DB
+        pruned = prune_reaction_ledger(min(week_end.timestamp(), time.time()))
 
-        logger.info(f"Reset settimanale completato: {affected_rows} eventi archiviati")
+        logger.info(f"Reset settimanale completato: {affected_rows} eventi archiviati, {pruned} messaggi tolti dal ledger reazioni")
         return affected_rows
 
     except Exception as e:
         logger.error(f"Errore nel reset settimanale: {e}")
-        return 0
\ No newline at end of file
+        return 0
+
+# ---------- REAZIONI ----------
+def _record_reaction(db, message_id, user_id, participant_id, emoji, points, reputation, event_type, event_message_id):
+    queries.execute(db, 'users.ensure', (participant_id,))
+    queries.execute(db, 'reactions.insert', (message_id, user_id, participant_id, emoji, points, reputation))
+    queries.execute(db, 'users.add_points_reputation', (points, reputation, participant_id))
+    _record_weekly_event(db, participant_id, event_type, points, reputation, event_message_id)
+    return queries.fetchone(db, 'users.points_badges', (participant_id,))
+
+async def record_reaction(message_id, user_id, participant_id, emoji, points, reputation, event_type, event_message_id):
+    """
+    Registra una reazione valida con il relativo bonus all'autore e l'evento settimanale
+    in un'unica scrittura atomica. Ritorna (points, badges) aggiornati dell'autore.
+    """
+    # Nel ledger subito, prima del commit: una seconda reazione concorrente risulta già data
+    previous = _ledger_get(message_id, user_id)
+    _ledger_set(message_id, user_id, emoji)
+    try:
+        return await transaction(_record_reaction, message_id, user_id, participant_id, emoji,
+                                 points, reputation, event_type, event_message_id)
+    except Exception:
+        if previous is None:
+            _ledger_pop(message_id, user_id)
+        else:
+            _ledger_set(message_id, user_id, previous)
+        raise
+
+def _remove_reaction(db, message_id, user_id, emoji, participant_id, points_event, reputation_event, event_message_id):
+    row = queries.fetchone(db, 'reactions.given', (message_id, user_id, emoji))
+    if not row:
+        return None
+    points_given, reputation_given = row
+    queries.execute(db, 'reactions.delete', (message_id, user_id, emoji))
+    if points_given > 0:
+        queries.execute(db, 'users.sub_points', (points_given, participant_id))
+        _record_weekly_event(db, participant_id, points_event, points=-points_given, message_id=event_message_id)
+    if reputation_given > 0:
+        queries.execute(db, 'users.sub_reputation', (reputation_given, participant_id))
+        _record_weekly_event(db, participant_id, reputation_event, reputation=-reputation_given, message_id=event_message_id)
+    user_row = queries.fetchone(db, 'users.points_badges', (participant_id,))
+    return points_given, reputation_given, user_row
+
+async def remove_reaction(message_id, user_id, emoji, participant_id, points_event, reputation_event, event_message_id):
+    """
+    Elimina una reazione registrata e storna il bonus dato all'autore in un'unica scrittura atomica.
+    Ritorna None se la reazione non era registrata, altrimenti
+    (points_given, reputation_given, (points, badges) dell'autore).
+    """
+    removed = await transaction(_remove_reaction, message_id, user_id, emoji, participant_id,
+                                points_event, reputation_event, event_message_id)
+    if removed is not None or _ledger_get(message_id, user_id) == emoji:
+        _ledger_pop(message_id, user_id)
+    return removed
+
+# ---------- LEDGER REAZIONI ----------
+# Controlli di idoneità delle reazioni senza I/O: per i messaggi coperti dal ledger (submission della
+# settimana, repost spotlight, messaggi registrati dopo l'avvio) la risposta viene dalla memoria;
+# per gli altri si legge la tabella reactions.
+async def get_user_reaction(message_id, user_id):
+    """Emoji con cui user_id ha reagito a message_id, None se non ha reagito."""
+    emoji = _ledger_get(message_id, user_id)
+    if emoji is not None or message_id in _ledger_messages:
+        return emoji
+    row = await fetchone('reactions.emoji', (message_id, user_id))
+    return row[0] if row else None
+
+async def has_reacted(message_id, user_id):
+    return await get_user_reaction(message_id, user_id) is not None
+
+def has_reacted_to_reposts(original_message_id, user_id):
+    """True se user_id ha reagito a uno dei repost spotlight di original_message_id (tutti nel ledger)."""
+    return any(_ledger_get(spotlight_message_id, user_id) is not None
+               for spotlight_message_id in _reposts_by_original.get(original_message_id, ()))
+
+def _message_ts(message_id):
+    """Epoch di creazione di un messaggio Discord, ricavato dallo snowflake."""
+    return ((message_id >> 22) + DISCORD_EPOCH_MS) / 1000
+
+def _drop_ledger_messages(message_ids):
+    for message_id in message_ids:
+        _reaction_ledger.pop(message_id, None)
+        _ledger_messages.discard(message_id)
+
+def forget_messages(message_ids):
+    """
+    Toglie dal ledger i messaggi eliminati da Discord. I repost spotlight restano finché
+    delete_spotlight_week non li rimuove: servono a has_reacted_to_reposts per tutta la settimana.
+    """
+    _drop_ledger_messages([message_id for message_id in message_ids if message_id not in _reposts])
+
+def prune_reaction_ledger(since_ts):
+    """
+    Toglie dal ledger i messaggi creati prima di since_ts (epoch), esclusi i repost spotlight ancora
+    registrati: da lì in poi le loro reazioni si leggono dalla tabella reactions. Ritorna quanti ne ha tolti.
+    """
+    old = [message_id for message_id in _reaction_ledger.keys() | _ledger_messages
+           if message_id not in _reposts and _message_ts(message_id) < since_ts]
+    _drop_ledger_messages(old)
+    return len(old)
+
+def get_reposted_message_ids(week_start):
+    """Messaggi originali già repostati nella settimana (week_start ISO), dal ledger caricato da spotlight_reposts."""
+    return {original_message_id for original_message_id, _, repost_week in _reposts.values() if repost_week == week_start}
+
+def get_repost(spotlight_message_id):
+    """(original_message_id, user_id) del repost spotlight, None se il messaggio non è un repost."""
+    repost = _reposts.get(spotlight_message_id)
+    return repost[:2] if repost else None
+
+def _add_spotlight_repost(db, original_message_id, spotlight_message_id, user_id, week_start, timestamp, slot_ts,
+                          bonus_points, bonus_reputation):
+    queries.execute(db, 'spotlight.insert_repost', (original_message_id, spotlight_message_id, user_id, week_start, timestamp))
+    if bonus_points:
+        queries.execute(db, 'users.add_points', (bonus_points, user_id))
+        _record_weekly_event(db, user_id, 'spotlight_bonus_points', points=bonus_points, message_id=original_message_id)
+    if bonus_reputation:
+        queries.execute(db, 'users.add_reputation', (bonus_reputation, user_id))
+        _record_weekly_event(db, user_id, 'spotlight_bonus_reputation', reputation=bonus_reputation,
+                             message_id=original_message_id)
+    if slot_ts is not None:
+        _record_spotlight_slot(db, slot_ts, 'repost', int(time.time()))
+
+async def add_spotlight_repost(original_message_id, spotlight_message_id, user_id, week_start, timestamp, slot_ts=None,
+                               bonus_points=0, bonus_reputation=0):
+    """
+    Registra un repost spotlight (week_start e timestamp in ISO) nel DB e nel ledger.
+    Nella stessa transazione assegna il bonus all'autore e, con slot_ts, lo slot dello scheduler
+    passa a 'repost': il bonus esiste solo se il repost è stato salvato.
+    """
+    await transaction(_add_spotlight_repost, original_message_id, spotlight_message_id, user_id,
+                      week_start, timestamp, slot_ts, bonus_points, bonus_reputation)
+    _reposts[spotlight_message_id] = (original_message_id, user_id, week_start)
+    _reposts_by_original.setdefault(original_message_id, {})[spotlight_message_id] = None
+    _ledger_messages.add(spotlight_message_id)
+
+async def delete_spotlight_week(week_start):
+    """Elimina i repost della settimana (week_start ISO) dal DB e dal ledger."""
+    await execute('spotlight.delete_week', (week_start,))
+    for spotlight_message_id, (original_message_id, _, repost_week) in list(_reposts.items()):
+        if repost_week != week_start:
+            continue
+        del _reposts[spotlight_message_id]
+        _drop_ledger_messages([spotlight_message_id])
+        by_original = _reposts_by_original.get(original_message_id)
+        if by_original is not None:
+            by_original.pop(spotlight_message_id, None)
+            if not by_original:
+                del _reposts_by_original[original_message_id]
+
+# ---------- SLOT SPOTLIGHT ----------
+def _record_spotlight_slot(db, slot_ts, status, fired_at):
+    queries.execute(db, 'spotlight_slots.upsert', (slot_ts, status, fired_at))
+    queries.execute(db, 'spotlight_slots.prune', (slot_ts - SPOTLIGHT_SLOTS_RETENTION,))
+
+async def record_spotlight_slot(slot_ts, status, fired_at):
+    """
+    Segna lo slot (epoch) come eseguito con l'esito status, sostituendo quello precedente (es. 'in_corso');
+    le righe più vecchie della retention vengono rimosse.
+    """
+    await transaction(_record_spotlight_slot, slot_ts, status, fired_at)
+
+async def count_spotlight_slots(since_ts, until_ts, status):
+    """Numero di slot eseguiti con esito status tra since_ts (incluso) e until_ts (escluso)."""
+    row = await fetchone('spotlight_slots.count_status', (since_ts, until_ts, status))
+    return row[0] if row else 0
+
+async def get_fired_spotlight_slots(since_ts):
+    """Insieme degli slot (epoch) già eseguiti da since_ts in poi."""
+    return {row[0] for row in await fetchall('spotlight_slots.since', (since_ts,))}
+
+# ---------- ARCHIVIAZIONE SPOTLIGHT ----------
+async def is_spotlight_archive_completed(run_id):
+    return await fetchone('spotlight_archive.completed', (run_id,)) is not None
+
+async def start_spotlight_archive(run_id, started_at):
+    """Registra l'avvio dell'archiviazione (una sola riga per run_id, anche se ripresa)."""
+    await execute('spotlight_archive.start', (run_id, started_at))
+
+async def get_spotlight_archive_checkpoint(run_id):
+    """
+    Checkpoint di un'esecuzione di run_id non completata: (messaggi spotlight già copiati nell'archivio,
+    messaggi in invio al momento dell'interruzione, di cui la copia non è confermata).
+    """
+    copied, pending = set(), []
+    for message_id, archive_message_id in await fetchall('spotlight_archive.checkpoint', (run_id,)):
+        if archive_message_id:
+            copied.add(message_id)
+        else:
+            pending.append(message_id)
+    return copied, pending
+
+def _add_spotlight_archive_checkpoint(db, params):
+    queries.executemany(db, 'spotlight_archive.add_checkpoint', params)
+
+async def add_spotlight_archive_checkpoint(run_id, message_ids, archive_message_id):
+    """
+    Segna message_ids come copiati nel messaggio d'archivio archive_message_id;
+    con archive_message_id = 0 li segna come in invio.
+    """
+    await transaction(_add_spotlight_archive_checkpoint,
+                      [(message_id, run_id, archive_message_id) for message_id in message_ids])
+
+async def clear_spotlight_archive_pending(run_id):
+    """Libera i messaggi in invio di run_id: verranno copiati di nuovo."""
+    await execute('spotlight_archive.clear_pending', (run_id,))
+
+def _complete_spotlight_archive(db, run_id, completed_at):
+    queries.execute(db, 'spotlight_archive.complete', (completed_at, run_id, run_id))
+    queries.execute(db, 'spotlight_archive.clear_checkpoint', (run_id,))
+
+async def complete_spotlight_archive(run_id, completed_at):
+    """Chiude l'esecuzione, salvando il totale dei messaggi copiati (anche nei tentativi interrotti), e svuota il checkpoint."""
+    await transaction(_complete_spotlight_archive, run_id, completed_at)
@@ -0,0 +1,314 @@
+"""
+Migrazioni versionate dello schema del database.
+
+Ogni migrazione ha un numero progressivo e viene applicata una sola volta,
+in una propria transazione; la versione raggiunta è salvata in schema_version.
+Per modificare lo schema aggiungere una nuova voce in fondo a MIGRATIONS,
+senza mai cambiare quelle già rilasciate.
+"""
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _column_names(db, table):
+    return {row[1] for row in db.execute(f'PRAGMA table_info({table})')}
+
+def _initial_schema(db):
+    """Tabelle originali del bot (IF NOT EXISTS: innocua su database esistenti)."""
+    # Tabella utenti esistente
+    db.execute('''CREATE TABLE IF NOT EXISTS users
+                 (user_id INTEGER PRIMARY KEY, points INTEGER DEFAULT 0, reputation INTEGER DEFAULT 0,
+                  participations INTEGER DEFAULT 0, badges TEXT DEFAULT '')''')
+
+    # Tabella reazioni esistente con schema corretto
+    db.execute('''CREATE TABLE IF NOT EXISTS reactions
+                 (message_id INTEGER, user_id INTEGER, participant_id INTEGER,
+                  emoji TEXT, points_given INTEGER DEFAULT 0, reputation_given INTEGER DEFAULT 0,
+                  PRIMARY KEY (message_id, user_id))''')
+
+    # Tabella per tracking eventi settimanali
+    db.execute('''CREATE TABLE IF NOT EXISTS weekly_events
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  user_id INTEGER NOT NULL,
+                  event_type TEXT NOT NULL,
+                  points_earned INTEGER DEFAULT 0,
+                  reputation_earned INTEGER DEFAULT 0,
+                  timestamp TEXT NOT NULL,
+                  week_start TEXT NOT NULL,
+                  archived BOOLEAN DEFAULT 0,
+                  message_id INTEGER)''')
+
+    # Tabella per archivio classifiche settimanali
+    db.execute('''CREATE TABLE IF NOT EXISTS weekly_archives
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  week_start TEXT NOT NULL,
+                  week_end TEXT NOT NULL,
+                  embed_data TEXT NOT NULL,
+                  participants_count INTEGER DEFAULT 0,
+                  archived_at TEXT NOT NULL,
+                  hall_of_fame_message_id INTEGER)''')
+
+    # Nuova tabella per tracciare i repost in spotlight
+    db.execute('''CREATE TABLE IF NOT EXISTS spotlight_reposts
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  original_message_id INTEGER NOT NULL,
+                  spotlight_message_id INTEGER NOT NULL,
+                  user_id INTEGER NOT NULL,
+                  week_start TEXT NOT NULL,
+                  timestamp TEXT NOT NULL)''')
+
+    # --- gestione link inviati (per controllo duplicati) ---
+    db.execute('''
+    CREATE TABLE IF NOT EXISTS submitted_links (
+        normalized_link TEXT PRIMARY KEY,
+        raw_link TEXT,
+        user_id INTEGER,
+        message_id INTEGER,
+        timestamp TEXT
+    )
+    ''')
+
+    # indice per performance (opzionale ma consigliato)
+    db.execute('CREATE INDEX IF NOT EXISTS idx_submitted_links_time ON submitted_links (timestamp)')
+
+def _reactions_ledger_columns(db):
+    """Colonne aggiunte a reactions dopo il primo rilascio (prima migrate con ALTER in try/except)."""
+    existing = _column_names(db, 'reactions')
+    if 'emoji' not in existing:
+        db.execute('ALTER TABLE reactions ADD COLUMN emoji TEXT')
+    if 'points_given' not in existing:
+        db.execute('ALTER TABLE reactions ADD COLUMN points_given INTEGER DEFAULT 0')
+    if 'reputation_given' not in existing:
+        db.execute('ALTER TABLE reactions ADD COLUMN reputation_given INTEGER DEFAULT 0')
+
+def _hot_path_indexes(db):
+    """Indici per le query eseguite a ogni submission/reazione e per la classifica."""
+    # classifica settimanale e conteggi della settimana corrente
+    db.execute('CREATE INDEX IF NOT EXISTS idx_weekly_events_archived_time ON weekly_events (archived, timestamp, user_id)')
+    # _count_weekly_event_type e controllo bonus multipiattaforma per messaggio
+    db.execute('CREATE INDEX IF NOT EXISTS idx_weekly_events_user_type_msg ON weekly_events (user_id, event_type, message_id)')
+    # statistiche badge sulle reazioni ricevute
+    db.execute('CREATE INDEX IF NOT EXISTS idx_reactions_participant ON reactions (participant_id)')
+    # lookup repost dalle reazioni in spotlight e JOIN cross-channel
+    db.execute('CREATE INDEX IF NOT EXISTS idx_spotlight_reposts_spotlight_msg ON spotlight_reposts (spotlight_message_id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_spotlight_reposts_original_week ON spotlight_reposts (original_message_id, week_start)')
+
+def _weekly_events_week_id(db):
+    """
+    Timestamp epoch (ts) e settimana intera (week_id, YYYYMMDD) in weekly_events.
+    Le colonne ISO restano per compatibilità, ma i filtri settimanali usano week_id:
+    il confronto tra stringhe ISO si rompe quando cambia l'offset dell'ora legale.
+    """
+    from utils import get_week_id
+
+    existing = _column_names(db, 'weekly_events')
+    if 'ts' not in existing:
+        db.execute('ALTER TABLE weekly_events ADD COLUMN ts INTEGER')
+    if 'week_id' not in existing:
+        db.execute('ALTER TABLE weekly_events ADD COLUMN week_id INTEGER')
+
+    rows = db.execute('SELECT id, timestamp FROM weekly_events WHERE ts IS NULL OR week_id IS NULL').fetchall()
+    updates = []
+    for event_id, timestamp in rows:
+        try:
+            dt = datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            logger.error(f"Timestamp non valido in weekly_events id={event_id}: {timestamp!r}")
+            continue
+        updates.append((int(dt.timestamp()), get_week_id(dt), event_id))
+    db.executemany('UPDATE weekly_events SET ts = ?, week_id = ? WHERE id = ?', updates)
+
+    db.execute('CREATE INDEX IF NOT EXISTS idx_weekly_events_week ON weekly_events (week_id, archived, user_id)')
+
+def _weekly_user_totals(db):
+    """
+    Totali settimanali per utente aggiornati a ogni record_weekly_event, ricostruiti dagli eventi esistenti.
+    Evitano il GROUP BY su weekly_events per classifica e statistiche settimanali.
+    """
+    db.execute('''CREATE TABLE IF NOT EXISTS weekly_user_totals
+                  (week_id INTEGER NOT NULL,
+                   user_id INTEGER NOT NULL,
+                   points INTEGER NOT NULL DEFAULT 0,
+                   reputation INTEGER NOT NULL DEFAULT 0,
+                   participations INTEGER NOT NULL DEFAULT 0,
+                   events INTEGER NOT NULL DEFAULT 0,
+                   first_ts INTEGER,
+                   archived BOOLEAN NOT NULL DEFAULT 0,
+                   PRIMARY KEY (week_id, user_id))''')
+    # top-N della classifica per settimana
+    db.execute('CREATE INDEX IF NOT EXISTS idx_weekly_user_totals_rank ON weekly_user_totals (week_id, archived, points DESC)')
+    # controllo "message_id già contato" in scrittura
+    db.execute('CREATE INDEX IF NOT EXISTS idx_weekly_events_user_week_msg ON weekly_events (user_id, week_id, message_id)')
+
+    db.execute('''INSERT OR REPLACE INTO weekly_user_totals
+                  (week_id, user_id, points, reputation, participations, events, first_ts, archived)
+                  SELECT week_id, user_id, COALESCE(SUM(points_earned), 0), COALESCE(SUM(reputation_earned), 0),
+                         COUNT(DISTINCT message_id), COUNT(*), MIN(ts), 0
+                  FROM weekly_events
+                  WHERE archived = 0 AND week_id IS NOT NULL
+                  GROUP BY week_id, user_id''')
+
+def _users_points_index(db):
+    """Indice per calcolare la posizione in classifica globale contando gli utenti con più punti."""
+    db.execute('CREATE INDEX IF NOT EXISTS idx_users_points ON users (points)')
+
+def _weekly_events_cold_archive(db):
+    """
+    Separa gli eventi archiviati in weekly_events_archive (compatta: senza le colonne ISO),
+    così weekly_events contiene solo la settimana in corso. La vista weekly_events_all unisce le due.
+    Aggiunge a weekly_user_totals i contatori usati dai badge, che non si azzerano con il reset.
+    """
+    db.execute('''CREATE TABLE IF NOT EXISTS weekly_events_archive
+                  (id INTEGER PRIMARY KEY,
+                   user_id INTEGER NOT NULL,
+                   event_type TEXT NOT NULL,
+                   points_earned INTEGER DEFAULT 0,
+                   reputation_earned INTEGER DEFAULT 0,
+                   message_id INTEGER,
+                   ts INTEGER,
+                   week_id INTEGER)''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_weekly_events_archive_user_msg ON weekly_events_archive (user_id, message_id)')
+
+    existing = _column_names(db, 'weekly_user_totals')
+    if 'points_all' not in existing:
+        db.execute('ALTER TABLE weekly_user_totals ADD COLUMN points_all INTEGER NOT NULL DEFAULT 0')
+    if 'staff_bonus_events' not in existing:
+        db.execute('ALTER TABLE weekly_user_totals ADD COLUMN staff_bonus_events INTEGER NOT NULL DEFAULT 0')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_weekly_user_totals_user ON weekly_user_totals (user_id)')
+
+    # Le settimane già archiviate non avevano riga nei totali (backfill della migrazione 5 solo sugli attivi)
+    db.execute('''INSERT OR IGNORE INTO weekly_user_totals
+                  (week_id, user_id, points, reputation, participations, events, first_ts, archived)
+                  SELECT week_id, user_id, COALESCE(SUM(points_earned), 0), COALESCE(SUM(reputation_earned), 0),
+                         COUNT(DISTINCT message_id), COUNT(*), MIN(ts), 1
+                  FROM weekly_events
+                  WHERE week_id IS NOT NULL
+                  GROUP BY week_id, user_id''')
+    # Stesso criterio di database._is_staff_bonus_event
+    db.execute('''UPDATE weekly_user_totals SET
+                      points_all = COALESCE((SELECT SUM(points_earned) FROM weekly_events e
+                                             WHERE e.week_id = weekly_user_totals.week_id AND e.user_id = weekly_user_totals.user_id), 0),
+                      staff_bonus_events = (SELECT COUNT(*) FROM weekly_events e
+                                            WHERE e.week_id = weekly_user_totals.week_id AND e.user_id = weekly_user_totals.user_id
+                                              AND (lower(e.event_type) LIKE '%creativ%' OR lower(e.event_type) LIKE '%staff_bonus%'))''')
+
+    db.execute('''INSERT OR IGNORE INTO weekly_events_archive
+                  (id, user_id, event_type, points_earned, reputation_earned, message_id, ts, week_id)
+                  SELECT id, user_id, event_type, points_earned, reputation_earned, message_id, ts, week_id
+                  FROM weekly_events WHERE archived = 1''')
+    db.execute('DELETE FROM weekly_events WHERE archived = 1')
+
+    db.execute('''CREATE VIEW IF NOT EXISTS weekly_events_all AS
+                  SELECT id, user_id, event_type, points_earned, reputation_earned, message_id, ts, week_id
+                  FROM weekly_events
+                  UNION ALL
+                  SELECT id, user_id, event_type, points_earned, reputation_earned, message_id, ts, week_id
+                  FROM weekly_events_archive''')
+
+def _submissions_table(db):
+    """Indice locale delle submission accettate: sostituisce la scansione dello storico Discord all'avvio."""
+    db.execute('''CREATE TABLE IF NOT EXISTS submissions
+                  (message_id INTEGER PRIMARY KEY,
+                   user_id INTEGER NOT NULL,
+                   normalized TEXT NOT NULL,
+                   url TEXT,
+                   created_at INTEGER NOT NULL)''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_submissions_created ON submissions (created_at)')
+
+def _submissions_simhash(db):
+    """Impronta SimHash (64 bit con segno, vedi similarity.to_db) per i quasi-duplicati; NULL = da calcolare."""
+    if 'simhash' not in _column_names(db, 'submissions'):
+        db.execute('ALTER TABLE submissions ADD COLUMN simhash INTEGER')
+
+def _spotlight_slots(db):
+    """Slot spotlight già eseguiti (slot_ts epoch): lo scheduler non li ripete e dopo un riavvio recupera solo gli altri."""
+    db.execute('''CREATE TABLE IF NOT EXISTS spotlight_slots
+                  (slot_ts INTEGER PRIMARY KEY,
+                   status TEXT NOT NULL,
+                   fired_at INTEGER NOT NULL)''')
+
+def _spotlight_candidates(db):
+    """
+    Testo originale delle submission e flag spotlight_eligible (0 se il messaggio è stato eliminato o
+    modificato senza più hashtag/link): le submission della settimana sono il bacino dei repost spotlight.
+    Le righe precedenti hanno content NULL e il testo viene letto da Discord solo se scelte.
+    """
+    existing = _column_names(db, 'submissions')
+    if 'content' not in existing:
+        db.execute('ALTER TABLE submissions ADD COLUMN content TEXT')
+    if 'spotlight_eligible' not in existing:
+        db.execute('ALTER TABLE submissions ADD COLUMN spotlight_eligible INTEGER NOT NULL DEFAULT 1')
+    # esclusione degli autori già repostati nella settimana
+    db.execute('CREATE INDEX IF NOT EXISTS idx_spotlight_reposts_week_user ON spotlight_reposts (week_start, user_id)')
+
+def _spotlight_archive(db):
+    """
+    Archiviazione settimanale dello spotlight: una riga per scadenza (run_id = epoch della domenica 20:00)
+    in spotlight_archive_runs e, durante l'esecuzione, i messaggi già copiati in spotlight_archive_checkpoint.
+    """
+    db.execute('''CREATE TABLE IF NOT EXISTS spotlight_archive_runs
+                  (run_id INTEGER PRIMARY KEY,
+                   started_at INTEGER NOT NULL,
+                   completed_at INTEGER,
+                   archived INTEGER NOT NULL DEFAULT 0)''')
+    db.execute('''CREATE TABLE IF NOT EXISTS spotlight_archive_checkpoint
+                  (message_id INTEGER PRIMARY KEY,
+                   run_id INTEGER NOT NULL,
+                   archive_message_id INTEGER NOT NULL)''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_spotlight_archive_checkpoint_run ON spotlight_archive_checkpoint (run_id)')
+
+def _submissions_simhash_caption(db):
+    """Impronte ricalcolate sulla sola didascalia (link esclusi, vedi similarity.py): le vecchie tornano NULL."""
+    db.execute('UPDATE submissions SET simhash = NULL WHERE simhash IS NOT NULL')
+
+def _drop_weekly_events_archived_time_index(db):
+    """
+    idx_weekly_events_archived_time (archived, timestamp, user_id) non serve più a nessuna query: i filtri
+    settimanali usano week_id (idx_weekly_events_week) e ts. Toglierlo alleggerisce ogni INSERT in weekly_events.
+    """
+    db.execute('DROP INDEX IF EXISTS idx_weekly_events_archived_time')
+
+# (versione, descrizione, funzione): l'ordine è quello di applicazione
+MIGRATIONS = [
+    (1, "schema iniziale", _initial_schema),
+    (2, "colonne emoji/points_given/reputation_given in reactions", _reactions_ledger_columns),
+    (3, "indici per classifica, conteggi settimanali e reazioni", _hot_path_indexes),
+    (4, "colonne ts/week_id intere in weekly_events", _weekly_events_week_id),
+    (5, "totali settimanali materializzati weekly_user_totals", _weekly_user_totals),
+    (6, "indice users(points) per la posizione in classifica", _users_points_index),
+    (7, "tabella fredda weekly_events_archive e contatori badge nei totali", _weekly_events_cold_archive),
+    (8, "tabella submissions per il riscaldamento della cache", _submissions_table),
+    (9, "impronta simhash in submissions per i quasi-duplicati", _submissions_simhash),
+    (10, "tabella spotlight_slots per lo scheduler dei repost", _spotlight_slots),
+    (11, "testo e idoneità spotlight in submissions", _spotlight_candidates),
+    (12, "esecuzioni e checkpoint dell'archiviazione spotlight", _spotlight_archive),
+    (13, "impronte simhash ricalcolate senza i link", _submissions_simhash_caption),
+    (14, "rimosso l'indice inutilizzato idx_weekly_events_archived_time", _drop_weekly_events_archived_time_index),
+]
+
+def apply_migrations(db):
+    """
+    Applica in ordine le migrazioni non ancora registrate in schema_version.
+    db deve essere in autocommit (isolation_level=None): ogni migrazione gira in BEGIN/COMMIT propri.
+    """
+    db.execute('''CREATE TABLE IF NOT EXISTS schema_version
+                  (version INTEGER PRIMARY KEY,
+                   description TEXT NOT NULL,
+                   applied_at TEXT NOT NULL)''')
+    current = db.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        db.execute('BEGIN')
+        try:
+            migrate(db)
+            db.execute('INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                       (version, description, datetime.now().isoformat()))
+            db.execute('COMMIT')
+        except Exception as e:
+            db.execute('ROLLBACK')
+            logger.error(f"Migrazione {version} ({description}) fallita: {e}")
+            raise
+        logger.info(f"Migrazione {version} applicata: {description}")
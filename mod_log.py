@@ -0,0 +1,148 @@
+"""
+Invio in background dei messaggi nel canale mod-logs.
+
+I cog chiamano bot.mod_log.send(...) senza await: le righe finiscono in una coda e un
+task le unisce in messaggi multi-riga (e gruppi di embed) ogni MOD_LOG_FLUSH_SECONDS,
+rispettando un limite di messaggi per finestra di tempo sul canale. Se la coda è piena
+le nuove righe vengono scartate e al flush successivo si invia un riepilogo.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+import discord
+from config import LOG_CHANNEL_ID, MOD_LOG_FLUSH_SECONDS, MOD_LOG_MAX_PENDING, MOD_LOG_RATE_LIMIT, MOD_LOG_RATE_PERIOD
+
+logger = logging.getLogger(__name__)
+
+# Limiti di Discord per un singolo messaggio
+_MAX_CONTENT_LENGTH = 2000
+_MAX_EMBEDS = 10
+_MAX_EMBEDS_LENGTH = 6000
+
+
+class ModLogDispatcher:
+    def __init__(self, bot, channel_id=LOG_CHANNEL_ID, flush_interval=MOD_LOG_FLUSH_SECONDS,
+                 max_pending=MOD_LOG_MAX_PENDING, rate_limit=MOD_LOG_RATE_LIMIT, rate_period=MOD_LOG_RATE_PERIOD):
+        self.bot = bot
+        self.channel_id = channel_id
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+
+        self._pending = deque()   # (testo, None) oppure (None, embed), in ordine di arrivo
+        self._sent_at = deque()   # istanti (monotonic) degli ultimi invii, per il limite di frequenza
+        self._dropped_since_flush = 0
+        self._task = None
+
+        self.lines_queued = 0
+        self.messages_sent = 0
+        self.dropped = 0
+
+    def send(self, content=None, *, embed=None):
+        """Accoda una riga di testo e/o un embed per il canale mod-logs (non blocca)."""
+        items = []
+        if content is not None:
+            items.append((str(content), None))
+        if embed is not None:
+            items.append((None, embed))
+        for item in items:
+            if len(self._pending) >= self.max_pending:
+                self._dropped_since_flush += 1
+                self.dropped += 1
+                continue
+            self._pending.append(item)
+            self.lines_queued += 1
+        self._ensure_task()
+
+    def _ensure_task(self):
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # nessun event loop attivo: la coda verrà svuotata al prossimo send
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        # Il task resta vivo solo finché c'è qualcosa da inviare; send() lo riavvia
+        while self._pending or self._dropped_since_flush:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Errore invio mod-log: {e}")
+
+    async def flush(self):
+        """Invia le righe in coda nel limite di frequenza; quelle rimaste aspettano il giro successivo."""
+        channel = self.bot.get_channel(self.channel_id)
+        if not channel or not channel.permissions_for(channel.guild.me).send_messages:
+            if self._pending:
+                logger.warning(f"Canale mod-logs non disponibile: scartate {len(self._pending)} righe di log")
+                self.dropped += len(self._pending)
+                self._pending.clear()
+            self._dropped_since_flush = 0
+            return
+
+        if self._dropped_since_flush:
+            # Riepilogo in testa, al posto delle righe perse
+            self._pending.appendleft((f"⚠️ Log sovraccarico: {self._dropped_since_flush} righe scartate", None))
+            self._dropped_since_flush = 0
+
+        while self._pending and self._take_rate_slot():
+            content, embeds = self._next_batch()
+            kwargs = {}
+            if content:
+                kwargs['content'] = content
+            if embeds:
+                kwargs['embeds'] = embeds
+            try:
+                await channel.send(**kwargs)
+                self.messages_sent += 1
+            except discord.HTTPException as e:
+                logger.error(f"Errore invio mod-log ({len(content)} caratteri, {len(embeds)} embed): {e}")
+
+    def _take_rate_slot(self):
+        now = time.monotonic()
+        while self._sent_at and now - self._sent_at[0] >= self.rate_period:
+            self._sent_at.popleft()
+        if len(self._sent_at) >= self.rate_limit:
+            return False
+        self._sent_at.append(now)
+        return True
+
+    def _next_batch(self):
+        """Estrae dalla coda il prossimo messaggio: righe unite con a capo, seguite da eventuali embed."""
+        lines = []
+        length = 0
+        embeds = []
+        embeds_length = 0
+        while self._pending:
+            text, embed = self._pending[0]
+            if text is not None:
+                # Il testo va sopra gli embed: una riga arrivata dopo un embed apre un nuovo messaggio
+                if embeds:
+                    break
+                if len(text) > _MAX_CONTENT_LENGTH:
+                    text = text[:_MAX_CONTENT_LENGTH - 1] + '…'
+                added = len(text) + (1 if lines else 0)
+                if lines and length + added > _MAX_CONTENT_LENGTH:
+                    break
+                lines.append(text)
+                length += added
+            else:
+                if embeds and (len(embeds) >= _MAX_EMBEDS or embeds_length + len(embed) > _MAX_EMBEDS_LENGTH):
+                    break
+                embeds.append(embed)
+                embeds_length += len(embed)
+            self._pending.popleft()
+        return '\n'.join(lines), embeds
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'queued': self.lines_queued,
+            'sent_messages': self.messages_sent,
+            'dropped': self.dropped,
+        }
@@ -0,0 +1,380 @@
+"""
+Registro centrale delle query SQL, identificate da un nome (es. 'leaderboard.top10').
+
+Ogni esecuzione passa da execute/fetchone/fetchall/iterate di questo modulo, che misurano
+la durata per nome (lettura delle righe compresa): numero di chiamate, tempo totale e latenze p50/p99.
+Le query più lente di SLOW_QUERY_THRESHOLD_MS finiscono nel log insieme al loro
+EXPLAIN QUERY PLAN. Le migrazioni dello schema restano in migrations.py.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Soglia oltre la quale una query viene registrata come lenta (millisecondi)
+SLOW_QUERY_THRESHOLD_MS = 50
+# Campioni di latenza conservati per query (finestra mobile per p50/p99)
+LATENCY_SAMPLES = 1000
+# Righe lette per volta dal cursore in iterate
+_ITERATE_BATCH = 256
+
+QUERIES = {
+    # --- utenti ---
+    'users.count': 'SELECT COUNT(*) FROM users',
+    'users.points': 'SELECT points FROM users WHERE user_id = ?',
+    'users.count_above_points': 'SELECT COUNT(*) FROM users WHERE points > ?',
+    'users.ensure': 'INSERT OR IGNORE INTO users (user_id) VALUES (?)',
+    'users.add_points_reputation': 'UPDATE users SET points = points + ?, reputation = reputation + ? WHERE user_id = ?',
+    'users.points_badges': 'SELECT points, badges FROM users WHERE user_id = ?',
+    'users.sub_points': 'UPDATE users SET points = points - ? WHERE user_id = ?',
+    'users.sub_reputation': 'UPDATE users SET reputation = reputation - ? WHERE user_id = ?',
+    'users.stats': 'SELECT points, reputation, participations FROM users WHERE user_id = ?',
+    'users.insert': 'INSERT INTO users (user_id, points, reputation, participations, badges) VALUES (?, ?, ?, ?, ?)',
+    'users.set_points_reputation': 'UPDATE users SET points = ?, reputation = ? WHERE user_id = ?',
+    'users.set_badges': 'UPDATE users SET badges = ? WHERE user_id = ?',
+    'users.profile': 'SELECT points, reputation, participations, badges FROM users WHERE user_id = ?',
+    'users.add_submission': 'UPDATE users SET points = points + 10, participations = participations + 1 WHERE user_id = ?',
+    'users.add_points': 'UPDATE users SET points = points + ? WHERE user_id = ?',
+    'users.add_reputation': 'UPDATE users SET reputation = reputation + ? WHERE user_id = ?',
+
+    # --- link inviati ---
+    'links.all': 'SELECT normalized_link FROM submitted_links',
+    'links.insert': 'INSERT OR IGNORE INTO submitted_links (normalized_link, raw_link, user_id, message_id, timestamp) VALUES (?,?,?,?,?)',
+
+    # --- eventi settimanali ---
+    'weekly_events.message_seen': '''
+        SELECT 1 FROM weekly_events
+        WHERE user_id = ? AND week_id = ? AND message_id = ? AND archived = 0 LIMIT 1
+    ''',
+    'weekly_events.insert': '''
+        INSERT INTO weekly_events
+        (user_id, event_type, points_earned, reputation_earned, timestamp, week_start, message_id, ts, week_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'weekly_events.count_type': '''
+        SELECT COUNT(*) FROM weekly_events
+        WHERE user_id = ? AND event_type = ? AND week_id = ? AND archived = 0
+    ''',
+    # Reset: archivia la settimana indicata e tutte quelle precedenti rimaste nella tabella calda
+    'weekly_events.copy_until_to_archive': '''
+        INSERT INTO weekly_events_archive
+        (id, user_id, event_type, points_earned, reputation_earned, message_id, ts, week_id)
+        SELECT id, user_id, event_type, points_earned, reputation_earned, message_id, ts, week_id
+        FROM weekly_events
+        WHERE week_id <= ? AND archived = 0
+    ''',
+    'weekly_events.delete_until': 'DELETE FROM weekly_events WHERE week_id <= ? AND archived = 0',
+    'weekly_events.count_active': 'SELECT COUNT(*) FROM weekly_events WHERE archived = 0',
+    'weekly_events.exists_for_message': 'SELECT 1 FROM weekly_events WHERE user_id = ? AND event_type = ? AND message_id = ? LIMIT 1',
+
+    # --- totali settimanali materializzati ---
+    'weekly_totals.upsert': '''
+        INSERT INTO weekly_user_totals
+        (week_id, user_id, points, reputation, participations, events, first_ts, archived, points_all, staff_bonus_events)
+        VALUES (?, ?, ?, ?, ?, 1, ?, 0, ?, ?)
+        ON CONFLICT (week_id, user_id) DO UPDATE SET
+            points_all = points_all + excluded.points_all,
+            staff_bonus_events = staff_bonus_events + excluded.staff_bonus_events,
+            points = CASE WHEN archived THEN excluded.points ELSE points + excluded.points END,
+            reputation = CASE WHEN archived THEN excluded.reputation ELSE reputation + excluded.reputation END,
+            participations = CASE WHEN archived THEN excluded.participations ELSE participations + excluded.participations END,
+            events = CASE WHEN archived THEN 1 ELSE events + 1 END,
+            first_ts = CASE WHEN archived THEN excluded.first_ts ELSE MIN(first_ts, excluded.first_ts) END,
+            archived = 0
+    ''',
+    'weekly_totals.user': '''
+        SELECT points, reputation, participations FROM weekly_user_totals
+        WHERE week_id = ? AND user_id = ? AND archived = 0
+    ''',
+    'weekly_totals.archive_until': 'UPDATE weekly_user_totals SET archived = 1 WHERE week_id <= ? AND archived = 0',
+
+    # --- classifica ---
+    'leaderboard.top10': '''
+        SELECT
+            t.user_id,
+            t.points as weekly_points,
+            t.reputation as weekly_reputation,
+            t.participations as weekly_participations,
+            t.first_ts as first_participation,
+            u.reputation as total_reputation
+        FROM weekly_user_totals t
+        LEFT JOIN users u ON t.user_id = u.user_id
+        WHERE t.week_id = ? AND t.archived = 0
+        ORDER BY weekly_points DESC, total_reputation DESC, first_participation ASC
+        LIMIT 10
+    ''',
+
+    # --- /weekly-stats ---
+    'weekly_stats.by_event_type': '''
+        SELECT
+            event_type,
+            COUNT(*) as event_count,
+            SUM(points_earned) as total_points,
+            SUM(reputation_earned) as total_reputation
+        FROM weekly_events
+        WHERE week_id = ? AND archived = 0
+        GROUP BY event_type
+    ''',
+    'weekly_stats.unique_users': '''
+        SELECT COUNT(*) as unique_users
+        FROM weekly_user_totals
+        WHERE week_id = ? AND archived = 0
+    ''',
+    'weekly_stats.top_contributor': '''
+        SELECT
+            user_id,
+            points as weekly_points,
+            events as activity_count
+        FROM weekly_user_totals
+        WHERE week_id = ? AND archived = 0
+        ORDER BY weekly_points DESC
+        LIMIT 1
+    ''',
+
+    # --- badge ---
+    'badges.weeks_with_min_points': '''
+        SELECT COUNT(*) FROM weekly_user_totals
+        WHERE user_id = ? AND points_all >= ?
+    ''',
+    'badges.distinct_challenges': '''
+        SELECT COUNT(DISTINCT message_id) FROM weekly_events_all
+        WHERE user_id = ? AND message_id IS NOT NULL
+    ''',
+    'badges.community_reactions': '''
+        SELECT COUNT(*) FROM reactions
+        WHERE participant_id = ? AND reputation_given > 0
+    ''',
+    'badges.avg_reactions_per_challenge': '''
+        SELECT AVG(cnt) FROM (
+            SELECT message_id, COUNT(*) as cnt
+            FROM reactions
+            WHERE participant_id = ?
+            GROUP BY message_id
+        )
+    ''',
+    'badges.creativity_bonus': 'SELECT SUM(staff_bonus_events) FROM weekly_user_totals WHERE user_id = ?',
+    'badges.spotlight_weeks': '''
+        SELECT COUNT(DISTINCT week_start) FROM spotlight_reposts
+        WHERE user_id = ?
+    ''',
+    'badges.submitted_links': '''
+        SELECT message_id, raw_link FROM submitted_links
+        WHERE user_id = ?
+    ''',
+    'badges.test_event_since': 'SELECT 1 FROM weekly_events_all WHERE user_id = ? AND event_type = ? AND ts >= ? LIMIT 1',
+
+    # --- reazioni ---
+    'reactions.insert': '''
+        INSERT INTO reactions
+        (message_id, user_id, participant_id, emoji, points_given, reputation_given)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    'reactions.given': 'SELECT points_given, reputation_given FROM reactions WHERE message_id = ? AND user_id = ? AND emoji = ?',
+    'reactions.delete': 'DELETE FROM reactions WHERE message_id = ? AND user_id = ? AND emoji = ?',
+    'reactions.emoji': 'SELECT emoji FROM reactions WHERE message_id = ? AND user_id = ?',
+    'reactions.on_submissions_since': '''
+        SELECT r.message_id, r.user_id, r.emoji FROM submissions s
+        JOIN reactions r ON r.message_id = s.message_id
+        WHERE s.created_at >= ?
+    ''',
+    'reactions.on_reposts': '''
+        SELECT r.message_id, r.user_id, r.emoji FROM spotlight_reposts s
+        JOIN reactions r ON r.message_id = s.spotlight_message_id
+    ''',
+
+    # --- submission ---
+    'submissions.insert': '''
+        INSERT OR IGNORE INTO submissions (message_id, user_id, normalized, url, created_at, simhash, content)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'submissions.set_content': 'UPDATE submissions SET content = ?, spotlight_eligible = ? WHERE message_id = ?',
+    'submissions.set_ineligible': 'UPDATE submissions SET spotlight_eligible = 0 WHERE message_id = ?',
+    'submissions.set_simhash': 'UPDATE submissions SET simhash = ? WHERE message_id = ?',
+    'submissions.any': 'SELECT 1 FROM submissions LIMIT 1',
+    'submissions.author': 'SELECT user_id FROM submissions WHERE message_id = ?',
+    'submissions.spotlight_state': 'SELECT content, spotlight_eligible FROM submissions WHERE message_id = ?',
+    'submissions.ids_since': 'SELECT message_id FROM submissions WHERE created_at >= ?',
+    'submissions.since': '''
+        SELECT message_id, user_id, normalized, url, created_at, simhash FROM submissions
+        WHERE created_at >= ?
+        ORDER BY created_at
+    ''',
+    'submissions.reactions_since': '''
+        SELECT r.message_id, r.emoji FROM submissions s
+        JOIN reactions r ON r.message_id = s.message_id
+        WHERE s.created_at >= ?
+    ''',
+
+    # --- spotlight ---
+    'spotlight.candidates': '''
+        SELECT s.message_id, s.user_id, s.content,
+               (SELECT COUNT(*) FROM reactions x WHERE x.message_id = s.message_id) AS reactions,
+               (SELECT MAX(e.ts) FROM weekly_events_all e
+                WHERE e.user_id = s.user_id AND e.event_type IN ('spotlight_bonus_points', 'spotlight_bonus_reputation')) AS last_spotlight
+        FROM submissions s
+        WHERE s.created_at >= ? AND s.spotlight_eligible = 1
+          AND NOT EXISTS (SELECT 1 FROM spotlight_reposts r WHERE r.original_message_id = s.message_id)
+          AND s.user_id NOT IN (SELECT user_id FROM spotlight_reposts WHERE week_start = ?)
+        ORDER BY s.message_id
+    ''',
+    'spotlight.insert_repost': '''
+        INSERT INTO spotlight_reposts
+        (original_message_id, spotlight_message_id, user_id, week_start, timestamp)
+        VALUES (?, ?, ?, ?, ?)
+    ''',
+    'spotlight.delete_week': 'DELETE FROM spotlight_reposts WHERE week_start = ?',
+    'spotlight.all_reposts': 'SELECT spotlight_message_id, original_message_id, user_id, week_start FROM spotlight_reposts',
+    'spotlight_archive.start': 'INSERT OR IGNORE INTO spotlight_archive_runs (run_id, started_at) VALUES (?, ?)',
+    'spotlight_archive.completed': 'SELECT 1 FROM spotlight_archive_runs WHERE run_id = ? AND completed_at IS NOT NULL',
+    'spotlight_archive.complete': '''
+        UPDATE spotlight_archive_runs
+        SET completed_at = ?, archived = (SELECT COUNT(*) FROM spotlight_archive_checkpoint
+                                          WHERE run_id = ? AND archive_message_id != 0)
+        WHERE run_id = ?
+    ''',
+    # archive_message_id = 0: messaggio in invio, copia non ancora confermata (vedi spotlight_archive.py)
+    'spotlight_archive.checkpoint': 'SELECT message_id, archive_message_id FROM spotlight_archive_checkpoint WHERE run_id = ?',
+    'spotlight_archive.add_checkpoint': '''
+        INSERT INTO spotlight_archive_checkpoint (message_id, run_id, archive_message_id) VALUES (?, ?, ?)
+        ON CONFLICT(message_id) DO UPDATE SET archive_message_id = excluded.archive_message_id
+    ''',
+    'spotlight_archive.clear_pending': 'DELETE FROM spotlight_archive_checkpoint WHERE run_id = ? AND archive_message_id = 0',
+    'spotlight_archive.clear_checkpoint': 'DELETE FROM spotlight_archive_checkpoint WHERE run_id = ?',
+    'spotlight_slots.since': 'SELECT slot_ts FROM spotlight_slots WHERE slot_ts >= ?',
+    # Lo slot è riservato ('in_corso') prima dell'invio e aggiornato con l'esito finale
+    'spotlight_slots.upsert': '''
+        INSERT INTO spotlight_slots (slot_ts, status, fired_at) VALUES (?, ?, ?)
+        ON CONFLICT(slot_ts) DO UPDATE SET status = excluded.status, fired_at = excluded.fired_at
+    ''',
+    'spotlight_slots.prune': 'DELETE FROM spotlight_slots WHERE slot_ts < ?',
+    'spotlight_slots.count_status': 'SELECT COUNT(*) FROM spotlight_slots WHERE slot_ts >= ? AND slot_ts < ? AND status = ?',
+
+    # --- archivio classifiche ---
+    'archives.insert': '''
+        INSERT INTO weekly_archives
+        (week_start, week_end, embed_data, participants_count, archived_at, hall_of_fame_message_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    'archives.count': 'SELECT COUNT(*) FROM weekly_archives',
+    'archives.delete_all': 'DELETE FROM weekly_archives',
+    'archives.list': '''
+        SELECT id, week_start, week_end, participants_count, archived_at
+        FROM weekly_archives ORDER BY week_start DESC LIMIT 20
+    ''',
+    'archives.get': '''
+        SELECT week_start, week_end, embed_data, participants_count, archived_at, hall_of_fame_message_id
+        FROM weekly_archives WHERE id = ?
+    ''',
+}
+
+
+class _QueryStats:
+    __slots__ = ('count', 'total', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=LATENCY_SAMPLES)
+
+
+# Le query girano sia nel thread di scrittura sia nel pool di lettura
+_stats = {}
+_stats_lock = threading.Lock()
+
+def _record(db, name, sql, params, elapsed):
+    with _stats_lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = _QueryStats()
+        stats.count += 1
+        stats.total += elapsed
+        stats.samples.append(elapsed)
+
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+        try:
+            plan = '; '.join(row[3] for row in db.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+        except Exception as e:
+            plan = f"non disponibile ({e})"
+        # Solo numero e tipi dei parametri: i valori contengono testo dei messaggi e id degli utenti
+        types = ', '.join(type(param).__name__ for param in params)
+        logger.warning(f"Query lenta {name}: {elapsed_ms:.1f} ms, {len(params)} parametri ({types}), piano: {plan}")
+
+def _timed(db, name, params, fetch):
+    sql = QUERIES[name]
+    start = time.perf_counter()
+    cursor = db.execute(sql, params)
+    result = fetch(cursor)
+    _record(db, name, sql, params, time.perf_counter() - start)
+    return result
+
+def execute(db, name, params=()):
+    """
+    Esegue la scrittura registrata come name e ritorna il cursore (per rowcount).
+    Per le SELECT usare fetchone/fetchall/iterate: qui la misura non comprende la lettura delle righe.
+    """
+    return _timed(db, name, params, lambda cursor: cursor)
+
+def fetchone(db, name, params=()):
+    """Esegue la query registrata come name e ritorna la prima riga o None."""
+    return _timed(db, name, params, lambda cursor: cursor.fetchone())
+
+def fetchall(db, name, params=()):
+    """Esegue la query registrata come name e ritorna tutte le righe."""
+    return _timed(db, name, params, lambda cursor: cursor.fetchall())
+
+def iterate(db, name, params=()):
+    """
+    Esegue la SELECT registrata come name e ne produce le righe senza caricarle tutte in memoria.
+    La misura, registrata quando il generatore si chiude, somma esecuzione e lettura delle righe
+    ma non il tempo speso da chi le consuma.
+    """
+    sql = QUERIES[name]
+    start = time.perf_counter()
+    cursor = db.execute(sql, params)
+    elapsed = time.perf_counter() - start
+    try:
+        while True:
+            start = time.perf_counter()
+            rows = cursor.fetchmany(_ITERATE_BATCH)
+            elapsed += time.perf_counter() - start
+            if not rows:
+                break
+            yield from rows
+    finally:
+        _record(db, name, sql, params, elapsed)
+
+def executemany(db, name, seq_of_params):
+    """Esegue la query registrata come name per ogni tupla di parametri (una sola misura per il blocco)."""
+    sql = QUERIES[name]
+    seq_of_params = list(seq_of_params)
+    start = time.perf_counter()
+    cursor = db.executemany(sql, seq_of_params)
+    _record(db, name, sql, seq_of_params[0] if seq_of_params else (), time.perf_counter() - start)
+    return cursor
+
+def _percentile(sorted_samples, fraction):
+    index = min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))
+    return sorted_samples[index]
+
+def get_query_stats():
+    """
+    Ritorna le metriche per query, ordinate per tempo totale decrescente:
+    lista di dict con name, count, total_ms, p50_ms, p99_ms.
+    """
+    with _stats_lock:
+        snapshot = [(name, stats.count, stats.total, sorted(stats.samples)) for name, stats in _stats.items()]
+
+    report = []
+    for name, count, total, samples in snapshot:
+        report.append({
+            'name': name,
+            'count': count,
+            'total_ms': total * 1000,
+            'p50_ms': _percentile(samples, 0.50) * 1000 if samples else 0.0,
+            'p99_ms': _percentile(samples, 0.99) * 1000 if samples else 0.0,
+        })
+    report.sort(key=lambda entry: entry['total_ms'], reverse=True)
+    return report
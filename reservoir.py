@@ -0,0 +1,59 @@
+"""
+Campionamento pesato a serbatoio (A-Res, Efraimidis-Spirakis) in un solo passaggio.
+
+Ogni elemento con peso w riceve la chiave log(u) / w (u uniforme in (0, 1]) e si tengono le k chiavi
+più alte in un heap: memoria O(k) qualunque sia la lunghezza della sorgente, che può essere una
+lista, un cursore SQLite o un iteratore async come channel.history(). Il risultato è ordinato per
+chiave decrescente, quindi gli elementi dopo il primo sono le alternative pesate nell'ordine in
+cui andrebbero estratte. Con rng = random.Random(seed) la selezione è riproducibile.
+"""
+import heapq
+import math
+import random
+
+
+class _Reservoir:
+    __slots__ = ('k', 'weight', 'rng', 'heap', 'seen')
+
+    def __init__(self, k, weight, rng):
+        if k < 1:
+            raise ValueError("k deve essere almeno 1")
+        self.k = k
+        self.weight = weight
+        self.rng = rng if rng is not None else random.Random()
+        self.heap = []   # (chiave, ordine di arrivo, elemento): la chiave più bassa in cima
+        self.seen = 0
+
+    def offer(self, item):
+        w = 1.0 if self.weight is None else self.weight(item)
+        if w <= 0:
+            return
+        self.seen += 1
+        key = math.log(1.0 - self.rng.random()) / w
+        entry = (key, self.seen, item)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif key > self.heap[0][0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def result(self):
+        return [item for _, _, item in sorted(self.heap, reverse=True)]
+
+
+def weighted_sample(items, k=1, weight=None, rng=None):
+    """
+    Fino a k elementi di items estratti senza ripetizione con probabilità proporzionale a weight(item)
+    (uniforme se weight è None; gli elementi con peso <= 0 sono esclusi), in ordine di estrazione.
+    """
+    reservoir = _Reservoir(k, weight, rng)
+    for item in items:
+        reservoir.offer(item)
+    return reservoir.result()
+
+
+async def weighted_sample_async(items, k=1, weight=None, rng=None):
+    """Come weighted_sample, su un iteratore async (es. channel.history())."""
+    reservoir = _Reservoir(k, weight, rng)
+    async for item in items:
+        reservoir.offer(item)
+    return reservoir.result()
@@ -0,0 +1,156 @@
+"""
+Impronte SimHash delle submission per il controllo dei quasi-duplicati.
+
+L'impronta è un intero a 64 bit calcolato sulle parole della didascalia, con i link tolti
+(emoji e punteggiatura non contano, l'ordine nemmeno): testi quasi uguali hanno impronte
+a distanza di Hamming piccola. I link non entrano nell'impronta perché le loro parti fisse
+(https, www, instagram, com, reel...) renderebbero simili tutte le didascalie brevi; sotto
+min_words parole la didascalia non ha impronta e il controllo dei quasi-duplicati non si applica.
+Per la ricerca l'impronta è divisa in SIMHASH_BANDS fasce:
+con distanza <= SIMHASH_BANDS - 1 almeno una fascia coincide, quindi basta confrontare i
+messaggi che condividono una fascia (vedi SubmissionCache.find_near_duplicate).
+
+Il calcolo gira in un pool di processi, fuori dall'event loop, avviato da bot.py con start_pool
+prima che esistano altri thread.
+"""
+import asyncio
+import atexit
+import functools
+import hashlib
+import logging
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+_BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+_BAND_MASK = (1 << _BAND_BITS) - 1
+
+_WORD_RE = re.compile(r'\w+')
+# Parole che contengono un link, con o senza schema (https://..., www...., tiktok.com/@...)
+_URL_TOKEN_RE = re.compile(r'\S*(?:https?://|www\.|\w\.[a-z]{2,}/)\S*')
+
+_pool = None  # avviato da start_pool; None = calcolo nel processo principale
+
+
+@functools.lru_cache(maxsize=65536)
+def _word_bits(word):
+    # blake2b e non hash(): deve dare lo stesso valore in ogni processo e a ogni avvio
+    return format(int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), 'big'), '064b')
+
+
+def caption_words(text):
+    """Parole della didascalia (minuscole), senza i link."""
+    return _WORD_RE.findall(_URL_TOKEN_RE.sub(' ', text.lower()))
+
+
+def simhash(text, min_words=1):
+    """
+    Impronta a 64 bit della didascalia (parole come feature, peso = occorrenze);
+    None se senza link restano meno di min_words parole.
+    """
+    words = caption_words(text)
+    if not words or len(words) < min_words:
+        return None
+    # Bit di ogni hash come stringa '0'/'1': le colonne si sommano con zip in C invece di 64 shift per parola
+    rows = [_word_bits(word) for word in words]
+    half = len(rows) / 2
+    fingerprint = 0
+    for column in zip(*rows):
+        fingerprint = (fingerprint << 1) | (column.count('1') > half)
+    return fingerprint
+
+
+def simhash_many(texts, min_words=1):
+    return [simhash(text, min_words) for text in texts]
+
+
+def bands(fingerprint):
+    """Le SIMHASH_BANDS fasce dell'impronta come (indice, valore), chiavi dell'indice LSH."""
+    return [(i, (fingerprint >> (i * _BAND_BITS)) & _BAND_MASK) for i in range(SIMHASH_BANDS)]
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def to_db(fingerprint):
+    """Impronta senza segno -> INTEGER SQLite (64 bit con segno)."""
+    if fingerprint is None:
+        return None
+    return fingerprint - (1 << 64) if fingerprint >= 1 << 63 else fingerprint
+
+
+def from_db(value):
+    if value is None:
+        return None
+    return value + (1 << 64) if value < 0 else value
+
+
+def start_pool(workers):
+    """
+    Avvia il pool di processi. Va chiamata all'avvio, prima che esistano altri thread (scrittura e
+    lettura del database, Flask, event loop): un fork da un processo con più thread può copiare nel
+    figlio lock già presi (logging, sqlite, allocatore) e bloccarlo. Se ci sono già altri thread il
+    pool non viene avviato e le impronte si calcolano nel processo principale.
+    """
+    global _pool
+    if _pool is not None:
+        return
+    if threading.active_count() > 1:
+        logger.warning("Pool SimHash non avviato: altri thread già attivi, calcolo nel processo principale")
+        return
+    # fork e non spawn: con spawn ogni processo reimporterebbe bot.py (e quindi database, con
+    # connessione e thread di scrittura). I processi eseguono solo le funzioni pure di questo modulo.
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+    # Con fork il pool crea tutti i processi alla prima richiesta, prima del suo thread di gestione:
+    # il calcolo di prova li avvia subito, mentre questo è ancora l'unico thread
+    pool.submit(simhash, '').result()
+    _pool = pool
+
+
+def _disable_pool(error):
+    # Niente nuovo pool: il processo ora ha altri thread, quindi si continua nel processo principale
+    global _pool
+    logger.error(f"Errore pool SimHash, calcolo nel processo principale d'ora in poi: {error}")
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _shutdown_pool():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(_shutdown_pool)
+
+
+async def simhash_async(text, min_words=1):
+    """simhash calcolato nel pool di processi; se il pool non è disponibile si calcola qui."""
+    if _pool is not None:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(_pool, simhash, text, min_words)
+        except Exception as e:
+            _disable_pool(e)
+    return simhash(text, min_words)
+
+
+async def simhash_many_async(texts, min_words=1, chunk_size=500):
+    """Impronte di molti testi (backfill, riscaldamento cache) divise in blocchi tra i processi del pool."""
+    texts = list(texts)
+    if not texts:
+        return []
+    if _pool is not None:
+        loop = asyncio.get_running_loop()
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        try:
+            results = await asyncio.gather(*(loop.run_in_executor(_pool, simhash_many, chunk, min_words) for chunk in chunks))
+            return [fingerprint for chunk in results for fingerprint in chunk]
+        except Exception as e:
+            _disable_pool(e)
+    return simhash_many(texts, min_words)
@@ -0,0 +1,191 @@
+"""
+Archiviazione settimanale del canale spotlight (usata da Spotlight.weekly_spotlight_cleanup).
+
+Pipeline a tre stadi collegati da code limitate:
+- lettura dello storico (pagine da 100) in un task separato;
+- copia nel canale archivio, in ordine e un messaggio alla volta: ogni repost diventa un messaggio
+  dell'archivio con lo stesso testo e gli stessi embed, come nella copia originale. Ogni messaggio
+  viene segnato come in invio in spotlight_archive_checkpoint prima dell'invio e come copiato
+  subito dopo, prima di eliminare l'originale;
+- eliminazione in blocco (bulk delete da 100) in un task separato, singola solo per i messaggi
+  più vecchi di 14 giorni.
+Gli invii restano in serie (l'ordine dell'archivio conta): la concorrenza riguarda solo lettura ed
+eliminazione, che non attendono più la copia.
+Se il processo si interrompe a metà, alla ripresa i messaggi già copiati vengono solo eliminati.
+Resta una finestra tra target.send e la registrazione della copia: se il processo si ferma lì, alla
+ripresa il messaggio in invio viene cercato tra gli ultimi messaggi dell'archivio (_PENDING_LOOKBACK)
+e, se trovato, registrato senza reinviarlo. Se nel frattempo nell'archivio sono stati pubblicati più
+di _PENDING_LOOKBACK messaggi, o la copia non è riconoscibile, il messaggio viene inviato di nuovo.
+"""
+import asyncio
+import logging
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+import discord
+from database import get_spotlight_archive_checkpoint, add_spotlight_archive_checkpoint, clear_spotlight_archive_pending
+
+logger = logging.getLogger(__name__)
+
+# Limiti di Discord
+_BULK_DELETE_MAX = 100
+_BULK_DELETE_MAX_AGE = timedelta(days=14)
+
+# Messaggi letti in anticipo dallo storico e in attesa di eliminazione
+_QUEUE_SIZE = 200
+# Ultimi messaggi dell'archivio in cui cercare la copia di un messaggio rimasto in invio
+_PENDING_LOOKBACK = 5
+
+ArchiveReport = namedtuple('ArchiveReport', [
+    'archived',       # messaggi copiati in questa esecuzione
+    'resumed',        # messaggi già copiati da un'esecuzione interrotta (solo eliminati)
+    'skipped',        # messaggi senza testo né embed (eliminati senza copia)
+    'deleted',        # messaggi eliminati
+    'sends',          # messaggi inviati nel canale archivio (uno per messaggio copiato)
+    'bulk_deletes',   # chiamate di eliminazione in blocco
+    'failed',         # messaggi non copiati o non eliminati per errore
+    'elapsed',        # secondi
+])
+
+
+async def archive_spotlight(source, target, before, run_id):
+    """
+    Copia in target e poi elimina da source tutti i messaggi precedenti a before (datetime).
+    run_id (epoch della scadenza settimanale) identifica l'esecuzione nel checkpoint. Ritorna ArchiveReport.
+    """
+    start = time.perf_counter()
+    copied, pending = await get_spotlight_archive_checkpoint(run_id)
+    if pending:
+        copied |= await _resolve_pending(source, target, run_id, pending)
+    counters = {'archived': 0, 'resumed': 0, 'skipped': 0, 'deleted': 0, 'sends': 0, 'bulk_deletes': 0, 'failed': 0}
+
+    to_copy = asyncio.Queue(maxsize=_QUEUE_SIZE)
+    to_delete = asyncio.Queue(maxsize=_QUEUE_SIZE)
+    reader = asyncio.create_task(_read_history(source, before, to_copy))
+    deleter = asyncio.create_task(_delete_messages(source, to_delete, counters))
+    try:
+        while True:
+            message = await to_copy.get()
+            if message is None:
+                # Fine dello storico, poi l'eventuale errore di lettura
+                await reader
+                break
+            if message.id in copied:
+                counters['resumed'] += 1
+                await to_delete.put(message.id)
+                continue
+            if not message.content and not message.embeds:
+                # Evita errore "Cannot send an empty message"
+                logger.warning(f"Messaggio {message.id} ignorato: nessun contenuto né embed")
+                counters['skipped'] += 1
+                await to_delete.put(message.id)
+                continue
+            if not await _copy_message(target, message, run_id, to_delete, counters):
+                break
+    finally:
+        reader.cancel()
+        if not deleter.done():
+            await to_delete.put(None)
+        await asyncio.gather(deleter, return_exceptions=True)
+
+    return ArchiveReport(elapsed=time.perf_counter() - start, **counters)
+
+
+async def _read_history(source, before, queue):
+    # Il None finale chiude la copia anche se la lettura fallisce (non se il task viene annullato)
+    try:
+        async for message in source.history(limit=None, before=before, oldest_first=True):
+            await queue.put(message)
+    except Exception:
+        await queue.put(None)
+        raise
+    await queue.put(None)
+
+
+async def _resolve_pending(source, target, run_id, pending):
+    """
+    Messaggio rimasto in invio da un'esecuzione interrotta: se la sua copia è tra gli ultimi messaggi
+    dell'archivio la registra e ritorna il messaggio come copiato, altrimenti lo libera per un nuovo invio.
+    """
+    try:
+        first = await source.fetch_message(min(pending))
+    except discord.NotFound:
+        first = None
+    if first is not None:
+        expected = _signature(first.content, first.embeds)
+        async for archived in target.history(limit=_PENDING_LOOKBACK):
+            content, embeds = _signature(archived.content, archived.embeds)
+            # Confronto sugli embed in testa: riconosce anche i gruppi uniti da versioni precedenti
+            if content == expected[0] and embeds[:len(expected[1])] == expected[1]:
+                logger.warning(f"Archiviazione spotlight ripresa: {pending} già copiati in {archived.id}")
+                await add_spotlight_archive_checkpoint(run_id, pending, archived.id)
+                return set(pending)
+    await clear_spotlight_archive_pending(run_id)
+    return set()
+
+
+def _signature(content, embeds):
+    return content or '', [(embed.title, embed.description) for embed in embeds]
+
+
+async def _copy_message(target, message, run_id, to_delete, counters):
+    """
+    Invia la copia del messaggio (testo ed embed), registra il checkpoint e accoda l'originale da eliminare.
+    False se l'invio fallisce: la copia si ferma, così alla ripresa l'archivio resta in ordine.
+    """
+    kwargs = {'embeds': message.embeds}
+    if message.content:
+        kwargs['content'] = message.content
+    # Segnato prima dell'invio: dopo un'interruzione qui _resolve_pending controlla se la copia è uscita
+    await add_spotlight_archive_checkpoint(run_id, [message.id], 0)
+    try:
+        archive_message = await target.send(**kwargs)
+    except discord.HTTPException as e:
+        # L'originale resta nel canale: verrà ripreso alla prossima esecuzione
+        logger.error(f"Errore archiviazione messaggio {message.id}: {e}")
+        await clear_spotlight_archive_pending(run_id)
+        counters['failed'] += 1
+        return False
+    counters['sends'] += 1
+    await add_spotlight_archive_checkpoint(run_id, [message.id], archive_message.id)
+    counters['archived'] += 1
+    await to_delete.put(message.id)
+    return True
+
+
+async def _delete_messages(source, queue, counters):
+    """Consuma gli id da eliminare: blocchi fino a 100 con bulk delete, singoli oltre i 14 giorni."""
+    done = False
+    while not done:
+        batch = [await queue.get()]
+        # Raccoglie quello che è già pronto senza attendere altro
+        while len(batch) < _BULK_DELETE_MAX and not queue.empty():
+            batch.append(queue.get_nowait())
+        if None in batch:
+            done = True
+            batch = [message_id for message_id in batch if message_id is not None]
+        if batch:
+            await _delete_batch(source, batch, counters)
+
+
+async def _delete_batch(source, message_ids, counters):
+    limit = datetime.now(timezone.utc) - _BULK_DELETE_MAX_AGE + timedelta(minutes=1)
+    recent = [message_id for message_id in message_ids if discord.utils.snowflake_time(message_id) > limit]
+    old = [message_id for message_id in message_ids if discord.utils.snowflake_time(message_id) <= limit]
+    if recent:
+        try:
+            await source.delete_messages([discord.Object(id=message_id) for message_id in recent])
+            counters['bulk_deletes'] += 1
+            counters['deleted'] += len(recent)
+        except discord.HTTPException as e:
+            logger.error(f"Errore eliminazione in blocco di {len(recent)} messaggi spotlight: {e}")
+            old.extend(recent)
+    for message_id in old:
+        try:
+            await source.get_partial_message(message_id).delete()
+            counters['deleted'] += 1
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as e:
+            logger.error(f"Errore eliminazione messaggio spotlight {message_id}: {e}")
+            counters['failed'] += 1
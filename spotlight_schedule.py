@@ -0,0 +1,106 @@
+"""
+Calendario dei repost spotlight, compilato all'import da config.SPOTLIGHT_SCHEDULE.
+
+Ogni combinazione (giorno della settimana, periodo) diventa una tupla ordinata di minuti dalla
+mezzanotte e ogni giorno dell'anno (mese, giorno) ha già il suo periodo: gli slot di una data
+si trovano con due accessi a dizionario, senza stringhe da convertire né stagioni da ricalcolare.
+Un errore nella tabella (orario non valido, periodo mancante) blocca l'avvio con ValueError.
+"""
+from datetime import date, datetime, time as dt_time, timedelta
+from config import ITALY_TZ, SPOTLIGHT_SCHEDULE, SPOTLIGHT_WEEKDAY_GROUPS, SPOTLIGHT_SCHOOL_PERIOD
+
+SEASONS = {12: 'winter', 1: 'winter', 2: 'winter', 3: 'spring', 4: 'spring', 5: 'spring',
+           6: 'summer', 7: 'summer', 8: 'summer', 9: 'autumn', 10: 'autumn', 11: 'autumn'}
+
+
+def _parse_minutes(value):
+    try:
+        hour, minute = map(int, value.split(':'))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Orario spotlight non valido: {value!r} (atteso 'HH:MM')")
+    if not (0 <= hour < 24 and 0 <= minute < 60):
+        raise ValueError(f"Orario spotlight non valido: {value!r}")
+    return hour * 60 + minute
+
+
+def _in_school_period(month, day, school_period):
+    (start_month, start_day), (end_month, end_day) = school_period
+    key = (month, day)
+    if (start_month, start_day) <= (end_month, end_day):
+        return (start_month, start_day) <= key <= (end_month, end_day)
+    return key >= (start_month, start_day) or key <= (end_month, end_day)
+
+
+def compile_schedule(table, weekday_groups, school_period):
+    """
+    Ritorna (slot, periodi): slot[(weekday, periodo)] = tupla ordinata di minuti,
+    periodi[(mese, giorno)] = ('school' | stagione). Valida tutta la tabella.
+    """
+    if len(weekday_groups) != 7:
+        raise ValueError("SPOTLIGHT_WEEKDAY_GROUPS deve avere 7 gruppi (lunedì..domenica)")
+
+    periods = {}
+    day = date(2024, 1, 1)  # anno bisestile: copre anche il 29 febbraio
+    while day.year == 2024:
+        periods[(day.month, day.day)] = 'school' if _in_school_period(day.month, day.day, school_period) else SEASONS[day.month]
+        day += timedelta(days=1)
+
+    slots = {}
+    for weekday, group in enumerate(weekday_groups):
+        if group not in table:
+            raise ValueError(f"Gruppo spotlight {group!r} assente da SPOTLIGHT_SCHEDULE")
+        by_period = table[group]
+        for period in set(periods.values()):
+            times = by_period.get('all', by_period.get(period))
+            if times is None:
+                raise ValueError(f"SPOTLIGHT_SCHEDULE[{group!r}] non ha slot per il periodo {period!r}")
+            slots[(weekday, period)] = tuple(sorted({_parse_minutes(value) for value in times}))
+    return slots, periods
+
+
+_SLOTS, _PERIODS = compile_schedule(SPOTLIGHT_SCHEDULE, SPOTLIGHT_WEEKDAY_GROUPS, SPOTLIGHT_SCHOOL_PERIOD)
+
+
+def period_for_date(day):
+    return _PERIODS[(day.month, day.day)]
+
+
+def slots_for_date(day):
+    """Slot della data (date) come minuti dalla mezzanotte, in ordine."""
+    return _SLOTS[(day.weekday(), _PERIODS[(day.month, day.day)])]
+
+
+def slot_datetimes(day):
+    """Slot della data (date) come datetime con timezone IT, in ordine."""
+    return [ITALY_TZ.localize(datetime.combine(day, dt_time(minutes // 60, minutes % 60)))
+            for minutes in slots_for_date(day)]
+
+
+def slots_between(start, end):
+    """Slot con start <= slot <= end (datetime IT)."""
+    day = start.date()
+    while day <= end.date():
+        for slot in slot_datetimes(day):
+            if start <= slot <= end:
+                yield slot
+        day += timedelta(days=1)
+
+
+def upcoming_slots(moment, count=1):
+    """I prossimi count slot successivi a moment (datetime IT), al massimo fino a una settimana dopo."""
+    found = []
+    day = moment.date()
+    for _ in range(8):
+        for slot in slot_datetimes(day):
+            if slot > moment:
+                found.append(slot)
+                if len(found) == count:
+                    return found
+        day += timedelta(days=1)
+    return found
+
+
+def next_slot_after(moment):
+    """Primo slot successivo a moment (datetime IT); None se la settimana seguente non ne ha."""
+    upcoming = upcoming_slots(moment, 1)
+    return upcoming[0] if upcoming else None
@@ -0,0 +1,204 @@
+"""
+Cache in memoria delle submission usata da Events per il controllo dei duplicati.
+
+Oltre alla mappa message_id -> dati, mantiene due indici hash (URL e contenuto
+normalizzato -> message_id), aggiornati a ogni inserimento e rimozione, così il
+controllo duplicati è O(1) qualunque sia il numero di messaggi in cache. Le submission con
+impronta SimHash sono indicizzate anche per fasce (LSH, vedi similarity.py) per trovare i
+quasi-duplicati confrontando solo i messaggi che condividono una fascia.
+
+La cache è limitata: le settimane più vecchie di max_weeks (secondo get_week_id)
+vengono scartate per intero, e oltre max_entries / max_bytes si elimina la voce
+usata meno di recente (LRU). I contatori hits/misses/evictions sono in stats().
+"""
+import itertools
+import sys
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from config import ITALY_TZ
+from similarity import bands, hamming
+from utils import get_week_id
+
+# Stima del peso fisso di una voce (dict, liste, chiavi degli indici) oltre alle stringhe
+_ENTRY_OVERHEAD_BYTES = 600
+
+
+class SubmissionCache:
+    def __init__(self, max_entries=None, max_bytes=None, max_weeks=None, max_distance=3):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_weeks = max_weeks
+        self.max_distance = max_distance
+
+        self._entries = OrderedDict()  # message_id -> dati; ordine = dal meno al più recentemente usato
+        self._by_url = {}          # url -> {message_id: None} (dict come insieme ordinato)
+        self._by_normalized = {}   # contenuto normalizzato -> {message_id: None}
+        self._by_week = {}         # week_id -> {message_id: None}
+        self._by_band = {}         # (fascia, valore) dell'impronta SimHash -> {message_id: None}
+        self._seq = itertools.count()  # ordine di inserimento, per scegliere l'originale più vecchio
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, message_id):
+        return message_id in self._entries
+
+    def __getitem__(self, message_id):
+        entry = self._entries[message_id]
+        self._entries.move_to_end(message_id)
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, message_id, default=None):
+        entry = self._entries.get(message_id)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(message_id)
+        return entry
+
+    def add(self, message_id, user_id, normalized, url, created_at=None, reactions=None, simhash=None):
+        """Inserisce (o sostituisce) una submission, aggiorna gli indici e applica i limiti."""
+        if message_id in self._entries:
+            self.remove(message_id)
+        week_id = get_week_id(created_at)
+        size = _ENTRY_OVERHEAD_BYTES + sys.getsizeof(normalized) + (sys.getsizeof(url) if url else 0)
+        self._entries[message_id] = {
+            'user_id': user_id,
+            'normalized': normalized,
+            'url': url,
+            'reactions': reactions if reactions is not None else [],
+            'seq': next(self._seq),
+            'week_id': week_id,
+            'simhash': simhash,
+            'size': size,
+        }
+        self._bytes += size
+        if url:
+            self._by_url.setdefault(url, {})[message_id] = None
+        self._by_normalized.setdefault(normalized, {})[message_id] = None
+        self._by_week.setdefault(week_id, {})[message_id] = None
+        if simhash is not None:
+            for band in bands(simhash):
+                self._by_band.setdefault(band, {})[message_id] = None
+
+        self.prune()
+        while self._entries and self._over_capacity():
+            oldest_id = next(iter(self._entries))
+            self.remove(oldest_id)
+            self.evictions += 1
+
+    def remove(self, message_id):
+        """Rimuove una submission dalla cache e dagli indici; ritorna i suoi dati o None."""
+        entry = self._entries.pop(message_id, None)
+        if entry is None:
+            return None
+        self._bytes -= entry['size']
+        self._unindex(self._by_url, entry['url'], message_id)
+        self._unindex(self._by_normalized, entry['normalized'], message_id)
+        self._unindex(self._by_week, entry['week_id'], message_id)
+        if entry['simhash'] is not None:
+            for band in bands(entry['simhash']):
+                self._unindex(self._by_band, band, message_id)
+        return entry
+
+    def prune(self, now=None):
+        """Scarta le submission delle settimane più vecchie di max_weeks; ritorna quante ne ha rimosse."""
+        if not self.max_weeks:
+            return 0
+        # week_id (YYYYMMDD) della settimana più vecchia da tenere: la corrente conta come prima
+        now = now or datetime.now(ITALY_TZ)
+        cutoff = get_week_id(now - timedelta(weeks=self.max_weeks - 1))
+        removed = 0
+        for week_id in [week_id for week_id in self._by_week if week_id < cutoff]:
+            for message_id in list(self._by_week[week_id]):
+                self.remove(message_id)
+                removed += 1
+        self.evictions += removed
+        return removed
+
+    def _over_capacity(self):
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        if self.max_bytes is not None and self._bytes > self.max_bytes:
+            return True
+        return False
+
+    @staticmethod
+    def _unindex(index, key, message_id):
+        ids = index.get(key)
+        if ids is None:
+            return
+        ids.pop(message_id, None)
+        if not ids:
+            del index[key]
+
+    @staticmethod
+    def _first(index, key, exclude_id):
+        for message_id in index.get(key, ()):
+            if message_id != exclude_id:
+                return message_id
+        return None
+
+    def find_duplicate(self, normalized, url, exclude_id=None):
+        """
+        Ritorna il message_id della submission in cache con lo stesso URL o lo stesso
+        contenuto normalizzato (la più vecchia se sono più d'una), altrimenti None.
+        """
+        candidates = []
+        if url:
+            by_url = self._first(self._by_url, url, exclude_id)
+            if by_url is not None:
+                candidates.append(by_url)
+        by_content = self._first(self._by_normalized, normalized, exclude_id)
+        if by_content is not None:
+            candidates.append(by_content)
+        if not candidates:
+            self.misses += 1
+            return None
+        self.hits += 1
+        original_id = min(candidates, key=lambda message_id: self._entries[message_id]['seq'])
+        self._entries.move_to_end(original_id)
+        return original_id
+
+    def find_near_duplicate(self, simhash, exclude_id=None):
+        """
+        Ritorna il message_id della submission in cache con impronta a distanza di Hamming
+        <= max_distance (la più vicina, poi la più vecchia), altrimenti None.
+        Si confrontano solo i messaggi che condividono almeno una fascia dell'impronta.
+        """
+        if simhash is None:
+            return None
+        best = None
+        seen = set()
+        for band in bands(simhash):
+            for message_id in self._by_band.get(band, ()):
+                if message_id == exclude_id or message_id in seen:
+                    continue
+                seen.add(message_id)
+                entry = self._entries[message_id]
+                distance = hamming(simhash, entry['simhash'])
+                if distance <= self.max_distance and (best is None or (distance, entry['seq']) < best[0]):
+                    best = ((distance, entry['seq']), message_id)
+        if best is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(best[1])
+        return best[1]
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'weeks': len(self._by_week),
+            'lsh_buckets': len(self._by_band),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
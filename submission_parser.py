@@ -0,0 +1,124 @@
+"""
+Parser delle submission condiviso da Events e Spotlight.
+
+Tutte le regex sono compilate una volta all'import e il contenuto viene portato in
+minuscolo una sola volta: parse_submission ritorna in un colpo hashtag trovati, URL
+grezzi e normalizzati, piattaforme presenti e contenuto normalizzato per i duplicati.
+"""
+import re
+from collections import namedtuple
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+from config import HASHTAGS, MULTIPLATFORM_DOMAINS
+
+# Domini dei social consentiti nel canale submissions
+PERMITTED_DOMAINS = ('instagram.com', 'tiktok.com', 'youtube.com')
+
+_PERMITTED_DOMAINS = frozenset(PERMITTED_DOMAINS)
+_MULTIPLATFORM_DOMAINS = frozenset(domain.lower() for domain in MULTIPLATFORM_DOMAINS)
+
+_HASHTAG_RE = re.compile('|'.join(re.escape(tag.lower()) for tag in HASHTAGS))
+# Un'unica alternanza per tutti i domini noti: la stessa scansione serve validità e bonus multipiattaforma
+_DOMAIN_RE = re.compile('|'.join(re.escape(domain) for domain in sorted(_PERMITTED_DOMAINS | _MULTIPLATFORM_DOMAINS)))
+_PERMITTED_DOMAIN_RE = re.compile('|'.join(re.escape(domain) for domain in PERMITTED_DOMAINS), re.IGNORECASE)
+# Primo link valido (usato come chiave URL della cache duplicati)
+_PRIMARY_URL_RE = re.compile(r'(https?://(?:www\.)?(?:instagram\.com|tiktok\.com|youtube\.com)[^\s]*)', re.IGNORECASE)
+# Tutti i link del messaggio, senza parentesi/graffe di chiusura
+_URL_RE = re.compile(r'(https?://[^\s\)\]\}>]+)')
+# Qualsiasi link (es. per bloccare i messaggi nel canale spotlight)
+_ANY_URL_RE = re.compile(r'https?://\S+')
+# Scomposizione veloce dei link "semplici" (niente ';', IPv6 o caratteri da decodificare nella query):
+# per questi il risultato coincide con il percorso urlparse/parse_qsl/urlencode, molto più lento
+_SIMPLE_URL_RE = re.compile(r"(https?)://([\w.~%!$&'()*+,=:@-]+)((?:/[^?#;\s]*)?)(?:\?([^#;\s]*))?(?:#\S*)?\Z", re.IGNORECASE)
+_SIMPLE_QUERY_RE = re.compile(r'[\w.~-]+=[\w.~-]*(?:&[\w.~-]+=[\w.~-]*)*\Z', re.ASCII)
+
+_ParsedSubmissionBase = namedtuple('ParsedSubmission', [
+    'hashtags',         # hashtag ufficiali presenti (minuscoli, senza ripetizioni)
+    'domains',          # frozenset dei PERMITTED_DOMAINS citati nel messaggio
+    'urls',             # URL grezzi delle piattaforme consentite, senza duplicati
+    'normalized_urls',  # stessi URL passati da normalize_url, nello stesso ordine
+    'primary_url',      # primo link valido o None
+    'platforms',        # frozenset dei MULTIPLATFORM_DOMAINS citati (bonus multipiattaforma)
+    'normalized',       # contenuto normalizzato per il confronto dei duplicati
+])
+
+
+class ParsedSubmission(_ParsedSubmissionBase):
+    __slots__ = ()
+
+    @property
+    def has_hashtag(self):
+        return bool(self.hashtags)
+
+    @property
+    def has_permitted_link(self):
+        return bool(self.domains)
+
+
+def normalize_url(url):
+    """
+    Normalizza l'URL per confronto:
+    - scheme e netloc lowercase
+    - rimuove slash finale
+    - rimuove frammento
+    - rimuove parametri utm_*
+    - ordina query string
+    """
+    simple = _SIMPLE_URL_RE.match(url)
+    if simple:
+        scheme, netloc, path, query = simple.groups()
+        if not query or _SIMPLE_QUERY_RE.match(query):
+            pairs = [pair.split('=', 1) for pair in query.split('&')] if query else []
+            query = '&'.join(f"{k}={v}" for k, v in sorted((k, v) for k, v in pairs if not k.lower().startswith('utm_')))
+            normalized = f"{scheme.lower()}://{netloc.lower()}{path.rstrip('/')}"
+            return f"{normalized}?{query}" if query else normalized
+    try:
+        p = urlparse(url)
+        scheme = p.scheme.lower() if p.scheme else 'https'
+        netloc = p.netloc.lower()
+        path = p.path.rstrip('/')
+        qs = parse_qsl(p.query, keep_blank_values=True)
+        qs_filtered = [(k, v) for (k, v) in qs if not k.lower().startswith('utm_')]
+        query = urlencode(sorted(qs_filtered))
+        return urlunparse((scheme, netloc, path, '', query, ''))
+    except Exception:
+        return url.strip()
+
+
+def parse_submission(content):
+    """Analizza il testo di una submission e ritorna un ParsedSubmission."""
+    content = content or ''
+    content_lower = content.lower()
+
+    hashtags = tuple(dict.fromkeys(_HASHTAG_RE.findall(content_lower)))
+    found = set(_DOMAIN_RE.findall(content_lower))
+    domains = found & _PERMITTED_DOMAINS
+
+    urls = []
+    primary = None
+    if domains:
+        for match in _URL_RE.findall(content):
+            if _PERMITTED_DOMAIN_RE.search(match):
+                urls.append(match.rstrip('.,;:!?)]}'))
+        urls = list(dict.fromkeys(urls))
+        primary = _PRIMARY_URL_RE.search(content)
+
+    return ParsedSubmission(
+        hashtags=hashtags,
+        domains=frozenset(domains),
+        urls=urls,
+        normalized_urls=[normalize_url(url) for url in urls],
+        primary_url=primary.group(0) if primary else None,
+        platforms=frozenset(found & _MULTIPLATFORM_DOMAINS),
+        normalized=' '.join(sorted(_HASHTAG_RE.sub('', content_lower).split())),
+    )
+
+
+def is_valid_submission(content):
+    """Controllo rapido (senza estrarre i link): almeno un hashtag ufficiale e un link consentito."""
+    content_lower = (content or '').lower()
+    return bool(_HASHTAG_RE.search(content_lower)) and bool(_PERMITTED_DOMAIN_RE.search(content_lower))
+
+
+def contains_url(content):
+    """True se il testo contiene un qualsiasi link http(s)."""
+    return bool(_ANY_URL_RE.search(content or ''))
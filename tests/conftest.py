@@ -0,0 +1,24 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TOKEN', 'test')
+# database.py apre trendduel.db nella cartella corrente già all'import: i test lavorano in una cartella temporanea
+os.chdir(tempfile.mkdtemp(prefix='trendduel-tests-'))
+
+
+@pytest.fixture
+def freeze_time(monkeypatch):
+    """Blocca datetime.now() dei moduli indicati all'istante dato (datetime con fuso)."""
+    def freeze(moment, *modules):
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return moment.astimezone(tz) if tz else moment.replace(tzinfo=None)
+        for module in modules:
+            monkeypatch.setattr(module, 'datetime', FrozenDatetime)
+    return freeze
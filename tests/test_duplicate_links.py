@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import database
+from cogs import events
+from config import SUBMISSIONS_CHANNEL_ID
+
+
+def make_bot():
+    return SimpleNamespace(bot_status={'messages_processed': 0, 'last_activity': None},
+                           process_commands=AsyncMock(), get_channel=lambda channel_id: None)
+
+
+def make_message(message_id, user_id, content):
+    author = SimpleNamespace(id=user_id, bot=False, name=f'user{user_id}', mention=f'<@{user_id}>', send=AsyncMock())
+    return SimpleNamespace(id=message_id, author=author, content=content, guild=None,
+                           channel=SimpleNamespace(id=SUBMISSIONS_CHANNEL_ID),
+                           created_at=datetime.now(timezone.utc), delete=AsyncMock(), add_reaction=AsyncMock())
+
+
+def test_link_already_submitted_is_deleted():
+    cog = events.Events(make_bot())
+    first = make_message(5001, 501, '#trendduelofficial https://www.tiktok.com/@a/video/5001 primo video')
+    second = make_message(5002, 502, '#trendduelchallenge https://www.tiktok.com/@a/video/5001 un altro testo')
+
+    async def scenario():
+        await cog.on_message(first)
+        await cog.on_message(second)
+
+    asyncio.run(scenario())
+    first.add_reaction.assert_awaited()
+    first.delete.assert_not_awaited()
+    second.delete.assert_awaited()
+    second.add_reaction.assert_not_awaited()
+
+
+def test_concurrent_messages_with_same_link_score_once(monkeypatch):
+    async def slow_simhash(text, min_words=1):
+        # Come con il pool di processi: l'impronta cede il loop agli altri messaggi
+        await asyncio.sleep(0.01)
+        return None
+    monkeypatch.setattr(events, 'simhash_async', slow_simhash)
+
+    cog = events.Events(make_bot())
+    # Link principale diverso (la cache per URL non li ferma), secondo link in comune
+    messages = [make_message(5100 + i, 510 + i, f'#trendduelofficial https://www.tiktok.com/@u{i}/video/{5100 + i} '
+                                                 f'https://www.instagram.com/reel/xyz5100 testo {i}')
+                for i in range(3)]
+
+    async def scenario():
+        await asyncio.gather(*(cog.on_message(message) for message in messages))
+
+    asyncio.run(scenario())
+    scored = [message for message in messages if message.add_reaction.await_count]
+    deleted = [message for message in messages if message.delete.await_count]
+    assert len(scored) == 1
+    assert len(deleted) == 2
+    assert asyncio.run(database.link_exists('https://www.instagram.com/reel/xyz5100'))
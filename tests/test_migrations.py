@@ -0,0 +1,59 @@
+import sqlite3
+
+from migrations import MIGRATIONS, apply_migrations
+
+
+def legacy_database(path):
+    """Database del bot com'era prima delle migrazioni versionate, con qualche dato."""
+    db = sqlite3.connect(path, isolation_level=None)
+    db.execute('CREATE TABLE users (user_id INTEGER PRIMARY KEY, points INTEGER DEFAULT 0, reputation INTEGER DEFAULT 0, '
+               "participations INTEGER DEFAULT 0, badges TEXT DEFAULT '')")
+    db.execute('CREATE TABLE reactions (message_id INTEGER, user_id INTEGER, participant_id INTEGER, '
+               'PRIMARY KEY (message_id, user_id))')
+    db.execute('CREATE TABLE weekly_events (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, '
+               'event_type TEXT NOT NULL, points_earned INTEGER DEFAULT 0, reputation_earned INTEGER DEFAULT 0, '
+               'timestamp TEXT NOT NULL, week_start TEXT NOT NULL, archived BOOLEAN DEFAULT 0, message_id INTEGER)')
+    db.execute('INSERT INTO users (user_id, points) VALUES (1, 30)')
+    db.execute('INSERT INTO reactions VALUES (10, 2, 1)')
+    events = [
+        # settimana già archiviata
+        (1, 'participation', 10, 0, '2026-10-07T12:00:00+02:00', '2026-10-04T20:00:00+02:00', 1, 100),
+        # settimana in corso: la domenica dalle 20:30 appartiene già alla nuova
+        (1, 'participation', 10, 0, '2026-10-18T20:30:00+02:00', '2026-10-18T20:00:00+02:00', 0, 101),
+        (1, 'staff_bonus_creativita', 10, 2, '2026-10-19T09:00:00+02:00', '2026-10-18T20:00:00+02:00', 0, 101),
+    ]
+    db.executemany('INSERT INTO weekly_events (user_id, event_type, points_earned, reputation_earned, timestamp, '
+                   'week_start, archived, message_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', events)
+    return db
+
+
+def indexes(db):
+    return {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_migration_chain_on_existing_database(tmp_path):
+    db = legacy_database(tmp_path / 'legacy.db')
+    apply_migrations(db)
+
+    versions = [row[0] for row in db.execute('SELECT version FROM schema_version ORDER BY version')]
+    assert versions == [version for version, _, _ in MIGRATIONS]
+
+    # Dati esistenti conservati e portati nello schema nuovo
+    assert db.execute('SELECT points FROM users WHERE user_id = 1').fetchone() == (30,)
+    assert db.execute('SELECT emoji, points_given FROM reactions').fetchone() == (None, 0)
+    assert db.execute('SELECT week_id, message_id FROM weekly_events ORDER BY id').fetchall() == [(20261018, 101)] * 2
+    assert db.execute('SELECT week_id, message_id FROM weekly_events_archive').fetchall() == [(20261004, 100)]
+    assert db.execute('SELECT COUNT(*) FROM weekly_events_all').fetchone() == (3,)
+    totals = db.execute('SELECT week_id, points, reputation, participations, archived, staff_bonus_events '
+                        'FROM weekly_user_totals ORDER BY week_id').fetchall()
+    assert totals == [(20261004, 10, 0, 1, 1, 0), (20261018, 20, 2, 1, 0, 1)]
+
+    assert 'idx_weekly_events_week' in indexes(db)
+    assert 'idx_weekly_events_archived_time' not in indexes(db)
+
+
+def test_migrations_are_applied_once(tmp_path):
+    db = sqlite3.connect(tmp_path / 'fresh.db', isolation_level=None)
+    apply_migrations(db)
+    apply_migrations(db)
+    assert db.execute('SELECT COUNT(*), MAX(version) FROM schema_version').fetchone() == (len(MIGRATIONS), MIGRATIONS[-1][0])
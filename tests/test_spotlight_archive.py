@@ -0,0 +1,86 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import discord
+
+import database
+from spotlight_archive import archive_spotlight
+
+
+def make_message(message_id, content='', embeds=()):
+    return SimpleNamespace(id=message_id, content=content, embeds=list(embeds))
+
+
+class FakeSource:
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.deleted = []
+
+    async def history(self, limit=None, before=None, oldest_first=True):
+        for message in list(self.messages):
+            yield message
+
+    async def fetch_message(self, message_id):
+        for message in self.messages:
+            if message.id == message_id:
+                return message
+        raise discord.NotFound(SimpleNamespace(status=404, reason='Not Found'), 'Unknown Message')
+
+    async def delete_messages(self, objects):
+        self.deleted.extend(obj.id for obj in objects)
+
+
+class FakeTarget:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content='', embeds=()):
+        archived = make_message(900000 + len(self.sent), content, embeds)
+        self.sent.append(archived)
+        return archived
+
+    async def history(self, limit=None):
+        for message in reversed(self.sent[-limit:]):
+            yield message
+
+
+def recent_ids(count):
+    # Snowflake di adesso: l'eliminazione in blocco accetta solo messaggi con meno di 14 giorni
+    base = discord.utils.time_snowflake(datetime.now(timezone.utc) - timedelta(minutes=5))
+    return [base + i for i in range(count)]
+
+
+def repost_embed(i):
+    return discord.Embed(title='⚡ TrendDuel Spotlight', description=f'repost {i}')
+
+
+def test_one_archive_message_per_repost():
+    ids = recent_ids(4)
+    messages = [make_message(ids[0], embeds=[repost_embed(0)]), make_message(ids[1], embeds=[repost_embed(1)]),
+                make_message(ids[2], content='annuncio'), make_message(ids[3], embeds=[repost_embed(3)])]
+    source, target = FakeSource(messages), FakeTarget()
+
+    report = asyncio.run(archive_spotlight(source, target, datetime.now(timezone.utc), run_id=1001))
+
+    assert report.archived == report.sends == 4
+    assert [(m.content, [e.description for e in m.embeds]) for m in target.sent] == [
+        ('', ['repost 0']), ('', ['repost 1']), ('annuncio', []), ('', ['repost 3'])]
+    assert sorted(source.deleted) == ids
+
+
+def test_resume_finds_message_sent_before_interruption():
+    run_id = 1002
+    ids = recent_ids(2)
+    messages = [make_message(ids[0], embeds=[repost_embed(0)]), make_message(ids[1], embeds=[repost_embed(1)])]
+    source, target = FakeSource(messages), FakeTarget()
+
+    # Interruzione tra l'invio della prima copia e la sua registrazione nel checkpoint
+    asyncio.run(target.send(embeds=messages[0].embeds))
+    asyncio.run(database.add_spotlight_archive_checkpoint(run_id, [ids[0]], 0))
+
+    report = asyncio.run(archive_spotlight(source, target, datetime.now(timezone.utc), run_id=run_id))
+
+    assert report.resumed == 1 and report.archived == 1
+    assert [m.embeds[0].description for m in target.sent] == ['repost 0', 'repost 1']
+    assert sorted(source.deleted) == ids
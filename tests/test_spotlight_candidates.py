@@ -0,0 +1,41 @@
+import asyncio
+import random
+from datetime import datetime
+
+import database
+from config import ITALY_TZ
+
+# Settimana futura dedicata: il bacino prende le submission da week_start in poi, quelle degli altri test restano fuori
+WEEK_START = ITALY_TZ.localize(datetime(2030, 3, 3, 20, 0))
+MESSAGE_IDS = list(range(8001, 8011))
+
+
+def setup_module():
+    created_at = int(WEEK_START.timestamp()) + 3600
+    rows = [(message_id, 800 + i, f'testo {i}', None, created_at, None, f'#trendduelofficial testo {i}')
+            for i, message_id in enumerate(MESSAGE_IDS)]
+    asyncio.run(database.add_submissions(rows))
+
+
+def sample(k, seed, exclude=()):
+    return asyncio.run(database.sample_spotlight_candidates(WEEK_START, k=k, rng=random.Random(seed), exclude=exclude))
+
+
+def test_whole_pool_in_extraction_order():
+    pool = [row[0] for row in sample(None, 'slot')]
+    first = [row[0] for row in sample(3, 'slot')]
+    assert sorted(pool) == MESSAGE_IDS
+    assert pool[:3] == first
+
+
+def test_whole_pool_respects_exclude():
+    pool = [row[0] for row in sample(None, 'slot', exclude={8001, 8002})]
+    assert sorted(pool) == MESSAGE_IDS[2:]
+    assert sample(None, 'slot', exclude=set(MESSAGE_IDS)) == []
+
+
+def test_spotlight_submission_state_is_current():
+    assert asyncio.run(database.get_spotlight_submission(8010)) == ('#trendduelofficial testo 9', True)
+    asyncio.run(database.mark_submissions_ineligible([8010]))
+    assert asyncio.run(database.get_spotlight_submission(8010)) == ('#trendduelofficial testo 9', False)
+    assert asyncio.run(database.get_spotlight_submission(1)) is None
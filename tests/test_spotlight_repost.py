@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+
+import database
+from utils import get_week_boundaries, get_week_id
+
+
+def user_points_reputation(user_id):
+    row = database.conn.execute('SELECT points, reputation FROM users WHERE user_id = ?', (user_id,)).fetchone()
+    return tuple(row)
+
+
+def slot_status(slot_ts):
+    row = database.conn.execute('SELECT status FROM spotlight_slots WHERE slot_ts = ?', (slot_ts,)).fetchone()
+    return row[0] if row else None
+
+
+def test_repost_saves_bonus_and_slot_together():
+    user_id, slot_ts = 6001, int(time.time()) - 60
+    week_start = get_week_boundaries()[0].isoformat()
+
+    async def scenario():
+        await database.execute('users.ensure', (user_id,))
+        await database.record_spotlight_slot(slot_ts, 'in_corso', slot_ts)
+        await database.add_spotlight_repost(61, 62, user_id, week_start, week_start, slot_ts=slot_ts, bonus_points=5)
+        return await database.get_weekly_user_totals(user_id, get_week_id())
+
+    totals = asyncio.run(scenario())
+    assert user_points_reputation(user_id) == (5, 0)
+    assert totals[0] == 5
+    assert slot_status(slot_ts) == 'repost'
+    assert database.get_repost(62) == (61, user_id)
+
+
+def test_failed_repost_save_gives_no_bonus(monkeypatch):
+    user_id, slot_ts = 6002, int(time.time()) - 120
+    week_start = get_week_boundaries()[0].isoformat()
+
+    def failing_slot(db, *args):
+        raise RuntimeError('disco pieno')
+
+    async def prepare():
+        await database.execute('users.ensure', (user_id,))
+        await database.record_spotlight_slot(slot_ts, 'in_corso', slot_ts)
+    asyncio.run(prepare())
+
+    monkeypatch.setattr(database, '_record_spotlight_slot', failing_slot)
+    with pytest.raises(RuntimeError):
+        asyncio.run(database.add_spotlight_repost(63, 64, user_id, week_start, week_start,
+                                                  slot_ts=slot_ts, bonus_reputation=3))
+
+    assert user_points_reputation(user_id) == (0, 0)
+    assert asyncio.run(database.get_weekly_user_totals(user_id, get_week_id())) == (0, 0, 0)
+    assert slot_status(slot_ts) == 'in_corso'
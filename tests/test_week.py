@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import database
+import utils
+from config import ITALY_TZ
+from utils import get_week_boundaries, get_week_id
+
+# Domenica 20:30: la settimana nuova è già iniziata alle 20:00
+SUNDAY_EVENING = ITALY_TZ.localize(datetime(2026, 10, 18, 20, 30))
+
+
+def test_sunday_evening_belongs_to_new_week():
+    week_start, week_end = get_week_boundaries(SUNDAY_EVENING)
+    assert week_start == ITALY_TZ.localize(datetime(2026, 10, 18, 20, 0))
+    assert week_end == ITALY_TZ.localize(datetime(2026, 10, 25, 20, 0))
+    assert get_week_id(SUNDAY_EVENING) == 20261018
+
+
+def test_sunday_before_cutover_belongs_to_closing_week():
+    moment = ITALY_TZ.localize(datetime(2026, 10, 18, 19, 59))
+    week_start, week_end = get_week_boundaries(moment)
+    assert week_start == ITALY_TZ.localize(datetime(2026, 10, 11, 20, 0))
+    assert week_end == ITALY_TZ.localize(datetime(2026, 10, 18, 20, 0))
+    assert get_week_id(moment) == 20261011
+
+
+def test_boundaries_contain_date_and_agree_with_week_id():
+    moment = ITALY_TZ.localize(datetime(2026, 3, 22, 20, 0))
+    while moment < ITALY_TZ.localize(datetime(2026, 4, 6)):
+        week_start, week_end = get_week_boundaries(moment)
+        assert week_start <= moment < week_end
+        assert get_week_id(moment) == int(week_start.strftime('%Y%m%d'))
+        moment = ITALY_TZ.normalize(moment + timedelta(minutes=37))
+
+
+def test_week_across_dst_change_ends_at_local_20():
+    # 29/03/2026: passaggio all'ora legale, la settimana dura 167 ore
+    week_start, week_end = get_week_boundaries(ITALY_TZ.localize(datetime(2026, 3, 25, 12, 0)))
+    assert week_end.hour == 20
+    assert week_end - week_start == timedelta(hours=167)
+
+
+def test_reads_see_events_written_on_sunday_evening(freeze_time):
+    freeze_time(SUNDAY_EVENING, utils, database)
+    user_id = 4001
+
+    async def scenario():
+        await database.record_weekly_event(user_id, 'participation', points=10, message_id=1)
+        leaderboard = await database.get_weekly_leaderboard()
+        totals = await database.get_weekly_user_totals(user_id, get_week_id())
+        return leaderboard, totals
+
+    leaderboard, totals = asyncio.run(scenario())
+    assert get_week_id() == 20261018
+    assert user_id in [row[0] for row in leaderboard]
+    assert totals == (10, 0, 1)
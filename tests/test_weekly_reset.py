@@ -0,0 +1,47 @@
+import asyncio
+from datetime import datetime
+
+import database
+import utils
+from config import ITALY_TZ
+from utils import get_week_boundaries
+
+USER_ID = 7001
+# Due settimane rimaste nella tabella calda, quella che si chiude e quella nuova
+STALE_WEEKS = (20250105, 20250112)
+CLOSING_WEEK = 20250119
+NEW_WEEK = 20250126
+
+
+def record_at(freeze_time, moment, points, message_id):
+    freeze_time(ITALY_TZ.localize(moment), utils, database)
+    asyncio.run(database.record_weekly_event(USER_ID, 'participation', points=points, message_id=message_id))
+
+
+def count(sql, week_id):
+    return database.conn.execute(sql, (USER_ID, week_id)).fetchone()[0]
+
+
+def test_reset_archives_stale_weeks(freeze_time):
+    record_at(freeze_time, datetime(2025, 1, 8, 12, 0), 10, 71)
+    record_at(freeze_time, datetime(2025, 1, 9, 12, 0), 10, 72)
+    record_at(freeze_time, datetime(2025, 1, 15, 12, 0), 10, 73)
+    record_at(freeze_time, datetime(2025, 1, 22, 12, 0), 10, 74)
+    record_at(freeze_time, datetime(2025, 1, 26, 20, 30), 10, 75)
+
+    # Reset della domenica 26/01 alle 20:00, per la settimana che si chiude
+    week_start, week_end = get_week_boundaries(ITALY_TZ.localize(datetime(2025, 1, 26, 19, 59)))
+    affected_rows = asyncio.run(database.reset_weekly_metrics(week_start, week_end))
+    assert affected_rows == 4
+
+    hot = 'SELECT COUNT(*) FROM weekly_events WHERE user_id = ? AND week_id = ?'
+    cold = 'SELECT COUNT(*) FROM weekly_events_archive WHERE user_id = ? AND week_id = ?'
+    active_totals = 'SELECT COUNT(*) FROM weekly_user_totals WHERE user_id = ? AND week_id = ? AND archived = 0'
+    for week_id, events in ((STALE_WEEKS[0], 2), (STALE_WEEKS[1], 1), (CLOSING_WEEK, 1)):
+        assert count(hot, week_id) == 0
+        assert count(cold, week_id) == events
+        assert count(active_totals, week_id) == 0
+
+    assert count(hot, NEW_WEEK) == 1
+    assert count(cold, NEW_WEEK) == 0
+    assert count(active_totals, NEW_WEEK) == 1
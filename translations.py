@@ -50,6 +50,8 @@ translations = {
       'commands_checkpermissions': "🔧 `/checkpermissions` - Verifica i permessi del bot",
       'commands_clear_archives': "🗑️ `/clear-archives` - Svuota l'archivio delle classifiche settimanali",
       'commands_manage_user_stats': "📄 `/manage-user-stats` - Aggiunge o rimuove punti/reputazione a un utente",
+      'commands_query_stats': "🐢 `/query-stats` - Mostra le query del database più costose",
+      'commands_spotlight_schedule': "⚡ `/spotlight-schedule` - Mostra i prossimi slot dei repost spotlight",
       'commands_footer': "TrendDuel • Challenge the world, conquer the hype!",
 
       # botstats (se usati altrove)
@@ -63,8 +65,19 @@ translations = {
       'botstats_archives': "📚 Archivi",
       'botstats_last_activity': "🕐 Ultima attività",
       'botstats_next_leaderboard': "⏰ Prossima classifica",
+      'botstats_submission_cache': "🗃️ Cache submission",
       'botstats_footer': "Bot versione Weekly Leaderboard • {datetime}",
 
+      # query-stats
+      'query_stats_title': "🐢 Statistiche Query Database",
+      'query_stats_description': "Query ordinate per tempo totale dall'avvio. Le esecuzioni oltre {threshold} ms sono nel log con il piano di esecuzione.",
+      'query_stats_empty': "Nessuna query eseguita dall'avvio.",
+
+      # spotlight-schedule
+      'spotlight_schedule_title': "⚡ Calendario Spotlight",
+      'spotlight_schedule_description': "Periodo di oggi: **{period}** • Repost oggi: **{count}/{limit}**\nOrari da `SPOTLIGHT_SCHEDULE` in config.py (ora italiana).",
+      'spotlight_schedule_empty': "Nessuno slot nei prossimi 7 giorni.",
+
       # checkpermissions
       'checkpermissions_title': "🔧 Verifica Permessi Bot",
       'checkpermissions_status': "Status Permessi:",
@@ -172,6 +185,8 @@ translations = {
       'commands_checkpermissions': "🔧 `/checkpermissions` - Check bot permissions",
       'commands_clear_archives': "🗑️ `/clear-archives` - Clear the archive of weekly leaderboards",
       'commands_manage_user_stats': "📄 `/manage-user-stats` - Add or remove points/reputation for a user",
+      'commands_query_stats': "🐢 `/query-stats` - Show the most expensive database queries",
+      'commands_spotlight_schedule': "⚡ `/spotlight-schedule` - Show the upcoming spotlight repost slots",
       'commands_footer': "TrendDuel • Challenge the world, conquer the hype!",
 
       # botstats
@@ -185,8 +200,19 @@ translations = {
       'botstats_archives': "📚 Archives",
       'botstats_last_activity': "🕐 Last Activity",
       'botstats_next_leaderboard': "⏰ Next Leaderboard",
+      'botstats_submission_cache': "🗃️ Submission Cache",
       'botstats_footer': "Bot version Weekly Leaderboard • {datetime}",
 
+      # query-stats
+      'query_stats_title': "🐢 Database Query Statistics",
+      'query_stats_description': "Queries sorted by total time since startup. Executions over {threshold} ms are logged with their query plan.",
+      'query_stats_empty': "No queries executed since startup.",
+
+      # spotlight-schedule
+      'spotlight_schedule_title': "⚡ Spotlight Schedule",
+      'spotlight_schedule_description': "Today's period: **{period}** • Reposts today: **{count}/{limit}**\nTimes from `SPOTLIGHT_SCHEDULE` in config.py (Italian time).",
+      'spotlight_schedule_empty': "No slots in the next 7 days.",
+
       # checkpermissions
       'checkpermissions_title': "🔧 Bot Permissions Check",
       'checkpermissions_status': "Permissions Status:",
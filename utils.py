@@ -4,40 +4,42 @@ import logging
 import discord
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time as dt_time
 from config import ITALY_TZ
 
 logger = logging.getLogger(__name__)
 
 def get_week_boundaries(target_date=None):
     """
-    Calcola l'inizio e fine settimana (domenica 20:00 - domenica 20:00)
+    Calcola l'inizio e fine settimana (domenica 20:00 - domenica 20:00).
+    La domenica dalle 20:00 appartiene già alla settimana nuova, come per get_week_id.
     """
     if target_date is None:
         target_date = datetime.now(ITALY_TZ)
     elif target_date.tzinfo is None:
         target_date = ITALY_TZ.localize(target_date)
-
-    # Trova la domenica corrente o precedente
-    days_since_sunday = target_date.weekday() + 1  # Lunedì=1, Domenica=7
-    if days_since_sunday == 7:  # È domenica
-        if target_date.hour < 20:  # Prima delle 20:00
-            # Settimana precedente
-            week_end = target_date.replace(hour=20, minute=0, second=0, microsecond=0)
-            week_start = week_end - timedelta(days=7)
-        else:  # Dopo le 20:00
-            # Settimana corrente che sta per finire
-            week_end = target_date.replace(hour=20, minute=0, second=0, microsecond=0)
-            week_start = week_end - timedelta(days=7)
     else:
-        # Non è domenica, trova la domenica precedente
-        days_to_subtract = days_since_sunday
-        last_sunday = target_date - timedelta(days=days_to_subtract)
-        week_start = last_sunday.replace(hour=20, minute=0, second=0, microsecond=0)
-        week_end = week_start + timedelta(days=7)
+        target_date = target_date.astimezone(ITALY_TZ)
+
+    # Domenica di inizio: la corrente dalle 20:00, altrimenti la precedente
+    days_since_sunday = (target_date.weekday() + 1) % 7  # Domenica=0, Lunedì=1, ...
+    start_day = target_date.date() - timedelta(days=days_since_sunday)
+    if days_since_sunday == 0 and target_date.hour < 20:
+        start_day -= timedelta(days=7)
 
+    # localize su ogni estremo: con il cambio d'ora le due domeniche possono avere offset diversi
+    week_start = ITALY_TZ.localize(datetime.combine(start_day, dt_time(20, 0)))
+    week_end = ITALY_TZ.localize(datetime.combine(start_day + timedelta(days=7), dt_time(20, 0)))
     return week_start, week_end
 
+def get_week_id(target_date=None):
+    """
+    Identificativo intero (YYYYMMDD della domenica di inizio) della settimana che contiene target_date
+    (default: adesso). È l'unica chiave della settimana corrente, sia in scrittura sia in lettura.
+    """
+    week_start, _ = get_week_boundaries(target_date)
+    return int(week_start.strftime('%Y%m%d'))
+
 async def create_leaderboard_embed(bot, leaderboard_data, week_start, week_end, is_test=False):
     """
     Crea l'embed per la classifica settimanale
@@ -148,7 +150,7 @@ async def archive_leaderboard(bot, embed, week_start, week_end, participants_cou
         message = await hall_of_fame_channel.send(embed=archive_embed)
 
         # Salva nel database
-        from database import c, conn
+        from database import execute
         embed_data = json.dumps({
             'title': embed.title,
             'description': embed.description,
@@ -156,12 +158,9 @@ async def archive_leaderboard(bot, embed, week_start, week_end, participants_cou
             'fields': [{'name': f.name, 'value': f.value, 'inline': f.inline} for f in embed.fields]
         })
 
-        c.execute('''INSERT INTO weekly_archives
-                     (week_start, week_end, embed_data, participants_count, archived_at, hall_of_fame_message_id)
-                     VALUES (?, ?, ?, ?, ?, ?)''',
-                 (week_start.isoformat(), week_end.isoformat(), embed_data, 
-                  participants_count, datetime.now(ITALY_TZ).isoformat(), message.id))
-        conn.commit()
+        await execute('archives.insert',
+                      (week_start.isoformat(), week_end.isoformat(), embed_data, 
+                       participants_count, datetime.now(ITALY_TZ).isoformat(), message.id))
 
         logger.info(f"Classifica archiviata nel Hall of Fame: messaggio {message.id}")
         return message.id
@@ -170,6 +169,23 @@ async def archive_leaderboard(bot, embed, week_start, week_end, participants_cou
         logger.error(f"Errore nell'archiviazione: {e}")
         return None
 
+async def remove_raw_reaction(bot, payload, user):
+    """
+    Toglie la reazione di user descritta da un RawReactionActionEvent senza scaricare il messaggio
+    (PartialMessage); se non è possibile prova a rimuovere tutte le reazioni con quell'emoji.
+    """
+    channel = bot.get_channel(payload.channel_id)
+    if channel is None:
+        return
+    message = channel.get_partial_message(payload.message_id)
+    try:
+        await message.remove_reaction(payload.emoji, user)
+    except Exception:
+        try:
+            await message.clear_reaction(payload.emoji)
+        except Exception:
+            pass
+
 def cleanup_lock_files():
     now = datetime.now(ITALY_TZ)
     lock_dir = "."